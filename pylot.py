@@ -47,6 +47,10 @@ def driver():
         # Place Lidar sensor in the same location as the center camera.
         (point_cloud_stream, lidar_setup) = pylot.operator_creator.add_lidar(
             transform, vehicle_id_stream)
+        if FLAGS.point_cloud_preprocessing:
+            point_cloud_stream = \
+                pylot.operator_creator.add_point_cloud_preprocessing(
+                    point_cloud_stream)
     else:
         point_cloud_stream = None
 
@@ -64,12 +68,19 @@ def driver():
         (imu_stream,
          _) = pylot.operator_creator.add_imu(transform, vehicle_id_stream)
 
+    side_camera_streams = None
+    if FLAGS.obstacle_detection and FLAGS.batched_obstacle_detection:
+        # The batched detector runs the frames of the left and right cameras
+        # together with the frames of the center camera.
+        side_camera_streams = pylot.operator_creator.add_left_right_cameras(
+            transform, vehicle_id_stream)
+
     obstacles_stream = \
         pylot.component_creator.add_obstacle_detection(
             center_camera_stream, rgb_camera_setup, can_bus_stream,
             depth_stream, depth_camera_stream, ground_segmented_stream,
             ground_obstacles_stream, ground_speed_limit_signs_stream,
-            ground_stop_signs_stream)
+            ground_stop_signs_stream, side_camera_streams)
     traffic_lights_stream = \
         pylot.component_creator.add_traffic_light_detection(
             transform, vehicle_id_stream, can_bus_stream, depth_stream,
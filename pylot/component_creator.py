@@ -1,4 +1,5 @@
 from absl import flags
+import logging
 
 import pylot.operator_creator
 
@@ -13,13 +14,17 @@ def add_obstacle_detection(center_camera_stream,
                            segmented_camera_stream=None,
                            ground_obstacles_stream=None,
                            ground_speed_limit_signs_stream=None,
-                           ground_stop_signs_stream=None):
+                           ground_stop_signs_stream=None,
+                           side_camera_streams=None):
     """Adds operators for obstacle detection to the data-flow.
 
     If the `--perfect_obstacle_detection` flag is set, the method adds a
     perfect detector operator, and returns a stream of perfect obstacles.
     Otherwise, if the `--obstacle_detection` flag is set, the method returns
-    a stream of obstacles detected using a trained model.
+    a stream of obstacles detected using a trained model. If the
+    `--batched_obstacle_detection` flag is also set, the model runs in a
+    batched detection operator, which batches the frames of the center
+    camera with the frames of the side cameras.
 
     Args:
         center_camera_stream (:py:class:`erdos.ReadStream`): Stream on which
@@ -50,6 +55,9 @@ def add_obstacle_detection(center_camera_stream,
             Stream on which
             :py:class:`~pylot.perception.messages.StopSignsMessage`
             messages are received.
+        side_camera_streams (list(:py:class:`erdos.ReadStream`), optional):
+            Streams of other cameras, on which the batched detection
+            operator also detects obstacles.
 
     Returns:
         :py:class:`erdos.ReadStream`: Stream on which
@@ -60,8 +68,20 @@ def add_obstacle_detection(center_camera_stream,
     perfect_obstacles_stream = None
     if FLAGS.obstacle_detection:
         # TODO: Only returns the first obstacles stream.
-        obstacles_streams = pylot.operator_creator.add_obstacle_detection(
-            center_camera_stream)
+        if FLAGS.batched_obstacle_detection:
+            # The frames of a single camera complete their timestamp as
+            # soon as they arrive, so they would be run one by one.
+            assert side_camera_streams, \
+                'Batched obstacle detection requires side camera streams'
+            obstacles_streams = [
+                camera_obstacles_streams[0] for camera_obstacles_streams in
+                pylot.operator_creator.add_batched_obstacle_detection(
+                    [center_camera_stream] + list(side_camera_streams))
+            ]
+        else:
+            obstacles_streams = \
+                pylot.operator_creator.add_obstacle_detection(
+                    center_camera_stream)
         obstacles_stream_wo_depth = obstacles_streams[0]
 
         # Adds an operator that finds the world locations of the obstacles.
@@ -114,6 +134,11 @@ def add_traffic_light_detection(tl_transform,
             on which can bus info is received.
         depth_stream (:py:class:`erdos.ReadStream`, optional): Stream on
             which point cloud messages or depth frames are received.
+        ground_traffic_lights_stream (:py:class:`erdos.ReadStream`,
+            optional): Stream on which the simulator publishes the traffic
+            lights. If the `--traffic_light_det_roi` flag is set, the
+            detector only runs on the regions of the frames in which these
+            traffic lights are.
 
     Returns:
         :py:class:`erdos.ReadStream`: Stream on which
@@ -128,9 +153,20 @@ def add_traffic_light_detection(tl_transform,
 
     traffic_lights_stream = None
     if FLAGS.traffic_light_detection:
-        traffic_lights_stream = \
-            pylot.operator_creator.add_traffic_light_detector(
-                tl_camera_stream)
+        if (FLAGS.traffic_light_det_roi and can_bus_stream is not None
+                and ground_traffic_lights_stream is not None):
+            traffic_lights_stream = \
+                pylot.operator_creator.add_traffic_light_detector(
+                    tl_camera_stream, can_bus_stream,
+                    ground_traffic_lights_stream)
+        else:
+            if FLAGS.traffic_light_det_roi:
+                logging.warning(
+                    'The traffic light locations are not available; the '
+                    'traffic light detector runs on entire frames')
+            traffic_lights_stream = \
+                pylot.operator_creator.add_traffic_light_detector(
+                    tl_camera_stream)
         # Adds operator that finds the world locations of the traffic lights.
         traffic_lights_stream = \
             pylot.operator_creator.add_obstacle_location_finder(
@@ -2,7 +2,9 @@
 
 from collections import deque
 from pylot.perception.detection.obstacle import BoundingBox3D
+from pylot.utils import TransformArray, Vector2D
 import erdos
+import numpy as np
 
 
 class TrackVisualizerOperator(erdos.Operator):
@@ -104,9 +106,7 @@ class TrackVisualizerOperator(erdos.Operator):
         segmentation_msg.frame.visualize('track_visualizer', timestamp)
 
     def _draw_trajectory_on_img(self, obstacle, segmented_frame, predict):
-        # Intrinsic and extrinsic matrix of the top down segmentation camera.
-        extrinsic_matrix = segmented_frame.camera_setup.get_extrinsic_matrix()
-        intrinsic_matrix = segmented_frame.camera_setup.get_intrinsic_matrix()
+        camera_setup = segmented_frame.camera_setup
 
         # Set the color of drawing.
         if predict:
@@ -115,15 +115,13 @@ class TrackVisualizerOperator(erdos.Operator):
             point_color = self._past_colors[obstacle.label]
 
         # Obstacle trajectory points.
-        screen_points = []
-        for transform in obstacle.trajectory:
-            screen_point = transform.location.to_camera_view(
-                extrinsic_matrix, intrinsic_matrix)
-            screen_points.append(screen_point)
+        trajectory = TransformArray.from_transforms(obstacle.trajectory)
+        screen_points, _, _ = camera_setup.project_points(
+            trajectory.locations)
 
         # Draw trajectory on segmented image.
-        for point in screen_points:
-            segmented_frame.draw_point(point, point_color)
+        for x, y in screen_points:
+            segmented_frame.draw_point(Vector2D(x, y), point_color)
 
         # Obstacle bounding box.
         if isinstance(obstacle.bounding_box, BoundingBox3D):
@@ -131,21 +129,21 @@ class TrackVisualizerOperator(erdos.Operator):
                 obstacle.bounding_box.extent
             end_location = obstacle.bounding_box.transform.location + \
                 obstacle.bounding_box.extent
-            start_points = []
-            end_points = []
-            for transform in obstacle.trajectory:
-                start_transform = transform.transform_locations([start_location])
-                end_transform = transform.transform_locations([end_location])
-                start_point = start_transform[0]\
-                    .to_camera_view(extrinsic_matrix, intrinsic_matrix)
-                end_point = end_transform[0]\
-                    .to_camera_view(extrinsic_matrix, intrinsic_matrix)
-                start_points.append(start_point)
-                end_points.append(end_point)
+            num_transforms = len(trajectory)
+            start_points, _, _ = camera_setup.project_points(
+                trajectory.transform_points(
+                    np.tile(start_location.as_numpy_array(),
+                            (num_transforms, 1))))
+            end_points, _, _ = camera_setup.project_points(
+                trajectory.transform_points(
+                    np.tile(end_location.as_numpy_array(),
+                            (num_transforms, 1))))
 
             # Draw bounding box on segmented image.
             for start_point, end_point in \
                     zip(start_points, end_points):
+                start_point = Vector2D(start_point[0], start_point[1])
+                end_point = Vector2D(end_point[0], end_point[1])
                 if self._in_frame(start_point, segmented_frame) or \
                         self._in_frame(end_point, segmented_frame):
                     segmented_frame.draw_box(start_point, end_point,
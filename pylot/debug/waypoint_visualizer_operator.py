@@ -83,12 +83,12 @@ class WaypointVisualizerOperator(erdos.Operator):
         if self._flags.draw_waypoints_on_camera_frames:
             bgr_frame.camera_setup.set_transform(
                 vehicle_transform * bgr_frame.camera_setup.transform)
-            extrinsic_matrix = bgr_frame.camera_setup.get_extrinsic_matrix()
-            intrinsic_matrix = bgr_frame.camera_setup.get_intrinsic_matrix()
-            for waypoint in waypoints_msg.waypoints:
-                pixel_location = waypoint.location.to_camera_view(
-                    extrinsic_matrix, intrinsic_matrix)
-                bgr_frame.draw_point(pixel_location, [0, 0, 0])
+            pixels, _, _ = bgr_frame.camera_setup.project_points(
+                pylot.utils.LocationArray.from_locations([
+                    waypoint.location for waypoint in waypoints_msg.waypoints
+                ]))
+            for x, y in pixels:
+                bgr_frame.draw_point(pylot.utils.Vector2D(x, y), [0, 0, 0])
             bgr_frame.visualize(self.config.name)
 
     def on_bgr_frame(self, msg):
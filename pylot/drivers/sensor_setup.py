@@ -1,6 +1,6 @@
 import numpy as np
 
-from pylot.utils import Location, Rotation, Transform
+from pylot.utils import Location, LocationArray, Rotation, Transform
 
 
 def create_rgb_camera_setup(camera_name,
@@ -221,6 +221,9 @@ class CameraSetup(object):
             self.width, self.height, self.fov)
         self._unreal_transform = CameraSetup.__create_unreal_transform(
             self.transform)
+        # The projection matrix is computed lazily, and is cached until the
+        # transform of the camera changes.
+        self._projection_mat = None
 
     @staticmethod
     def __create_intrinsic_matrix(width, height, fov):
@@ -331,6 +334,53 @@ class CameraSetup(object):
         self.transform = transform
         self._unreal_transform = CameraSetup.__create_unreal_transform(
             self.transform)
+        self._projection_mat = None
+
+    def get_projection_matrix(self):
+        """ Get the matrix that projects points from the coordinate space in
+        which the transform of the camera is defined (e.g., world coordinates)
+        to the image of the camera.
+
+        The matrix combines the intrinsic matrix with the inverse of the
+        extrinsic matrix, and it is computed once per camera transform.
+
+        Returns:
+            :py:class:`numpy.ndarray`: The 3x4 projection matrix.
+        """
+        if self._projection_mat is None:
+            self._projection_mat = np.dot(
+                self._intrinsic_mat,
+                np.linalg.inv(self.get_extrinsic_matrix())[:3])
+        return self._projection_mat
+
+    def project_points(self, points):
+        """ Projects points to the image of the camera.
+
+        Args:
+            points: A (number of points) by 3 numpy array (or a
+                :py:class:`~pylot.utils.LocationArray`) of points specified in
+                the coordinate space in which the transform of the camera is
+                defined. Arrays with more than two dimensions are also
+                accepted, as long as the last dimension is 3.
+
+        Returns:
+            tuple: A (number of points) by 2 numpy array of the (x, y) pixel
+            coordinates of the points, a numpy array of the depth of the
+            points, and a boolean numpy array that is True for the points that
+            are in front of the camera and inside the image.
+        """
+        points = np.asarray(points.as_numpy_array() if isinstance(
+            points, LocationArray) else points)
+        projection_mat = self.get_projection_matrix()
+        position_2D = np.dot(points, projection_mat[:, :3].T) + \
+            projection_mat[:, 3]
+        depth = position_2D[..., 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pixels = position_2D[..., :2] / depth[..., None]
+        valid = ((depth > 0) & (pixels[..., 0] >= 0) &
+                 (pixels[..., 0] < self.width) & (pixels[..., 1] >= 0) &
+                 (pixels[..., 1] < self.height))
+        return pixels, depth, valid
 
     def get_fov(self):
         """ Get the field of view of the camera.
@@ -44,12 +44,10 @@ class VelodyneDriverOperator(erdos.Operator):
         if self._counter % self._modulo_to_send != 0:
             return
         timestamp = erdos.Timestamp(coordinates=[self._msg_cnt])
-        points = []
-        for data in pc2.read_points(data,
-                                    field_names=('x', 'y', 'z'),
-                                    skip_nans=True):
-            points.append([data[0], data[1], data[2]])
-        points = np.array(points)
+        points = np.array(list(
+            pc2.read_points(data, field_names=('x', 'y', 'z'),
+                            skip_nans=True)),
+                          dtype=np.float32)
         point_cloud = pylot.perception.point_cloud.PointCloud(
             points, self._lidar_setup)
         msg = PointCloudMessage(timestamp, point_cloud)
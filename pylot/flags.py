@@ -30,6 +30,10 @@ flags.DEFINE_list(
     'Comma-separated list of model paths')
 flags.DEFINE_list('obstacle_detection_model_names', 'faster-rcnn',
                   'Comma-separated list of model names')
+flags.DEFINE_bool(
+    'batched_obstacle_detection', False,
+    'True to load each obstacle detection model once for all the cameras, '
+    'and to run their frames in batches')
 flags.DEFINE_bool('obstacle_tracking', False,
                   'True to enable obstacle tracking operator')
 flags.DEFINE_bool('perfect_obstacle_tracking', False,
@@ -62,9 +66,50 @@ flags.DEFINE_bool('depth_estimation', False,
                   'True to estimate depth using cameras')
 flags.DEFINE_bool('perfect_depth_estimation', False,
                   'True to use perfect depth')
+flags.DEFINE_bool(
+    'point_cloud_preprocessing', False,
+    'True to crop and downsample point clouds before they are used')
+flags.DEFINE_float('point_cloud_max_range', 50.0,
+                   'Maximum distance (in metres) of the kept lidar points')
+flags.DEFINE_float(
+    'point_cloud_fov', None,
+    'Horizontal field of view (in degrees) of the kept lidar points, '
+    'centered on the forward axis. None to keep all directions')
+flags.DEFINE_float(
+    'point_cloud_min_height', None,
+    'Minimum height (in metres) of the kept lidar points relative to the '
+    'lidar')
+flags.DEFINE_float(
+    'point_cloud_max_height', None,
+    'Maximum height (in metres) of the kept lidar points relative to the '
+    'lidar')
+flags.DEFINE_float(
+    'point_cloud_voxel_size', 0.2,
+    'Leaf size (in metres) of the voxel grid used to downsample point '
+    'clouds. 0 to disable downsampling')
 flags.DEFINE_float(
     'offset_left_right_cameras', 0.4,
     'How much we offset the left and right cameras from the center.')
+flags.DEFINE_bool(
+    'perception_pipelining', False,
+    'True to run the pre-processing, inference, and post-processing of the '
+    'detection, traffic light detection, and segmentation operators on '
+    'separate threads, overlapping consecutive frames')
+flags.DEFINE_integer(
+    'perception_pipeline_queue_size', 1,
+    'Maximum number of frames that wait before each pipeline stage')
+flags.DEFINE_integer(
+    'inference_cpu_threads', 0,
+    'Number of CPU threads used by the perception models. 0 to let the '
+    'frameworks decide')
+flags.DEFINE_integer(
+    'model_warm_up_runs', 1,
+    'Number of dummy inferences the perception operators run when they load '
+    'their models')
+flags.DEFINE_bool(
+    'background_model_loading', False,
+    'True to load the perception models on background threads. The first '
+    'frame of each operator waits until its model is loaded')
 
 ######################################################################
 # Prediction
@@ -133,6 +178,14 @@ flags.DEFINE_bool('evaluate_segmentation', False,
 # Recording operators.
 ########################################
 flags.DEFINE_string('data_path', 'data/', 'Path where to logged data')
+flags.DEFINE_enum(
+    'point_cloud_log_format', 'ply', ['ply', 'bin'],
+    'Format in which to log point clouds: ply, or bin to log float32 '
+    'points in a memory-mappable binary file')
+flags.DEFINE_enum(
+    'depth_log_format', 'pkl', ['pkl', 'float16', 'uint16'],
+    'Format in which to log depth frames: pkl, or float16 or uint16 to log '
+    'encoded depths in a memory-mappable binary file')
 flags.DEFINE_bool('log_detector_output', False,
                   'Enable recording of bbox annotated detector images')
 flags.DEFINE_bool('log_traffic_light_detector_output', False,
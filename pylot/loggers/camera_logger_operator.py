@@ -2,6 +2,8 @@
 
 import erdos
 
+from pylot.perception.depth_frame import DepthFrame
+
 
 class CameraLoggerOperator(erdos.Operator):
     """Logs camera frames to files.
@@ -44,5 +46,10 @@ class CameraLoggerOperator(erdos.Operator):
         self._frame_cnt += 1
         if self._frame_cnt % self._flags.log_every_nth_message != 0:
             return
-        msg.frame.save(msg.timestamp.coordinates[0], self._flags.data_path,
-                       self._filename_prefix)
+        if isinstance(msg.frame, DepthFrame):
+            msg.frame.save(msg.timestamp.coordinates[0],
+                           self._flags.data_path, self._filename_prefix,
+                           self._flags.depth_log_format)
+        else:
+            msg.frame.save(msg.timestamp.coordinates[0],
+                           self._flags.data_path, self._filename_prefix)
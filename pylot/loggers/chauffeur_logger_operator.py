@@ -74,57 +74,50 @@ class ChauffeurLoggerOperator(erdos.Operator):
                                  self._top_down_camera_setup.width, 3),
                                 dtype=np.uint8)
 
-        # Intrinsic and extrinsic matrix of the top down segmentation camera.
-        extrinsic_matrix = self._top_down_camera_setup.get_extrinsic_matrix()
-        intrinsic_matrix = self._top_down_camera_setup.get_intrinsic_matrix()
-
         rotation = pylot.utils.Rotation()
         for obstacle in msg.obstacle_trajectories:
             # Convert to screen points.
-            screen_points = [
-                transform.location.to_camera_view(extrinsic_matrix,
-                                                  intrinsic_matrix)
-                for transform in obstacle.trajectory
-            ]
+            screen_points, _, _ = self._top_down_camera_setup.project_points(
+                pylot.utils.LocationArray.from_locations([
+                    transform.location for transform in obstacle.trajectory
+                ]))
 
             # Keep track of ground vehicle waypoints
             if obstacle.id == self._ground_vehicle_id:
                 self._waypoints = obstacle.trajectory
 
             # Draw trajectory points on segmented image.
-            for point in screen_points:
-                if (0 <= point.x <= self._flags.carla_camera_image_width) and \
-                   (0 <= point.y <= self._flags.carla_camera_image_height):
-                    r = 3
-                    if obstacle.id == self._ground_vehicle_id:
-                        r = 10
-                    cv2.circle(past_poses, (int(point.x), int(point.y)), r,
-                               (100, 100, 100), -1)
+            width = self._flags.carla_camera_image_width
+            height = self._flags.carla_camera_image_height
+            in_view = ((0 <= screen_points[:, 0]) &
+                       (screen_points[:, 0] <= width) &
+                       (0 <= screen_points[:, 1]) &
+                       (screen_points[:, 1] <= height))
+            r = 3
+            if obstacle.id == self._ground_vehicle_id:
+                r = 10
+            for x, y in screen_points[in_view]:
+                cv2.circle(past_poses, (int(x), int(y)), r, (100, 100, 100),
+                           -1)
 
         # Transform to previous and back to current frame
-        self._waypoints = [
-            self._current_transform.transform_locations(
-                self._previous_transform.inverse_transform_locations(
-                    [wp.location]))[0] for wp in self._waypoints
-        ]
+        waypoints = self._current_transform.transform_locations(
+            self._previous_transform.inverse_transform_locations(
+                pylot.utils.LocationArray.from_locations(
+                    [wp.location for wp in self._waypoints])))
 
         # Center first point at 0, 0
-        center_transform = pylot.utils.Transform(self._waypoints[0], rotation)
-        self._waypoints = [
-            center_transform.inverse_transform_locations([wp])[0]
-            for wp in self._waypoints
-        ]
+        center_transform = pylot.utils.Transform(waypoints[0], rotation)
+        waypoints = center_transform.inverse_transform_locations(waypoints)
 
         # Convert to screen points
-        screen_waypoints = [
-            wp.to_camera_view(extrinsic_matrix, intrinsic_matrix)
-            for wp in self._waypoints
-        ]
+        screen_waypoints, _, _ = self._top_down_camera_setup.project_points(
+            waypoints)
 
         # Draw screen points
-        for point in screen_waypoints:
-            cv2.circle(future_poses, (int(point.x), int(point.y)), 10,
-                       (100, 100, 100), -1)
+        for x, y in screen_waypoints:
+            cv2.circle(future_poses, (int(x), int(y)), 10, (100, 100, 100),
+                       -1)
 
         # Log future screen points
         future_poses_img = Image.fromarray(future_poses)
@@ -132,17 +125,16 @@ class ChauffeurLoggerOperator(erdos.Operator):
         file_name = os.path.join(
             self._flags.data_path,
             'future_poses-{}.png'.format(msg.timestamp.coordinates[0] -
-                                         len(self._waypoints) * 100))
+                                         len(waypoints) * 100))
         future_poses_img.save(file_name)
 
         # Log future poses
-        waypoints = [str(wp) for wp in self._waypoints]
         file_name = os.path.join(
             self._flags.data_path,
             'waypoints-{}.json'.format(msg.timestamp.coordinates[0] -
-                                       len(self._waypoints) * 100))
+                                       len(waypoints) * 100))
         with open(file_name, 'w') as outfile:
-            json.dump(waypoints, outfile)
+            json.dump([str(wp) for wp in waypoints], outfile)
 
         # Log past screen points
         past_poses_img = Image.fromarray(past_poses)
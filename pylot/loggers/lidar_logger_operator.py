@@ -47,4 +47,5 @@ class LidarLoggerOperator(erdos.Operator):
         assert len(msg.timestamp.coordinates) == 1
         # Write the lidar information.
         msg.point_cloud.save(msg.timestamp.coordinates[0],
-                             self._flags.data_path, self._filename_prefix)
+                             self._flags.data_path, self._filename_prefix,
+                             self._flags.point_cloud_log_format)
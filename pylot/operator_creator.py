@@ -26,6 +26,8 @@ from pylot.loggers.multiple_object_tracker_logger_operator import \
     MultipleObjectTrackerLoggerOperator
 from pylot.loggers.trajectory_logger_operator import TrajectoryLoggerOperator
 # Perception operators.
+from pylot.perception.detection.batched_detection_operator import \
+    BatchedDetectionOperator
 from pylot.perception.detection.detection_decay_operator import \
     DetectionDecayOperator
 from pylot.perception.detection.detection_eval_operator import \
@@ -40,6 +42,8 @@ from pylot.perception.detection.traffic_light_det_operator import \
 from pylot.perception.fusion.fusion_operator import FusionOperator
 from pylot.perception.fusion.fusion_verification_operator import \
     FusionVerificationOperator
+from pylot.perception.point_cloud_preprocessing_operator import \
+    PointCloudPreprocessingOperator
 from pylot.perception.segmentation.segmentation_decay_operator import \
     SegmentationDecayOperator
 from pylot.perception.segmentation.segmentation_drn_operator import\
@@ -80,6 +84,7 @@ def add_obstacle_detection(camera_stream, csv_file_name=None):
     for i in range(0, len(FLAGS.obstacle_detection_model_paths)):
         op_config = erdos.OperatorConfig(
             name=FLAGS.obstacle_detection_model_names[i],
+            flow_watermarks=not FLAGS.perception_pipelining,
             log_file_name=FLAGS.log_file_name,
             csv_log_file_name=csv_file_name,
             profile_file_name=FLAGS.profile_file_name)
@@ -89,6 +94,32 @@ def add_obstacle_detection(camera_stream, csv_file_name=None):
     return obstacles_streams
 
 
+def add_batched_obstacle_detection(camera_streams, csv_file_name=None):
+    """Adds operators that detect obstacles on several camera streams.
+
+    Each model is loaded once, and runs the frames of all the cameras in
+    batches.
+
+    Returns:
+        list(list(:py:class:`erdos.ReadStream`)): For each model, the
+        obstacles streams of the cameras, in the order of camera_streams.
+    """
+    obstacles_streams = []
+    if csv_file_name is None:
+        csv_file_name = FLAGS.csv_log_file_name
+    for i in range(0, len(FLAGS.obstacle_detection_model_paths)):
+        op_config = erdos.OperatorConfig(
+            name='batched_' + FLAGS.obstacle_detection_model_names[i],
+            log_file_name=FLAGS.log_file_name,
+            csv_log_file_name=csv_file_name,
+            profile_file_name=FLAGS.profile_file_name)
+        obstacles_streams.append(
+            erdos.connect(BatchedDetectionOperator, op_config,
+                          camera_streams,
+                          FLAGS.obstacle_detection_model_paths[i], FLAGS))
+    return obstacles_streams
+
+
 def add_obstacle_location_finder(obstacles_stream, depth_stream,
                                  can_bus_stream, camera_stream, camera_setup):
     """Adds an operator that finds the world locations of the obstacles.
@@ -180,14 +211,22 @@ def add_detection_evaluation(obstacles_stream,
                   [obstacles_stream, ground_obstacles_stream], FLAGS)
 
 
-def add_traffic_light_detector(traffic_light_camera_stream):
-    op_config = erdos.OperatorConfig(name='traffic_light_detector_operator',
-                                     log_file_name=FLAGS.log_file_name,
-                                     csv_log_file_name=FLAGS.csv_log_file_name,
-                                     profile_file_name=FLAGS.profile_file_name)
+def add_traffic_light_detector(traffic_light_camera_stream,
+                               can_bus_stream=None,
+                               traffic_light_locations_stream=None):
+    op_config = erdos.OperatorConfig(
+        name='traffic_light_detector_operator',
+        flow_watermarks=not FLAGS.perception_pipelining,
+        log_file_name=FLAGS.log_file_name,
+        csv_log_file_name=FLAGS.csv_log_file_name,
+        profile_file_name=FLAGS.profile_file_name)
+    read_streams = [traffic_light_camera_stream]
+    if (can_bus_stream is not None
+            and traffic_light_locations_stream is not None):
+        # The detector only runs on the regions of the known traffic lights.
+        read_streams += [can_bus_stream, traffic_light_locations_stream]
     [traffic_lights_stream] = erdos.connect(TrafficLightDetOperator, op_config,
-                                            [traffic_light_camera_stream],
-                                            FLAGS)
+                                            read_streams, FLAGS)
     return traffic_lights_stream
 
 
@@ -251,10 +290,12 @@ def add_depth_estimation(left_camera_stream,
 
 
 def add_segmentation(bgr_camera_stream, name='drn_segmentation_operator'):
-    op_config = erdos.OperatorConfig(name=name,
-                                     log_file_name=FLAGS.log_file_name,
-                                     csv_log_file_name=FLAGS.csv_log_file_name,
-                                     profile_file_name=FLAGS.profile_file_name)
+    op_config = erdos.OperatorConfig(
+        name=name,
+        flow_watermarks=not FLAGS.perception_pipelining,
+        log_file_name=FLAGS.log_file_name,
+        csv_log_file_name=FLAGS.csv_log_file_name,
+        profile_file_name=FLAGS.profile_file_name)
     [segmented_stream] = erdos.connect(SegmentationDRNOperator, op_config,
                                        [bgr_camera_stream], FLAGS)
     return segmented_stream
@@ -446,6 +487,18 @@ def _add_lidar_driver(vehicle_id_stream, lidar_setup):
     return point_cloud_stream
 
 
+def add_point_cloud_preprocessing(
+        point_cloud_stream, name='point_cloud_preprocessing_operator'):
+    op_config = erdos.OperatorConfig(name=name,
+                                     log_file_name=FLAGS.log_file_name,
+                                     csv_log_file_name=FLAGS.csv_log_file_name,
+                                     profile_file_name=FLAGS.profile_file_name)
+    [preprocessed_point_cloud_stream
+     ] = erdos.connect(PointCloudPreprocessingOperator, op_config,
+                       [point_cloud_stream], FLAGS)
+    return preprocessed_point_cloud_stream
+
+
 def add_imu(transform, vehicle_id_stream, name='imu'):
     from pylot.drivers.carla_imu_driver_operator import CarlaIMUDriverOperator
     imu_setup = pylot.drivers.sensor_setup.IMUSetup(name, transform)
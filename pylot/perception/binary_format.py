@@ -0,0 +1,136 @@
+"""Implements a compact binary format for logging sensor data.
+
+A file consists of:
+
+* The magic bytes ``PYLOTBIN``.
+* The length of the header, as a little-endian uint32.
+* The header, a JSON encoded dictionary that stores the timestamp, the
+  sensor setup, and the dtype and shape of the data. The header is padded
+  with spaces so that the data is aligned to 16 bytes.
+* The raw data, in C order.
+
+The data can be memory-mapped, which allows offline tools to stream large
+numbers of frames without decoding them.
+"""
+import glob
+import json
+import numpy as np
+import os
+import struct
+
+import pylot.utils
+
+MAGIC = b'PYLOTBIN'
+_ALIGNMENT = 16
+
+
+def sensor_setup_to_dict(sensor_setup):
+    """Converts a sensor setup to a JSON serializable dictionary.
+
+    Args:
+        sensor_setup: A sensor setup (e.g.,
+            :py:class:`~pylot.drivers.sensor_setup.CameraSetup`), or None.
+
+    Returns:
+        :obj:`dict`: The public attributes of the setup, and the name of its
+        class.
+    """
+    if sensor_setup is None:
+        return None
+    setup = {'class': type(sensor_setup).__name__}
+    for key, value in vars(sensor_setup).items():
+        if key.startswith('_'):
+            continue
+        if isinstance(value, pylot.utils.Transform):
+            value = {
+                'location': value.location.as_numpy_array().tolist(),
+                'rotation': [
+                    value.rotation.pitch, value.rotation.yaw,
+                    value.rotation.roll
+                ]
+            }
+        setup[key] = value
+    return setup
+
+
+def write(file_name, data, timestamp, sensor_setup=None, **header):
+    """Writes an array to a binary file.
+
+    Args:
+        file_name (:obj:`str`): Name of the file to write to.
+        data: The numpy array to write.
+        timestamp (:obj:`int`): Timestamp associated with the data.
+        sensor_setup: The setup of the sensor that produced the data.
+        **header: Additional JSON serializable header entries.
+    """
+    data = np.ascontiguousarray(data)
+    header.update({
+        'timestamp': timestamp,
+        'sensor_setup': sensor_setup_to_dict(sensor_setup),
+        'dtype': data.dtype.str,
+        'shape': list(data.shape),
+    })
+    encoded_header = json.dumps(header).encode('utf-8')
+    prefix_len = len(MAGIC) + 4
+    padding = -(prefix_len + len(encoded_header)) % _ALIGNMENT
+    encoded_header += b' ' * padding
+    with open(file_name, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(encoded_header)))
+        f.write(encoded_header)
+        f.write(data.tobytes())
+
+
+def read(file_name, mmap=True):
+    """Reads a binary file.
+
+    Args:
+        file_name (:obj:`str`): Name of the file to read.
+        mmap (:obj:`bool`): True to memory-map the data instead of reading
+            it.
+
+    Returns:
+        A tuple of the header (:obj:`dict`) and the data (a read-only numpy
+        array).
+    """
+    with open(file_name, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a pylot binary file'.format(file_name))
+        (header_len, ) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+        offset = f.tell()
+        dtype = np.dtype(header['dtype'])
+        shape = tuple(header['shape'])
+        if not mmap or np.prod(shape) == 0:
+            data = np.fromfile(f, dtype=dtype).reshape(shape)
+            data.setflags(write=False)
+            return header, data
+    data = np.memmap(file_name,
+                     dtype=dtype,
+                     mode='r',
+                     offset=offset,
+                     shape=shape)
+    return header, data
+
+
+def iterate(data_path, file_base, mmap=True):
+    """Iterates over the binary files logged by a sensor, in timestamp order.
+
+    Args:
+        data_path (:obj:`str`): Path where the files are stored.
+        file_base (:obj:`str`): Base name of the files.
+        mmap (:obj:`bool`): True to memory-map the data.
+
+    Yields:
+        Tuples of the header (:obj:`dict`) and the data of each file.
+    """
+    file_names = glob.glob(
+        os.path.join(glob.escape(data_path),
+                     '{}-*.bin'.format(glob.escape(file_base))))
+    frames = []
+    for file_name in file_names:
+        timestamp = os.path.basename(file_name)[len(file_base) + 1:-4]
+        if timestamp.isdigit():
+            frames.append((int(timestamp), file_name))
+    for _, file_name in sorted(frames):
+        yield read(file_name, mmap)
@@ -10,6 +10,18 @@ import pylot.utils
 class CameraFrame(object):
     """Class that stores camera frames.
 
+    The frame may be a view of a buffer that is shared with other operators
+    (e.g., the buffer of a CARLA image). The arrays returned by the
+    ``as_*_numpy_array`` methods are read-only, contiguous uint8 arrays that
+    are computed at most once per frame and shared by all the callers;
+    callers that need to modify them must copy them first. The frame does
+    not own the array it is created with, which can be shared with other
+    frames (e.g., of other consumers of the same sensor data). The first
+    call of a method that draws on the frame (e.g.,
+    :py:func:`.annotate_with_bounding_boxes`) replaces the array with a
+    private copy, so the drawings never leak into a buffer the frame does
+    not own.
+
     Args:
         frame: A numpy array storring the frame.
         camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
@@ -27,11 +39,21 @@ class CameraFrame(object):
             raise ValueError('Unsupported encoding {}'.format(encoding))
         self.encoding = encoding
         self.camera_setup = camera_setup
+        # Read-only contiguous materializations of the frame, keyed by
+        # encoding (BGR | RGB | GRAY).
+        self._cached_arrays = {}
+        # The private copy of the frame that is drawn on, once it is made.
+        # The frame attribute can be reassigned, in which case the new array
+        # is not owned either.
+        self._owned_frame = None
 
     @classmethod
     def from_carla_frame(cls, carla_frame, camera_setup):
         """Creates a pylot camera frame from a CARLA frame.
 
+        The frame is a view of the BGRA buffer of the CARLA frame; it is not
+        copied.
+
         Returns:
             :py:class:`.CameraFrame`: A BGR camera frame.
         """
@@ -43,22 +65,53 @@ class CameraFrame(object):
         return cls(_frame[:, :, :3], 'BGR', camera_setup)
 
     def as_numpy_array(self):
-        """Returns the camera frame as a numpy array."""
-        return self.frame.astype(np.uint8)
+        """Returns the camera frame as a read-only numpy array encoded
+        with the encoding of the frame."""
+        return self._get_array(self.encoding)
 
     def as_bgr_numpy_array(self):
-        """Returns the camera frame as a BGR encoded numpy array."""
-        if self.encoding == 'RGB':
-            return self.frame[:, :, ::-1]
-        else:
-            return self.frame
+        """Returns the camera frame as a read-only BGR encoded numpy array."""
+        return self._get_array('BGR')
 
     def as_rgb_numpy_array(self):
-        """Returns the camera frame as a RGB encoded numpy array."""
-        if self.encoding == 'BGR':
-            return self.frame[:, :, ::-1]
-        else:
-            return self.frame
+        """Returns the camera frame as a read-only RGB encoded numpy array."""
+        return self._get_array('RGB')
+
+    def as_gray_numpy_array(self):
+        """Returns the camera frame as a read-only grayscale numpy array."""
+        return self._get_array('GRAY')
+
+    def _get_array(self, encoding):
+        array = self._cached_arrays.get(encoding)
+        if array is None:
+            if encoding == 'GRAY':
+                array = cv2.cvtColor(self._get_array('BGR'),
+                                     cv2.COLOR_BGR2GRAY)
+            elif encoding == self.encoding:
+                # Does not copy if the frame is already contiguous uint8.
+                array = np.ascontiguousarray(self.frame, dtype=np.uint8)
+            else:
+                array = np.ascontiguousarray(self.frame[:, :, ::-1],
+                                             dtype=np.uint8)
+            # Return a read-only view in order to not change the flags of
+            # the frame.
+            array = array.view()
+            array.setflags(write=False)
+            self._cached_arrays[encoding] = array
+        return array
+
+    def _get_writable_frame(self):
+        """Returns the frame so that it can be drawn on.
+
+        The frame is copied on the first draw, because the array it was
+        created with may be shared, and the cached materializations are
+        invalidated.
+        """
+        if self.frame is not self._owned_frame:
+            self.frame = np.array(self.frame, dtype=np.uint8)
+            self._owned_frame = self.frame
+        self._cached_arrays = {}
+        return self.frame
 
     def annotate_with_bounding_boxes(
         self,
@@ -66,25 +119,25 @@ class CameraFrame(object):
         detected_obstacles,
         transform=None,
         bbox_color_map=pylot.perception.detection.utils.GROUND_COLOR_MAP):
-        pylot.utils.add_timestamp(self.frame, timestamp)
+        frame = self._get_writable_frame()
+        pylot.utils.add_timestamp(frame, timestamp)
         for obstacle in detected_obstacles:
-            obstacle.visualize_on_img(self.frame,
+            obstacle.visualize_on_img(frame,
                                       bbox_color_map,
                                       ego_transform=transform)
 
     def visualize(self, window_name, timestamp=None):
         """Creates a cv2 window to visualize the camera frame."""
-        if self.encoding != 'BGR':
-            image_np = self.as_bgr_numpy_array()
-        else:
-            image_np = self.frame
+        image_np = self.as_bgr_numpy_array()
         if timestamp is not None:
+            image_np = np.copy(image_np)
             pylot.utils.add_timestamp(image_np, timestamp)
         cv2.imshow(window_name, image_np)
         cv2.waitKey(1)
 
     def draw_point(self, point, color, r=3):
-        cv2.circle(self.frame, (int(point.x), int(point.y)), r, color, -1)
+        cv2.circle(self._get_writable_frame(), (int(point.x), int(point.y)),
+                   r, color, -1)
 
     def save(self, timestamp, data_path, file_base):
         """Saves the camera frame to a file.
@@ -94,10 +147,7 @@ class CameraFrame(object):
             data_path (:obj:`str`): Path where to save the camera frame.
             file_base (:obj:`str`): Base name of the file.
         """
-        if self.encoding != 'RGB':
-            image_np = self.as_rgb_numpy_array()
-        else:
-            image_np = self.frame
+        image_np = self.as_rgb_numpy_array()
         file_name = os.path.join(data_path,
                                  '{}-{}.png'.format(file_base, timestamp))
         img = Image.fromarray(image_np)
@@ -1,11 +1,50 @@
 import numpy as np
 from numpy.linalg import inv
-from numpy.matlib import repmat
 import os
 import pickle
 
+import pylot.perception.binary_format as binary_format
 import pylot.utils
 
+# Cache of the unit-depth rays of the pixels of a camera, keyed by the
+# (width, height, fov) of the camera.
+_RAY_GRID_CACHE = {}
+
+
+def get_unit_depth_rays(camera_setup):
+    """Returns the rays that unproject the pixels of a camera to 3D points.
+
+    The rays depend only on the intrinsics of the camera, so they are computed
+    once per (width, height, fov) and cached.
+
+    Args:
+        camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
+            The setup of the camera.
+
+    Returns:
+        A read-only (width * height) by 3 float32 numpy array, where row
+        v * width + u is the location, in camera coordinates, of the point
+        at depth 1 that projects to pixel (u, v).
+    """
+    key = (camera_setup.width, camera_setup.height, camera_setup.fov)
+    rays = _RAY_GRID_CACHE.get(key)
+    if rays is None:
+        width, height = camera_setup.width, camera_setup.height
+        # 2d pixel coordinates
+        u_coord, v_coord = np.meshgrid(np.arange(width), np.arange(height))
+        # p2d = [u,v,1]
+        p2d = np.stack([
+            u_coord.ravel(),
+            v_coord.ravel(),
+            np.ones(width * height)
+        ])
+        # P = [X,Y,Z]
+        rays = np.dot(inv(camera_setup.get_intrinsic_matrix()),
+                      p2d).T.astype(np.float32)
+        rays.setflags(write=False)
+        _RAY_GRID_CACHE[key] = rays
+    return rays
+
 
 class DepthFrame(object):
     """Class that stores depth frames.
@@ -14,37 +53,56 @@ class DepthFrame(object):
         frame: A numpy array storing the depth frame.
         camera_setup (:py:class:`~pylot.drivers.sensor_setup.DepthCameraSetup`):
             The camera setup used by the sensor that generated this frame.
+        in_meters (:obj:`bool`): True if the frame stores depths in metres,
+            False if it stores depths normalized between [0.0, 1.0].
 
     Attributes:
         frame: A numpy array storing the depth frame.
         camera_setup (:py:class:`~pylot.drivers.sensor_setup.DepthCameraSetup`):
             The camera setup used by the sensor that generated this frame.
+        in_meters (:obj:`bool`): True if the frame stores depths in metres,
+            False if it stores depths normalized between [0.0, 1.0].
     """
-    def __init__(self, frame, camera_setup):
+    def __init__(self, frame, camera_setup, in_meters=False):
         self.frame = frame
         self.camera_setup = camera_setup
-        # Attribute used to cache the depth frame as a point cloud. We're doing
-        # this because it is computationally expensive to transform a depth
-        # frame to a point cloud.
-        self._cached_point_cloud = None
+        self.in_meters = in_meters
 
     @classmethod
-    def from_carla_frame(cls, frame, camera_setup):
+    def from_carla_frame(cls, frame, camera_setup, dtype=np.float32,
+                         in_meters=False):
         """Creates a pylot depth frame from a carla depth frame.
 
+        Args:
+            frame: A carla.Image encoding the depth in its color channels.
+            camera_setup (:py:class:`~pylot.drivers.sensor_setup.DepthCameraSetup`):
+                The camera setup used by the sensor that generated the frame.
+            dtype: Data type of the depth frame (np.float32 or np.float16).
+            in_meters (:obj:`bool`): If True, the depths are stored in metres
+                instead of normalized between [0.0, 1.0].
+
         Returns:
             :py:class:`.DepthFrame`: A depth frame.
         """
-        # Convert an image containing CARLA encoded depth-map to a 2D
-        # array containing the depth value of each pixel normalized
-        # between [0.0, 1.0]
-        _frame = np.frombuffer(frame.raw_data, dtype=np.dtype("uint8"))
-        _frame = np.reshape(_frame, (frame.height, frame.width, 4))
-        frame = _frame.astype(np.float32)
-        # Apply (R + G * 256 + B * 256 * 256) / (256 * 256 * 256 - 1).
-        frame = np.dot(frame[:, :, :3], [65536.0, 256.0, 1.0])
-        frame /= 16777215.0  # (256.0 * 256.0 * 256.0 - 1.0)
-        return cls(frame, camera_setup)
+        # CARLA encodes the depth as (R + G * 256 + B * 256 * 256) /
+        # (256 * 256 * 256 - 1). Each pixel is stored as BGRA bytes, so
+        # reading the pixels as big-endian uint32 and dropping the alpha byte
+        # yields the 24-bit encoded depth without any float64 intermediates.
+        encoded = np.frombuffer(frame.raw_data, dtype=np.dtype('>u4')) >> 8
+        scale = 1.0 / 16777215.0  # (256.0 * 256.0 * 256.0 - 1.0)
+        if in_meters:
+            scale *= 1000.0
+        # The 24-bit encoded depths are represented exactly in float32.
+        depth = np.multiply(encoded, np.float32(scale), dtype=np.float32)
+        if dtype != np.float32:
+            depth = depth.astype(dtype)
+        depth = np.reshape(depth, (frame.height, frame.width))
+        return cls(depth, camera_setup, in_meters)
+
+    @property
+    def meters_per_unit(self):
+        """Factor that converts the values of the frame to metres."""
+        return 1.0 if self.in_meters else 1000.0
 
     def as_numpy_array(self):
         """Returns the depth frame as a numpy array."""
@@ -52,7 +110,8 @@ class DepthFrame(object):
 
     def pixel_has_same_depth(self, x, y, z, threshold):
         """Checks if the depth of pixel (y,x) is within threshold of z."""
-        return abs(self.frame[int(y)][int(x)] * 1000 - z) < threshold
+        return abs(self.frame[int(y)][int(x)] * self.meters_per_unit -
+                   z) < threshold
 
     def as_point_cloud(self):
         """Converts the depth frame to a 1D array containing the 3D
@@ -61,59 +120,167 @@ class DepthFrame(object):
         See :py:class:`~pylot.drivers.sensor_setup.CameraSetup` for
         coordinate axis orientations.
         """
-        far = 1000.0  # max depth in meters.
-        intrinsic_mat = self.camera_setup.get_intrinsic_matrix()
-        width, height = self.camera_setup.width, self.camera_setup.height
-        # 2d pixel coordinates
-        pixel_length = width * height
-        u_coord = repmat(np.r_[0:width:1], height, 1).reshape(pixel_length)
-        v_coord = repmat(np.c_[0:height:1], 1, width).reshape(pixel_length)
-        normalized_depth = np.reshape(self.frame, pixel_length)
-
-        # p2d = [u,v,1]
-        p2d = np.array([u_coord, v_coord, np.ones_like(u_coord)])
-
-        # P = [X,Y,Z]
-        p3d = np.dot(inv(intrinsic_mat), p2d)
-        p3d *= normalized_depth * far
+        rays = get_unit_depth_rays(self.camera_setup)
+        depth = np.reshape(self.frame, (-1, 1))
 
         # [[X1,Y1,Z1],[X2,Y2,Z2], ... [Xn,Yn,Zn]]
-        locations = np.asarray(np.transpose(p3d))
+        locations = rays * (depth * self.meters_per_unit)
         # Transform the points in 3D world coordinates.
-        to_world_transform = self.camera_setup.get_unreal_transform()
-        point_cloud = to_world_transform.transform_points(locations)
+        to_world_matrix = self.camera_setup.get_unreal_transform().matrix
+        point_cloud = np.dot(locations, to_world_matrix[:3, :3].T)
+        point_cloud += to_world_matrix[:3, 3]
         return point_cloud
 
-    def get_pixel_locations(self, pixels):
+    def get_pixel_locations(self, pixels, window_size=1):
         """ Gets the 3D world locations from pixel coordinates.
 
+        Only the requested pixels are unprojected, so the cost of the query is
+        linear in the number of pixels rather than in the size of the frame.
+        Use :py:func:`.as_point_cloud` to convert the entire frame.
+
         Args:
-            pixels: List of pylot.utils.Vector2D pixel coordinates.
+            pixels: List of pylot.utils.Vector2D pixel coordinates, a
+                pylot.utils.Vector2DArray, or a N by 2 numpy array of (x, y)
+                integer pixel coordinates.
+            window_size (:obj:`int`): If greater than 1, the depth of each
+                pixel is the median depth of the window_size by window_size
+                window centered on the pixel. The median is robust to depth
+                discontinuities at the edges of the obstacles.
+
         Returns:
-            List of pylot.utils.Locations
+            List of pylot.utils.Locations, or a pylot.utils.LocationArray if
+            pixels is a pylot.utils.Vector2DArray or a numpy array.
         """
-        if self._cached_point_cloud is None:
-            self._cached_point_cloud = self.as_point_cloud()
-        pixel_locations = [
-            self._cached_point_cloud[pixel.y * self.camera_setup.width +
-                                     pixel.x] for pixel in pixels
+        if isinstance(pixels, pylot.utils.Vector2DArray):
+            pixel_coords = pixels.as_numpy_array()
+        elif isinstance(pixels, np.ndarray):
+            pixel_coords = pixels
+        else:
+            pixel_coords = np.array([[pixel.x, pixel.y] for pixel in pixels])
+        pixel_coords = np.reshape(pixel_coords, (-1, 2)).astype(np.int64)
+        if window_size > 1:
+            depths = self.get_window_depths(pixel_coords, window_size)
+        else:
+            depths = np.asarray(self.frame)[pixel_coords[:, 1],
+                                            pixel_coords[:, 0]]
+        locations = self._unproject(pixel_coords, depths)
+        if isinstance(pixels, (pylot.utils.Vector2DArray, np.ndarray)):
+            return pylot.utils.LocationArray(locations)
+        return [
+            pylot.utils.Location(loc[0], loc[1], loc[2]) for loc in locations
         ]
-        return [pylot.utils.Location(loc[0], loc[1], loc[2])
-                    for loc in pixel_locations]
 
-    def save(self, timestamp, data_path, file_base):
+    def get_window_depths(self, pixels, window_size, statistic=np.median):
+        """Computes a depth statistic over a window around each pixel.
+
+        Args:
+            pixels: A N by 2 numpy array of (x, y) integer pixel coordinates.
+            window_size (:obj:`int`): Size of the square window centered on
+                each pixel. The windows are clipped to the frame.
+            statistic: Function that reduces an array along an axis (e.g.,
+                np.median, np.min).
+
+        Returns:
+            A numpy array of N depths, in the units of the frame.
+        """
+        frame = np.asarray(self.frame)
+        height, width = frame.shape
+        pixels = np.reshape(pixels, (-1, 2)).astype(np.int64)
+        offsets = np.arange(window_size) - window_size // 2
+        # (N, window_size) rows and columns of the windows.
+        xs = np.clip(pixels[:, 0:1] + offsets, 0, width - 1)
+        ys = np.clip(pixels[:, 1:2] + offsets, 0, height - 1)
+        windows = frame[ys[:, :, None], xs[:, None, :]]
+        return statistic(windows.reshape(len(pixels), -1), axis=1)
+
+    def get_bounding_box_depths(self, bboxes, statistic=np.median):
+        """Computes a depth statistic over the pixels of each bounding box.
+
+        Args:
+            bboxes (list(:py:class:`~pylot.perception.detection.utils.BoundingBox2D`)):
+                Bounding boxes in the frame.
+            statistic: Function that reduces an array to a scalar (e.g.,
+                np.median, np.min).
+
+        Returns:
+            A numpy array of depths (in metres), one per bounding box. The
+            depth is NaN for bounding boxes that do not overlap the frame.
+        """
+        frame = np.asarray(self.frame)
+        depths = np.full(len(bboxes), np.nan)
+        for index, bbox in enumerate(bboxes):
+            crop = frame[max(bbox.y_min, 0):max(bbox.y_max, 0),
+                         max(bbox.x_min, 0):max(bbox.x_max, 0)]
+            if crop.size > 0:
+                depths[index] = statistic(crop) * self.meters_per_unit
+        return depths
+
+    def _unproject(self, pixels, depths):
+        """Converts pixels and their depths to world locations."""
+        p2d = np.column_stack((pixels, np.ones(len(pixels))))
+        intrinsic_inv = inv(self.camera_setup.get_intrinsic_matrix())
+        locations = np.dot(p2d, intrinsic_inv.T)
+        locations *= np.reshape(depths, (-1, 1)) * self.meters_per_unit
+        to_world_matrix = self.camera_setup.get_unreal_transform().matrix
+        locations = np.dot(locations, to_world_matrix[:3, :3].T)
+        locations += to_world_matrix[:3, 3]
+        return locations
+
+    @classmethod
+    def from_binary_file(cls, file_name, camera_setup=None):
+        """Creates a depth frame from a file saved in a binary format.
+
+        Args:
+            file_name (:obj:`str`): Name of the .bin file.
+            camera_setup (:py:class:`~pylot.drivers.sensor_setup.DepthCameraSetup`):
+                The camera setup used by the sensor that generated the frame.
+
+        Returns:
+            :py:class:`.DepthFrame`: A float32 depth frame.
+        """
+        header, data = binary_format.read(file_name)
+        frame = np.multiply(data, np.float32(header['depth_scale']),
+                            dtype=np.float32)
+        return cls(frame, camera_setup, header['in_meters'])
+
+    def save(self, timestamp, data_path, file_base, file_format='pkl'):
         """Saves the depth frame to a file.
 
         Args:
             timestamp (:obj:`int`): Timestamp associated with the depth frame.
             data_path (:obj:`str`): Path where to save the depth frame.
             file_base (:obj:`str`): Base name of the file.
+            file_format (:obj:`str`): pkl to pickle the frame, or float16 or
+                uint16 to save the frame with the given encoding in a
+                :py:mod:`~pylot.perception.binary_format` .bin file.
         """
+        if file_format == 'pkl':
+            file_name = os.path.join(data_path,
+                                     '{}-{}.pkl'.format(file_base, timestamp))
+            pickle.dump(self.as_numpy_array(),
+                        open(file_name, 'wb'),
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            return
+        frame = np.asarray(self.frame)
+        if file_format == 'float16':
+            data = frame.astype(np.float16)
+            depth_scale = 1.0
+        elif file_format == 'uint16':
+            # Quantize the depth range of the frame to 16 bits.
+            max_depth = 1000.0 / self.meters_per_unit
+            depth_scale = max_depth / 65535
+            data = np.rint(np.clip(frame, 0, max_depth) /
+                           depth_scale).astype(np.uint16)
+        else:
+            raise ValueError('Unexpected file format {}'.format(file_format))
         file_name = os.path.join(data_path,
-                                 '{}-{}.pkl'.format(file_base, timestamp))
-        pickle.dump(self.as_numpy_array(),
-                    open(file_name, 'wb'),
-                    protocol=pickle.HIGHEST_PROTOCOL)
+                                 '{}-{}.bin'.format(file_base, timestamp))
+        binary_format.write(file_name,
+                            data,
+                            timestamp,
+                            self.camera_setup,
+                            depth_scale=depth_scale,
+                            in_meters=self.in_meters)
 
     def __repr__(self):
         return self.__str__()
@@ -0,0 +1,162 @@
+"""Implements an operator that detects obstacles on several cameras with
+batched inference."""
+
+import threading
+import time
+
+from absl import flags
+import erdos
+
+from pylot.perception.detection.detection_operator import DetectionOperator
+from pylot.perception.detection.frame_batcher import FrameBatcher
+from pylot.perception.messages import ObstaclesMessage
+from pylot.utils import time_epoch_ms
+
+flags.DEFINE_integer(
+    'obstacle_detection_max_batch_size', 8,
+    'Maximum number of frames the batched detector runs in one model call')
+flags.DEFINE_float(
+    'obstacle_detection_batch_deadline', 10.0,
+    'Maximum time (in ms) the batched detector waits for frames of other '
+    'cameras before it runs a batch')
+
+
+class BatchedDetectionOperator(DetectionOperator):
+    """Detects obstacles on several camera streams using a TensorFlow model.
+
+    The operator loads the model once for all the cameras. It gathers the
+    frames of the cameras that share a timestamp, or that arrive within a
+    deadline, and runs them through the model in a single batched call. The
+    obstacles are sent on the obstacles stream of the camera of each frame.
+    A timer thread runs the frames that exceed the deadline while no other
+    frames arrive.
+
+    Args:
+        streams: The camera streams (:py:class:`erdos.ReadStream`), followed
+            by an equal number of obstacles streams
+            (:py:class:`erdos.WriteStream`), one per camera, on which the
+            operator sends
+            :py:class:`~pylot.perception.messages.ObstaclesMessage` messages.
+        model_path(:obj:`str`): Path to the model pb file.
+        flags (absl.flags): Object to be used to access absl flags.
+    """
+    def __init__(self, *args):
+        *streams, model_path, flags = args
+        assert len(streams) > 0 and len(streams) % 2 == 0, \
+            'Expects a obstacles stream for each camera stream'
+        num_cameras = len(streams) // 2
+        camera_streams = streams[:num_cameras]
+        self._obstacles_streams = streams[num_cameras:]
+        for camera_index, camera_stream in enumerate(camera_streams):
+            camera_stream.add_callback(
+                self._get_camera_callback(camera_index),
+                self._obstacles_streams)
+        erdos.add_watermark_callback(camera_streams, self._obstacles_streams,
+                                     self.on_watermark)
+        self._flags = flags
+        self._logger = erdos.utils.setup_logging(self.config.name,
+                                                 self.config.log_file_name)
+        self._csv_logger = erdos.utils.setup_csv_logging(
+            self.config.name + '-csv', self.config.csv_log_file_name)
+        self._start_model_loading(model_path)
+        self._batcher = FrameBatcher(
+            num_cameras, flags.obstacle_detection_max_batch_size,
+            flags.obstacle_detection_batch_deadline)
+        # Unique bounding box id. Incremented for each bounding box.
+        self._unique_id = 0
+        # Guards the batcher, and serializes the batches of the callbacks and
+        # of the timer thread. It is notified when frames are buffered.
+        self._condition = threading.Condition()
+        timer = threading.Thread(target=self._run_expired_batches,
+                                 name='{}-timer'.format(self.config.name))
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def connect(*camera_streams):
+        """Connects the operator to other streams.
+
+        Args:
+            camera_streams (:py:class:`erdos.ReadStream`): The streams on
+                which camera frames are received.
+
+        Returns:
+            list(:py:class:`erdos.WriteStream`): Streams on which the operator
+            sends :py:class:`~pylot.perception.messages.ObstaclesMessage`
+            messages, one for each camera stream.
+        """
+        return [erdos.WriteStream() for _ in camera_streams]
+
+    def _get_camera_callback(self, camera_index):
+        def on_msg_camera_stream(msg, *obstacles_streams):
+            self._logger.debug('@{}: {} received message from camera {}'.
+                               format(msg.timestamp, self.config.name,
+                                      camera_index))
+            with self._condition:
+                for batch in self._batcher.add(camera_index, msg):
+                    self._run_batch(batch)
+                self._condition.notify()
+
+        return on_msg_camera_stream
+
+    def on_watermark(self, timestamp, *obstacles_streams):
+        """Runs the frames that are still buffered for the timestamp.
+
+        Args:
+            timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp
+                of the watermark.
+        """
+        self._logger.debug('@{}: received watermark'.format(timestamp))
+        with self._condition:
+            for batch in self._batcher.flush(timestamp):
+                self._run_batch(batch)
+
+    def _run_expired_batches(self):
+        """Runs the frames that exceed the deadline before other frames
+        arrive."""
+        with self._condition:
+            while True:
+                deadline = self._batcher.get_deadline()
+                if deadline is None:
+                    self._condition.wait()
+                elif deadline > time.time():
+                    self._condition.wait(deadline - time.time())
+                else:
+                    for batch in self._batcher.release_expired():
+                        try:
+                            self._run_batch(batch)
+                        except Exception:
+                            # The timer must keep running for the next
+                            # frames.
+                            self._logger.exception(
+                                'Failed to run expired frames')
+
+    @erdos.profile_method()
+    def _run_batch(self, batch):
+        """Runs a batch of (camera index, frame message) tuples, and sends
+        the obstacles of each frame on the stream of its camera."""
+        self._model_loader.wait()
+        start_time = time.time()
+        # Frames can only be stacked if they have the same resolution.
+        frames_per_resolution = {}
+        for camera_index, msg in batch:
+            resolution = (msg.frame.camera_setup.width,
+                          msg.frame.camera_setup.height)
+            frames_per_resolution.setdefault(resolution, []).append(
+                (camera_index, msg))
+        results = []
+        for frames in frames_per_resolution.values():
+            obstacles = self._detect_obstacles(
+                [msg.frame for _, msg in frames])
+            results.extend(zip(frames, obstacles))
+        # The runtime of the batch is attributed to each of its frames.
+        runtime = (time.time() - start_time) * 1000
+        self._csv_logger.info('{},{},{},{}'.format(time_epoch_ms(),
+                                                   self.config.name,
+                                                   'batch_size', len(batch)))
+        for (camera_index, msg), obstacles in results:
+            self._logger.debug('@{}: {} obstacles on camera {}: {}'.format(
+                msg.timestamp, self.config.name, camera_index, obstacles))
+            self._annotate_frame(msg, obstacles)
+            self._obstacles_streams[camera_index].send(
+                ObstaclesMessage(msg.timestamp, obstacles, runtime))
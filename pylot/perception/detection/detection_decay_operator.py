@@ -1,7 +1,8 @@
 from collections import deque
 import erdos
 
-from pylot.perception.detection.utils import get_precision_recall_at_iou
+from pylot.perception.detection.utils import get_precision_recall, \
+    iou_matrix, match_bounding_boxes
 from pylot.utils import time_epoch_ms
 
 
@@ -45,11 +46,9 @@ class DetectionDecayOperator(erdos.Operator):
         # not moving at the beginning.
         assert len(msg.timestamp.coordinates) == 1
         game_time = msg.timestamp.coordinates[0]
-        bboxes = []
         # Select the person bounding boxes.
-        for obstacle in msg.obstacles:
-            if obstacle.label == 'person':
-                bboxes.append(obstacle.bounding_box)
+        obstacles = msg.obstacle_array
+        bboxes = obstacles.bboxes[obstacles.get_label_mask({'person'})]
 
         # Remove the buffered bboxes that are too old.
         while (len(self._ground_bboxes) > 0
@@ -63,10 +62,15 @@ class DetectionDecayOperator(erdos.Operator):
             # confidence, so we just return the actual precision.
             if (len(bboxes) > 0 or len(old_bboxes) > 0):
                 latency = game_time - old_game_time
+                # Compute the IoUs once, and match them at every threshold.
+                ious = iou_matrix(old_bboxes, bboxes)
                 precisions = []
                 for iou in self._iou_thresholds:
-                    (precision,
-                     _) = get_precision_recall_at_iou(bboxes, old_bboxes, iou)
+                    true_pos = len(match_bounding_boxes(ious, iou))
+                    (precision, _) = get_precision_recall(
+                        true_pos,
+                        len(old_bboxes) - true_pos,
+                        len(bboxes) - true_pos)
                     precisions.append(precision)
                 self._logger.info("Precision {}".format(precisions))
                 avg_precision = float(sum(precisions)) / len(precisions)
@@ -43,6 +43,9 @@ class DetectionEvalOperator(erdos.Operator):
         # Heap storing pairs of (ground/output time, game time).
         self._detector_start_end_times = []
         self._sim_interval = None
+        # IoU thresholds at which the average precision is computed:
+        # 0.5, 0.55, ..., 0.95.
+        self._iou_thresholds = [0.5 + 0.05 * i for i in range(10)]
 
     @staticmethod
     def connect(obstacles_stream, ground_obstacles_stream):
@@ -85,15 +88,27 @@ class DetectionEvalOperator(erdos.Operator):
                 # Get detector output obstacles.
                 obstacles = self.__get_obstacles_at(start_time)
                 if (len(obstacles) > 0 or len(ground_obstacles) > 0):
-                    mAP = pylot.perception.detection.utils.get_mAP(
-                        ground_obstacles, obstacles)
+                    (average_precisions, class_average_precisions) = \
+                        pylot.perception.detection.utils.\
+                        get_average_precisions(ground_obstacles, obstacles,
+                                               self._iou_thresholds)
                     # Get runtime in ms
                     runtime = (time.time() - op_start_time) * 1000
                     self._csv_logger.info('{},{},{},{}'.format(
                         time_epoch_ms(), self.config.name, 'runtime', runtime))
+                    # The first threshold is 0.5.
+                    mAP = average_precisions[0]
                     self._logger.info('mAP is: {}'.format(mAP))
                     self._csv_logger.info('{},{},{},{}'.format(
                         time_epoch_ms(), self.config.name, 'mAP', mAP))
+                    self._csv_logger.info('{},{},{},{}'.format(
+                        time_epoch_ms(), self.config.name, 'mAP@[.5:.95]',
+                        average_precisions.mean()))
+                    for (obstacle_class,
+                         class_aps) in class_average_precisions.items():
+                        self._csv_logger.info('{},{},{},{}'.format(
+                            time_epoch_ms(), self.config.name,
+                            '{}-AP'.format(obstacle_class), class_aps[0]))
                 self._logger.debug('Computing accuracy for {} {}'.format(
                     end_time, start_time))
             else:
@@ -1,21 +1,21 @@
 """Implements an operator that detects obstacles."""
 
-import logging
 import time
 
 from absl import flags
 import erdos
 import numpy as np
-import tensorflow as tf
 
-from pylot.perception.detection.utils import BoundingBox2D, DetectedObstacle,\
+from pylot.perception.detection.utils import DetectedObstacleArray, \
     load_coco_bbox_colors, load_coco_labels
 from pylot.perception.messages import ObstaclesMessage
-from pylot.utils import set_tf_loglevel
+from pylot.perception.model_registry import ModelLoader, \
+    acquire_frozen_graph
+from pylot.perception.pipeline import Pipeline
 
 flags.DEFINE_float(
     'obstacle_detection_gpu_memory_fraction', 0.3,
-    'GPU memory fraction allocated to each obstacle detector operator')
+    'GPU memory fraction allocated to each obstacle detection model')
 flags.DEFINE_float('obstacle_detection_min_score_threshold', 0.5,
                    'Min score threshold for bounding box')
 flags.DEFINE_string('path_coco_labels', 'dependencies/models/pylot.names',
@@ -26,7 +26,15 @@ class DetectionOperator(erdos.Operator):
     """Detects obstacles using a TensorFlow model.
 
     The operator receives frames on a camera stream, and runs a model for each
-    frame.
+    frame. If the --perception_pipelining flag is set, the pre-processing,
+    inference, and post-processing of consecutive frames overlap, and the
+    operator forwards the watermarks once the frames of their timestamps have
+    been sent. The operator must then be connected with flow_watermarks set
+    to False.
+
+    The model is warmed up with --model_warm_up_runs dummy inferences. If
+    --background_model_loading is set, the model loads on a background
+    thread, and the first frame waits until it is ready.
 
     Args:
         camera_stream (:py:class:`erdos.ReadStream`): The stream on which
@@ -43,34 +51,52 @@ class DetectionOperator(erdos.Operator):
         self._flags = flags
         self._logger = erdos.utils.setup_logging(self.config.name,
                                                  self.config.log_file_name)
-        self._detection_graph = tf.Graph()
-        # Load the model from the model file.
-        set_tf_loglevel(logging.ERROR)
-        with self._detection_graph.as_default():
-            od_graph_def = tf.GraphDef()
-            with tf.gfile.GFile(model_path, 'rb') as fid:
-                serialized_graph = fid.read()
-                od_graph_def.ParseFromString(serialized_graph)
-                tf.import_graph_def(od_graph_def, name='')
-
-        self._gpu_options = tf.GPUOptions(
-            per_process_gpu_memory_fraction=flags.
-            obstacle_detection_gpu_memory_fraction)
-        # Create a TensorFlow session.
-        self._tf_session = tf.Session(
-            graph=self._detection_graph,
-            config=tf.ConfigProto(gpu_options=self._gpu_options))
+        self._csv_logger = erdos.utils.setup_csv_logging(
+            self.config.name + '-csv', self.config.csv_log_file_name)
+        self._start_model_loading(model_path)
+        # Unique bounding box id. Incremented for each bounding box.
+        self._unique_id = 0
+        self._pipeline = Pipeline(
+            [self._preprocess, self._infer, self._postprocess],
+            threaded=flags.perception_pipelining,
+            queue_size=flags.perception_pipeline_queue_size,
+            name=self.config.name,
+            logger=self._logger)
+        if self._pipeline.threaded:
+            camera_stream.add_watermark_callback(self.on_watermark,
+                                                 [obstacles_stream])
+
+    def _start_model_loading(self, model_path):
+        """Loads and warms up the model, possibly on a background thread."""
+        self._model_loader = ModelLoader(
+            lambda: self._load_model(model_path), self._warm_up,
+            self._flags.model_warm_up_runs,
+            self._flags.background_model_loading, self.config.name,
+            self._csv_logger)
+
+    def _warm_up(self):
+        """Runs the model on a blank frame of the configured camera size."""
+        self._run_model(
+            np.zeros((1, self._flags.carla_camera_image_height,
+                      self._flags.carla_camera_image_width, 3),
+                     dtype=np.uint8))
+
+    def _load_model(self, model_path):
+        """Acquires the model, which is shared by the operators that use the
+        same model file."""
+        self._model = acquire_frozen_graph(
+            model_path,
+            self._flags.obstacle_detection_gpu_memory_fraction,
+            self._flags.inference_cpu_threads,
+            logger=self._logger)
         # Get the tensors we're interested in.
-        self._image_tensor = self._detection_graph.get_tensor_by_name(
-            'image_tensor:0')
-        self._detection_boxes = self._detection_graph.get_tensor_by_name(
-            'detection_boxes:0')
-        self._detection_scores = self._detection_graph.get_tensor_by_name(
-            'detection_scores:0')
-        self._detection_classes = self._detection_graph.get_tensor_by_name(
+        graph_model = self._model.model
+        self._image_tensor = graph_model.get_tensor('image_tensor:0')
+        self._detection_boxes = graph_model.get_tensor('detection_boxes:0')
+        self._detection_scores = graph_model.get_tensor('detection_scores:0')
+        self._detection_classes = graph_model.get_tensor(
             'detection_classes:0')
-        self._num_detections = self._detection_graph.get_tensor_by_name(
-            'num_detections:0')
+        self._num_detections = graph_model.get_tensor('num_detections:0')
         self._coco_labels = load_coco_labels(self._flags.path_coco_labels)
         self._bbox_colors = load_coco_bbox_colors(self._coco_labels)
         self._important_labels = {
@@ -78,8 +104,16 @@ class DetectionOperator(erdos.Operator):
             'person', 'stop sign', 'parking meter', 'cat', 'dog',
             'speed limit 30', 'speed limit 60', 'speed limit 90'
         }
-        # Unique bounding box id. Incremented for each bounding box.
-        self._unique_id = 0
+        # The COCO classes of the labels, and the label of each COCO class.
+        self._coco_classes = np.array(list(self._coco_labels.keys()))
+        self._important_classes = np.array([
+            coco_class for coco_class, label in self._coco_labels.items()
+            if label in self._important_labels
+        ])
+        self._label_table = [
+            self._coco_labels.get(coco_class, '')
+            for coco_class in range(self._coco_classes.max() + 1)
+        ]
 
     @staticmethod
     def connect(camera_stream):
@@ -110,55 +144,123 @@ class DetectionOperator(erdos.Operator):
         """
         self._logger.debug('@{}: {} received message'.format(
             msg.timestamp, self.config.name))
+        self._pipeline.submit((msg, obstacles_stream))
+
+    def on_watermark(self, timestamp, obstacles_stream):
+        """Forwards the watermark once the frames up to its timestamp have
+        been processed.
+
+        Args:
+            timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp
+                of the watermark.
+            obstacles_stream (:py:class:`erdos.WriteStream`): Stream on which
+                the watermark is forwarded.
+        """
+        self._pipeline.run_after(
+            lambda: obstacles_stream.send(erdos.WatermarkMessage(timestamp)))
+
+    def _preprocess(self, item):
+        msg, obstacles_stream = item
+        # The first frame waits for the model, which is not included in its
+        # runtime.
+        self._model_loader.wait()
         start_time = time.time()
+        return (msg, obstacles_stream, start_time,
+                self._get_model_input([msg.frame]))
+
+    def _infer(self, item):
+        msg, obstacles_stream, start_time, images = item
+        return (msg, obstacles_stream, start_time, self._run_model(images))
+
+    def _postprocess(self, item):
+        msg, obstacles_stream, start_time, outputs = item
+        obstacles = self._get_frame_obstacles([msg.frame], outputs)[0]
+        self._logger.debug('@{}: {} obstacles: {}'.format(
+            msg.timestamp, self.config.name, obstacles))
+        self._annotate_frame(msg, obstacles)
+        # Get runtime in ms. If the operator is pipelined, the runtime also
+        # includes the time the frame waited for the other frames' stages.
+        runtime = (time.time() - start_time) * 1000
+        # Send out obstacles.
+        obstacles_stream.send(
+            ObstaclesMessage(msg.timestamp, obstacles, runtime))
+
+    def _detect_obstacles(self, frames):
+        """Detects obstacles in a batch of frames with a single model run.
+
+        Args:
+            frames (list(:py:class:`~pylot.perception.camera_frame.CameraFrame`)):
+                BGR frames, which must all have the same resolution.
+
+        Returns:
+            list(:py:class:`~pylot.perception.detection.utils.DetectedObstacleArray`):
+            The obstacles detected in each frame.
+        """
+        return self._get_frame_obstacles(
+            frames, self._run_model(self._get_model_input(frames)))
+
+    def _get_model_input(self, frames):
+        """Stacks the frames into the input tensor of the model."""
         # The models expect BGR images.
-        assert msg.frame.encoding == 'BGR', 'Expects BGR frames'
-        # Expand dimensions since the model expects images to have
-        # shape: [1, None, None, 3]
-        image_np_expanded = np.expand_dims(msg.frame.frame, axis=0)
-        (boxes, scores, classes, num_detections) = self._tf_session.run(
+        assert all(frame.encoding == 'BGR' for frame in frames), \
+            'Expects BGR frames'
+        # The model expects images to have shape: [batch, None, None, 3]
+        return np.stack([frame.as_bgr_numpy_array() for frame in frames])
+
+    def _run_model(self, images):
+        """Runs the model, and returns its (boxes, scores, classes,
+        num_detections) outputs."""
+        return self._model(
             [
                 self._detection_boxes, self._detection_scores,
                 self._detection_classes, self._num_detections
             ],
-            feed_dict={self._image_tensor: image_np_expanded})
-
-        num_detections = int(num_detections[0])
-        res_classes = [int(cls) for cls in classes[0][:num_detections]]
-        res_boxes = boxes[0][:num_detections]
-        res_scores = scores[0][:num_detections]
-
-        obstacles = []
-        for i in range(0, num_detections):
-            if res_classes[i] in self._coco_labels:
-                if (res_scores[i] >=
-                        self._flags.obstacle_detection_min_score_threshold
-                        and self._coco_labels[
-                            res_classes[i]] in self._important_labels):
-                    obstacles.append(
-                        DetectedObstacle(BoundingBox2D(
-                            int(res_boxes[i][1] *
-                                msg.frame.camera_setup.width),
-                            int(res_boxes[i][3] *
-                                msg.frame.camera_setup.width),
-                            int(res_boxes[i][0] *
-                                msg.frame.camera_setup.height),
-                            int(res_boxes[i][2] *
-                                msg.frame.camera_setup.height)),
-                                         res_scores[i],
-                                         self._coco_labels[res_classes[i]],
-                                         id=self._unique_id))
-                    self._unique_id += 1
-            else:
-                self._logger.warning('Filtering unknown class: {}'.format(
-                    res_classes[i]))
+            feed_dict={self._image_tensor: images})
 
-        self._logger.debug('@{}: {} obstacles: {}'.format(
-            msg.timestamp, self.config.name, obstacles))
+    def _get_frame_obstacles(self, frames, outputs):
+        """Converts the model outputs to the obstacles of each frame."""
+        (boxes, scores, classes, num_detections) = outputs
+        return [
+            self._get_obstacles(boxes[index], scores[index], classes[index],
+                                int(num_detections[index]),
+                                frame.camera_setup)
+            for index, frame in enumerate(frames)
+        ]
+
+    def _get_obstacles(self, boxes, scores, classes, num_detections,
+                       camera_setup):
+        """Converts the model outputs for a frame to detected obstacles."""
+        res_classes = classes[:num_detections].astype(np.int64)
+        res_boxes = boxes[:num_detections]
+        res_scores = scores[:num_detections]
 
+        known = np.isin(res_classes, self._coco_classes)
+        for res_class in res_classes[~known]:
+            self._logger.warning(
+                'Filtering unknown class: {}'.format(res_class))
+        selected = (known & np.isin(res_classes, self._important_classes) &
+                    (res_scores >=
+                     self._flags.obstacle_detection_min_score_threshold))
+        num_obstacles = np.count_nonzero(selected)
+        width = camera_setup.width
+        height = camera_setup.height
+        # The model returns (y_min, x_min, y_max, x_max) normalized boxes.
+        bboxes = (res_boxes[selected][:, [1, 3, 0, 2]] *
+                  [width, width, height, height]).astype(np.int64)
+        # The label codes of the obstacles are their COCO classes.
+        obstacles = DetectedObstacleArray(
+            bboxes, res_scores[selected], res_classes[selected],
+            self._label_table,
+            np.arange(self._unique_id, self._unique_id + num_obstacles))
+        self._unique_id += num_obstacles
+        return obstacles
+
+    def _annotate_frame(self, msg, obstacles):
+        """Visualizes or logs the frame annotated with the obstacles."""
         if (self._flags.visualize_detected_obstacles
                 or self._flags.log_detector_output):
-            msg.frame.annotate_with_bounding_boxes(msg.timestamp, obstacles,
+            msg.frame.annotate_with_bounding_boxes(msg.timestamp,
+                                                   obstacles.as_obstacles(),
                                                    None, self._bbox_colors)
             if self._flags.visualize_detected_obstacles:
                 msg.frame.visualize(self.config.name)
@@ -166,9 +268,3 @@ class DetectionOperator(erdos.Operator):
                 msg.frame.save(msg.timestamp.coordinates[0],
                                self._flags.data_path,
                                'detector-{}'.format(self.config.name))
-
-        # Get runtime in ms.
-        runtime = (time.time() - start_time) * 1000
-        # Send out obstacles.
-        obstacles_stream.send(
-            ObstaclesMessage(msg.timestamp, obstacles, runtime))
@@ -0,0 +1,149 @@
+"""Implements the policy that groups camera frames into inference batches."""
+
+import time
+
+
+class FrameBatcher(object):
+    """Groups the frames of several cameras into inference batches.
+
+    Frames are buffered in arrival order. A batch is released as soon as the
+    frames of all the cameras for a timestamp have arrived, when the buffer
+    holds max_batch_size frames, or when the oldest buffered frame has waited
+    for longer than the deadline. The released batches include all the
+    buffered frames, oldest first, so frames of cameras that run ahead are
+    batched together with the frames of the previous timestamps.
+
+    The batcher does not keep time itself: the deadline is checked when
+    frames are added, and when :py:func:`.release_expired` is invoked (e.g.,
+    by a timer that waits until :py:func:`.get_deadline`).
+
+    Args:
+        num_cameras (:obj:`int`): Number of cameras that send frames.
+        max_batch_size (:obj:`int`): Maximum number of frames in a batch.
+        deadline (:obj:`float`): Maximum time (in ms) a frame is buffered
+            before it is released in a batch, even if the frames of the
+            other cameras have not arrived.
+    """
+    def __init__(self, num_cameras, max_batch_size, deadline):
+        if num_cameras < 1:
+            raise ValueError('At least one camera is required')
+        if max_batch_size < 1:
+            raise ValueError(
+                'Unexpected max batch size {}'.format(max_batch_size))
+        self._num_cameras = num_cameras
+        self._max_batch_size = max_batch_size
+        self._deadline = deadline / 1000.0
+        # List of (arrival time, camera index, message) tuples, in arrival
+        # order.
+        self._frames = []
+        # Number of buffered frames for each timestamp.
+        self._num_frames_per_timestamp = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add(self, camera_index, msg, arrival_time=None):
+        """Buffers a frame message, and releases the batches that are ready.
+
+        Args:
+            camera_index (:obj:`int`): Index of the camera that sent the
+                frame.
+            msg: The frame message received from the camera.
+            arrival_time (:obj:`float`): Time (in seconds) at which the frame
+                arrived. Defaults to the current time.
+
+        Returns:
+            list(list(tuple)): Batches of (camera index, message) tuples
+            that are ready to be run.
+        """
+        if arrival_time is None:
+            arrival_time = time.time()
+        self._frames.append((arrival_time, camera_index, msg))
+        key = self._get_key(msg)
+        self._num_frames_per_timestamp[key] = \
+            self._num_frames_per_timestamp.get(key, 0) + 1
+        return self.release_expired(arrival_time)
+
+    def get_deadline(self):
+        """Returns the time (in seconds) at which the oldest buffered frame
+        exceeds the deadline, or None if no frames are buffered."""
+        if not self._frames:
+            return None
+        return self._frames[0][0] + self._deadline
+
+    def release_expired(self, now=None):
+        """Releases the batches that are ready, including the frames that
+        have exceeded the deadline.
+
+        Args:
+            now (:obj:`float`): The current time (in seconds). Defaults to
+                the current time.
+
+        Returns:
+            list(list(tuple)): Batches of (camera index, message) tuples
+            that are ready to be run.
+        """
+        if now is None:
+            now = time.time()
+        batches = []
+        while self._is_batch_ready(now):
+            batches.append(self._pop(self._max_batch_size))
+        return batches
+
+    def flush(self, timestamp=None):
+        """Releases the buffered frames with timestamps up to timestamp.
+
+        Args:
+            timestamp (:py:class:`erdos.Timestamp`): The frames of this and
+                of earlier timestamps are released (e.g., upon receiving a
+                watermark). All the frames are released if None.
+
+        Returns:
+            list(list(tuple)): Batches of (camera index, message) tuples.
+        """
+        if timestamp is None:
+            released = self._frames
+            self._frames = []
+        else:
+            key = tuple(timestamp.coordinates)
+            released = [
+                frame for frame in self._frames
+                if self._get_key(frame[2]) <= key
+            ]
+            self._frames = [
+                frame for frame in self._frames
+                if self._get_key(frame[2]) > key
+            ]
+        for _, _, msg in released:
+            self._remove_from_count(msg)
+        return [
+            [(camera_index, msg)
+             for _, camera_index, msg in released[i:i + self._max_batch_size]]
+            for i in range(0, len(released), self._max_batch_size)
+        ]
+
+    def _is_batch_ready(self, now):
+        if not self._frames:
+            return False
+        return (len(self._frames) >= self._max_batch_size
+                or now - self._frames[0][0] >= self._deadline
+                or any(num_frames >= self._num_cameras for num_frames in
+                       self._num_frames_per_timestamp.values()))
+
+    def _pop(self, num_frames):
+        """Removes the num_frames oldest frames from the buffer."""
+        released = self._frames[:num_frames]
+        self._frames = self._frames[num_frames:]
+        for _, _, msg in released:
+            self._remove_from_count(msg)
+        return [(camera_index, msg) for _, camera_index, msg in released]
+
+    def _remove_from_count(self, msg):
+        key = self._get_key(msg)
+        self._num_frames_per_timestamp[key] -= 1
+        if self._num_frames_per_timestamp[key] == 0:
+            del self._num_frames_per_timestamp[key]
+
+    @staticmethod
+    def _get_key(msg):
+        return tuple(msg.timestamp.coordinates)
@@ -1,8 +1,9 @@
 import numpy as np
 
 import pylot.utils
-from pylot.perception.detection.utils import BoundingBox3D, \
-    get_bounding_box_in_camera_view
+from pylot.perception.detection.utils import BoundingBox2D, \
+    BoundingBox3D, SegmentedDepthIntegralImages, \
+    get_bounding_boxes_in_camera_view
 
 
 class Obstacle(object):
@@ -121,7 +122,9 @@ class Obstacle(object):
         """Retrieves the 2D bounding box for the obstacle.
 
         Heuristically uses the depth frame and segmentation frame to figure out
-        if the obstacle is in view of the camera or not.
+        if the obstacle is in view of the camera or not. Use
+        :py:func:`.get_bounding_boxes_in_camera_view` to convert many
+        obstacles at once.
 
         Args:
             depth_frame (:py:class:`~pylot.perception.depth_frame.DepthFrame`):
@@ -135,41 +138,80 @@ class Obstacle(object):
             rectangle over the obstacle if the obstacle is deemed to be
             visible, None otherwise.
         """
-        # Convert the bounding box of the obstacle to the camera coordinates.
-        bb_coordinates = self.bounding_box.to_camera_view(
-            self.transform, depth_frame.camera_setup.get_extrinsic_matrix(),
-            depth_frame.camera_setup.get_intrinsic_matrix())
-
-        # Threshold the bounding box to be within the camera view.
-        bbox_2d = get_bounding_box_in_camera_view(
-            bb_coordinates, depth_frame.camera_setup.width,
-            depth_frame.camera_setup.height)
-        if not bbox_2d:
-            return None
-        # Crop the segmented and depth image to the given bounding box.
-        cropped_image = segmented_frame.as_numpy_array()[
-            bbox_2d.y_min:bbox_2d.y_max, bbox_2d.x_min:bbox_2d.x_max]
-        cropped_depth = depth_frame.as_numpy_array()[
-            bbox_2d.y_min:bbox_2d.y_max, bbox_2d.x_min:bbox_2d.x_max]
-
-        # If the size of the bounding box is greater than 0, ensure that the
-        # bounding box contains more than a threshold of pixels corresponding
-        # to the required segmentation class.
-        if cropped_image.size > 0:
-            masked_image = np.zeros_like(cropped_image)
-            masked_image[np.where(
-                cropped_image == self.segmentation_class)] = 1
-            seg_threshold = self.__segmentation_threshold * masked_image.size
-            if np.sum(masked_image) >= seg_threshold:
-                # The bounding box contains the required number of pixels that
-                # belong to the required class. Ensure that the depth of the
-                # obstacle is the depth in the image.
-                masked_depth = cropped_depth[np.where(masked_image == 1)]
-                mean_depth = np.mean(masked_depth) * 1000
-                depth = self.distance(depth_frame.camera_setup.get_transform())
-                if abs(depth - mean_depth) <= self.__depth_threshold:
-                    return bbox_2d
-        return None
+        return Obstacle.get_bounding_boxes_in_camera_view([self], depth_frame,
+                                                          segmented_frame)[0]
+
+    @staticmethod
+    def get_bounding_boxes_in_camera_view(obstacles,
+                                          depth_frame,
+                                          segmented_frame,
+                                          integral_images=None):
+        """Retrieves the 2D bounding boxes of many obstacles at once.
+
+        The bounding boxes of all the obstacles are projected and clipped
+        together, and the visibility of each obstacle is checked in constant
+        time using integral images of the segmented and depth frames.
+
+        Args:
+            obstacles (list(:py:class:`.Obstacle`)): The obstacles.
+            depth_frame (:py:class:`~pylot.perception.depth_frame.DepthFrame`):
+                Depth frame used to compare the depth to the distance of the
+                obstacles from the sensor.
+            segmented_frame (:py:class:`~pylot.perception.segmentation.segmented_frame.SegmentedFrame`):
+                Segmented frame used to refine the conversions.
+            integral_images (:py:class:`~pylot.perception.detection.utils.SegmentedDepthIntegralImages`):
+                Integral images of the frames, if they were already built.
+
+        Returns:
+            list(:py:class:`~pylot.perception.detection.utils.BoundingBox2D`):
+            The bounding box of each obstacle, or None if the obstacle is not
+            deemed to be visible.
+        """
+        if len(obstacles) == 0:
+            return []
+        camera_setup = depth_frame.camera_setup
+        # Convert the bounding boxes of the obstacles to the camera
+        # coordinates.
+        corners = np.stack([
+            obstacle.bounding_box.get_corners(
+                obstacle.transform).as_numpy_array()
+            for obstacle in obstacles
+        ])
+        pixels, depths, _ = camera_setup.project_points(corners)
+        # Threshold the bounding boxes to be within the camera view.
+        bboxes, in_view = get_bounding_boxes_in_camera_view(
+            np.concatenate((pixels, depths[..., None]), axis=-1),
+            camera_setup.width, camera_setup.height)
+        segmentation_classes = np.array(
+            [obstacle.segmentation_class for obstacle in obstacles])
+        result = [None] * len(obstacles)
+        indices = np.nonzero(in_view)[0]
+        if len(indices) == 0:
+            return result
+        if integral_images is None:
+            # Only build the tables over the region covered by the bounding
+            # boxes that are in view.
+            region = (bboxes[indices, 0].min(), bboxes[indices, 1].max(),
+                      bboxes[indices, 2].min(), bboxes[indices, 3].max())
+            integral_images = SegmentedDepthIntegralImages.from_frames(
+                depth_frame, segmented_frame,
+                segmentation_classes[indices].tolist(), region)
+        num_pixels, fractions, mean_depths = \
+            integral_images.get_class_statistics(bboxes[indices],
+                                                 segmentation_classes[indices])
+        camera_transform = camera_setup.get_transform()
+        for index, size, fraction, mean_depth in zip(indices, num_pixels,
+                                                     fractions, mean_depths):
+            obstacle = obstacles[index]
+            # Ensure that the bounding box contains more than a threshold of
+            # pixels corresponding to the required segmentation class, and
+            # that the depth of the obstacle is the depth in the image.
+            if (size > 0
+                    and fraction >= obstacle.__segmentation_threshold
+                    and abs(obstacle.distance(camera_transform) - mean_depth)
+                    <= obstacle.__depth_threshold):
+                result[index] = BoundingBox2D(*bboxes[index].tolist())
+        return result
 
     def __repr__(self):
         return self.__str__()
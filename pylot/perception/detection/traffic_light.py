@@ -1,10 +1,19 @@
 from enum import Enum
 import numpy as np
 
-from pylot.perception.detection.utils import DetectedObstacle, \
-    get_bounding_box_in_camera_view
+from pylot.perception.detection.utils import BoundingBox2D, \
+    DetectedObstacle, SegmentedDepthIntegralImages, \
+    get_bounding_boxes_in_camera_view
 import pylot.utils
 
+# The segmentation class of the traffic lights and signs.
+TRAFFIC_LIGHT_SEGMENTATION_CLASS = 12
+
+# Extent (in m) of a box that encloses the heads of the traffic lights of all
+# the towns, as (min, max) pairs along the x, y, and z axes of the lights. It
+# is used when the town of a light is not known.
+_GENERIC_HEAD_BOX = ((-12.0, 0.5), (-0.5, 0.6), (1.5, 7.0))
+
 
 class TrafficLightColor(Enum):
     """Enum to represent the states of a traffic light."""
@@ -137,8 +146,11 @@ class TrafficLight(DetectedObstacle):
                 return prod > 0.3
         return prod > -0.80
 
-    def get_all_detected_traffic_light_boxes(self, town_name, depth_frame,
-                                             segmented_image):
+    def get_all_detected_traffic_light_boxes(self,
+                                             town_name,
+                                             depth_frame,
+                                             segmented_image,
+                                             integral_images=None):
         """ Returns traffic lights for all boxes of a CARLA traffic light.
 
         Note:
@@ -152,6 +164,9 @@ class TrafficLight(DetectedObstacle):
                  Depth frame.
             segmented_image: A segmented image np array used to refine the
                  bounding boxes.
+            integral_images (:py:class:`~pylot.perception.detection.utils.SegmentedDepthIntegralImages`):
+                 Integral images of the traffic light pixels of the frames. If
+                 they are not given, they are built from the frames.
 
         Returns:
             list(:py:class:`~pylot.perception.detection.traffic_light.TrafficLight`):
@@ -159,41 +174,61 @@ class TrafficLight(DetectedObstacle):
         """
         traffic_lights = []
         bboxes = self._get_bboxes(town_name)
-        # Convert the returned bounding boxes to 2D and check if the
-        # light is occluded. If not, add it to the traffic lights list.
-        for bbox in bboxes:
-            bounding_box = [
-                loc.to_camera_view(
-                    depth_frame.camera_setup.get_extrinsic_matrix(),
-                    depth_frame.camera_setup.get_intrinsic_matrix())
-                for loc in bbox
-            ]
-            bbox_2d = get_bounding_box_in_camera_view(
-                bounding_box, depth_frame.camera_setup.width,
-                depth_frame.camera_setup.height)
-            if not bbox_2d:
-                continue
-
-            # Crop the segmented and depth image to the given bounding box.
-            cropped_image = segmented_image[bbox_2d.y_min:bbox_2d.y_max,
-                                            bbox_2d.x_min:bbox_2d.x_max]
-            cropped_depth = depth_frame.frame[bbox_2d.y_min:bbox_2d.y_max,
-                                              bbox_2d.x_min:bbox_2d.x_max]
-
-            if cropped_image.size > 0:
-                masked_image = np.zeros_like(cropped_image)
-                masked_image[np.where(cropped_image == 12)] = 1
-                if np.sum(masked_image) >= 0.20 * masked_image.size:
-                    masked_depth = cropped_depth[np.where(masked_image == 1)]
-                    mean_depth = np.mean(masked_depth) * 1000
-                    if abs(mean_depth -
-                           bounding_box[0].z) <= 2 and mean_depth < 150:
-                        traffic_lights.append(
-                            TrafficLight(1.0, self.state, self.id,
-                                         self.transform,
-                                         self.trigger_volume_extent, bbox_2d))
+        # Project the corners of all the bounding boxes at once.
+        pixels, depth, _ = depth_frame.camera_setup.project_points(
+            pylot.utils.LocationArray.from_locations(
+                [loc for bbox in bboxes for loc in bbox]))
+        camera_coordinates = np.column_stack((pixels, depth)).reshape(
+            -1, 8, 3)
+        # Convert all the bounding boxes to 2D at once.
+        bboxes_2d, valid = get_bounding_boxes_in_camera_view(
+            camera_coordinates, depth_frame.camera_setup.width,
+            depth_frame.camera_setup.height)
+        if integral_images is None:
+            integral_images = SegmentedDepthIntegralImages(
+                segmented_image, depth_frame.as_numpy_array(),
+                [TRAFFIC_LIGHT_SEGMENTATION_CLASS],
+                depth_frame.meters_per_unit)
+        # Check if the lights in view are occluded. If not, add them to the
+        # traffic lights list.
+        indices = np.nonzero(valid)[0]
+        num_pixels, fractions, mean_depths = \
+            integral_images.get_class_statistics(
+                bboxes_2d[indices], TRAFFIC_LIGHT_SEGMENTATION_CLASS)
+        for index, size, fraction, mean_depth in zip(indices, num_pixels,
+                                                     fractions, mean_depths):
+            depth = camera_coordinates[index, 0, 2]
+            if (size > 0 and fraction >= 0.20
+                    and abs(mean_depth - depth) <= 2 and mean_depth < 150):
+                traffic_lights.append(
+                    TrafficLight(1.0, self.state, self.id, self.transform,
+                                 self.trigger_volume_extent,
+                                 BoundingBox2D(*bboxes_2d[index].tolist())))
         return traffic_lights
 
+    def get_head_bounding_boxes(self, town_name=None):
+        """Returns the 3D bounding boxes of the heads of the traffic light.
+
+        Args:
+            town_name (:obj:`str`, optional): Name of the town in which the
+                traffic light is. If the town is not known, a single box that
+                encloses the heads of the lights of all the towns is returned.
+
+        Returns:
+            list(list(:py:class:`~pylot.utils.Location`)): The 8 corners of
+            each box, in world coordinates.
+        """
+        if town_name in ['Town01', 'Town02', 'Town03', 'Town04', 'Town05']:
+            return self._get_bboxes(town_name)
+        (x_min, x_max), (y_min, y_max), (z_min, z_max) = _GENERIC_HEAD_BOX
+        # The corners are ordered like the corners of the town boxes.
+        points = [
+            pylot.utils.Location(x, y, z) for y in [y_min, y_max]
+            for x, z in [(x_min, z_min), (x_max, z_min), (x_max, z_max),
+                         (x_min, z_max)]
+        ]
+        return [self._relative_to_traffic_light(points)]
+
     def __repr__(self):
         return self.__str__()
 
@@ -398,3 +433,78 @@ class TrafficLight(DetectedObstacle):
             bboxes.append(self._relative_to_traffic_light(right_points))
             bboxes.append(self._relative_to_traffic_light(left_points))
         return bboxes
+
+
+def get_traffic_light_regions(traffic_lights,
+                              camera_setup,
+                              town_name=None,
+                              padding=0,
+                              max_distance=70):
+    """Gets the regions of a camera frame in which traffic lights can be seen.
+
+    The heads of the traffic lights that are near the camera and that face it
+    are projected into the camera. The regions are padded, clipped to the
+    frame, and regions that overlap are merged, such that a detector can run
+    on the regions instead of on the entire frame.
+
+    Args:
+        traffic_lights (list(:py:class:`.TrafficLight`)): Traffic lights with
+            known world transforms (e.g., from the map).
+        camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
+            Setup of the camera, with its transform relative to the world.
+        town_name (:obj:`str`, optional): Name of the town in which the
+            traffic lights are.
+        padding (:obj:`int`): Number of pixels added to each side of the
+            regions.
+        max_distance (:obj:`float`): Maximum distance (in m) between the
+            camera and the traffic lights.
+
+    Returns:
+        A N by 4 int64 numpy array of (x_min, x_max, y_min, y_max) regions.
+    """
+    camera_transform = camera_setup.get_transform()
+    boxes = []
+    for traffic_light in traffic_lights:
+        if (traffic_light.transform.location.distance(
+                camera_transform.location) <= max_distance
+                and traffic_light.is_traffic_light_visible(
+                    camera_transform, town_name)):
+            boxes.extend(traffic_light.get_head_bounding_boxes(town_name))
+    if len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    pixels, depth, _ = camera_setup.project_points(
+        pylot.utils.LocationArray.from_locations(
+            [loc for box in boxes for loc in box]))
+    camera_coordinates = np.column_stack((pixels, depth)).reshape(-1, 8, 3)
+    regions, valid = get_bounding_boxes_in_camera_view(
+        camera_coordinates, camera_setup.width, camera_setup.height)
+    regions = regions[valid] + [-padding, padding, -padding, padding]
+    regions[:, :2] = np.clip(regions[:, :2], 0, camera_setup.width)
+    regions[:, 2:] = np.clip(regions[:, 2:], 0, camera_setup.height)
+    return _merge_overlapping_regions(regions)
+
+
+def _merge_overlapping_regions(regions):
+    """Replaces overlapping regions with their union, until no two regions
+    overlap."""
+    regions = regions.tolist()
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if (a[0] < b[1] and b[0] < a[1] and a[2] < b[3]
+                        and b[2] < a[3]):
+                    regions[i] = [
+                        min(a[0], b[0]),
+                        max(a[1], b[1]),
+                        min(a[2], b[2]),
+                        max(a[3], b[3])
+                    ]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return np.array(regions, dtype=np.int64).reshape(-1, 4)
@@ -1,16 +1,18 @@
 """Implements an operator that detects traffic lights."""
 from absl import flags
 
+from collections import deque
+import copy
 import erdos
-import logging
 import numpy as np
-import tensorflow as tf
 
 from pylot.perception.detection.traffic_light import TrafficLight, \
-    TrafficLightColor
-from pylot.perception.detection.utils import BoundingBox2D
+    TrafficLightColor, get_traffic_light_regions
+from pylot.perception.detection.utils import BoundingBox2D, crop_regions
 from pylot.perception.messages import TrafficLightsMessage
-from pylot.utils import set_tf_loglevel
+from pylot.perception.model_registry import ModelLoader, \
+    acquire_frozen_graph
+from pylot.perception.pipeline import Pipeline
 
 flags.DEFINE_string(
     'traffic_light_det_model_path',
@@ -20,73 +22,166 @@ flags.DEFINE_float('traffic_light_det_min_score_threshold', 0.3,
                    'Min score threshold for bounding box')
 flags.DEFINE_float(
     'traffic_light_det_gpu_memory_fraction', 0.3,
-    'GPU memory fraction allocated to each traffic light detector')
+    'GPU memory fraction allocated to each traffic light detection model')
+flags.DEFINE_bool(
+    'traffic_light_det_roi', False,
+    'True to only run the traffic light detector on the regions of the frame '
+    'in which the traffic lights known to be near the ego-vehicle are')
+flags.DEFINE_integer(
+    'traffic_light_det_roi_padding', 40,
+    'Number of pixels by which the traffic light regions are padded')
+flags.DEFINE_float(
+    'traffic_light_det_roi_max_distance', 70.0,
+    'Maximum distance (in m) to the traffic lights for which regions are '
+    'detected')
 
 
 class TrafficLightDetOperator(erdos.Operator):
     """Detects traffic lights using a TensorFlow model.
 
     The operator receives frames on a camera stream, and runs a model for each
-    frame.
+    frame. If the --perception_pipelining flag is set, the pre-processing,
+    inference, and post-processing of consecutive frames overlap, and the
+    operator forwards the watermarks once the frames of their timestamps have
+    been sent. The operator must then be connected with flow_watermarks set
+    to False.
+
+    The model is warmed up with --model_warm_up_runs dummy inferences. If
+    --background_model_loading is set, the model loads on a background
+    thread, and the first frame waits until it is ready.
+
+    If the operator also receives the pose of the ego-vehicle and the
+    traffic lights of the map, it only runs the model on the padded regions of
+    the frame onto which the heads of the nearby traffic lights project, and
+    it does not run the model if no traffic lights are nearby. Otherwise, it
+    runs the model on the entire frame.
 
     Args:
         camera_stream (:py:class:`erdos.ReadStream`): The stream on which
             camera frames are received.
+        can_bus_stream (:py:class:`erdos.ReadStream`, optional): Stream on
+            which can bus info is received.
+        map_traffic_lights_stream (:py:class:`erdos.ReadStream`, optional):
+            Stream on which
+            :py:class:`~pylot.perception.messages.TrafficLightsMessage`
+            messages with the world transforms of the traffic lights are
+            received.
         traffic_lights_stream (:py:class:`erdos.WriteStream`): Stream on which
             the operator sends
             :py:class:`~pylot.perception.messages.TrafficLightsMessage`
             messages.
         flags (absl.flags): Object to be used to access absl flags.
     """
-    def __init__(self, camera_stream, traffic_lights_stream, flags):
-        # Register a callback on the camera input stream.
-        camera_stream.add_callback(self.on_frame, [traffic_lights_stream])
+    def __init__(self, camera_stream, *args):
+        *streams, traffic_lights_stream, flags = args
+        assert len(streams) in [0, 2], \
+            'Expects both the can bus and the map traffic lights streams'
+        self._use_regions = len(streams) == 2
+        if self._use_regions:
+            can_bus_stream, map_traffic_lights_stream = streams
+            camera_stream.add_callback(self.on_frame)
+            can_bus_stream.add_callback(self.on_can_bus_update)
+            map_traffic_lights_stream.add_callback(
+                self.on_map_traffic_lights_update)
+            erdos.add_watermark_callback(
+                [camera_stream, can_bus_stream, map_traffic_lights_stream],
+                [traffic_lights_stream], self.on_watermark)
+        else:
+            # Register a callback on the camera input stream.
+            camera_stream.add_callback(self.on_frame,
+                                       [traffic_lights_stream])
         self._logger = erdos.utils.setup_logging(self.config.name,
                                                  self.config.log_file_name)
         self._flags = flags
-        self._detection_graph = tf.Graph()
-        # Load the model from the model file.
-        set_tf_loglevel(logging.ERROR)
-        with self._detection_graph.as_default():
-            od_graph_def = tf.GraphDef()
-            with tf.gfile.GFile(self._flags.traffic_light_det_model_path,
-                                'rb') as fid:
-                serialized_graph = fid.read()
-                od_graph_def.ParseFromString(serialized_graph)
-                tf.import_graph_def(od_graph_def, name='')
-
-        self._gpu_options = tf.GPUOptions(
-            per_process_gpu_memory_fraction=flags.
-            traffic_light_det_gpu_memory_fraction)
-        # Create a TensorFlow session.
-        self._tf_session = tf.Session(
-            graph=self._detection_graph,
-            config=tf.ConfigProto(gpu_options=self._gpu_options))
-        # Get the tensors we're interested in.
-        self._image_tensor = self._detection_graph.get_tensor_by_name(
-            'image_tensor:0')
-        self._detection_boxes = self._detection_graph.get_tensor_by_name(
-            'detection_boxes:0')
-        self._detection_scores = self._detection_graph.get_tensor_by_name(
-            'detection_scores:0')
-        self._detection_classes = self._detection_graph.get_tensor_by_name(
-            'detection_classes:0')
-        self._num_detections = self._detection_graph.get_tensor_by_name(
-            'num_detections:0')
+        self._csv_logger = erdos.utils.setup_csv_logging(
+            self.config.name + '-csv', self.config.csv_log_file_name)
+        self._model_loader = ModelLoader(self._load_model, self._warm_up,
+                                         flags.model_warm_up_runs,
+                                         flags.background_model_loading,
+                                         self.config.name, self._csv_logger)
         self._labels = {
             1: TrafficLightColor.GREEN,
             2: TrafficLightColor.YELLOW,
             3: TrafficLightColor.RED,
             4: TrafficLightColor.OFF
         }
+        self._pipeline = Pipeline(
+            [self._preprocess, self._infer, self._postprocess],
+            threaded=flags.perception_pipelining,
+            queue_size=flags.perception_pipeline_queue_size,
+            name=self.config.name,
+            logger=self._logger)
+        if self._pipeline.threaded and not self._use_regions:
+            camera_stream.add_watermark_callback(self.on_watermark,
+                                                 [traffic_lights_stream])
+        self._frame_msgs = deque()
+        self._can_bus_msgs = deque()
+        self._map_traffic_lights_msgs = deque()
+        # Name of the town, which is used to locate the heads of the lights.
+        self._town_name = None
+
+    def run(self):
+        if not self._use_regions:
+            return
+        # The map is retrieved after all operators finished initializing,
+        # including the CARLA operator, which reloads the world.
+        try:
+            from pylot.simulation.utils import get_map
+            self._town_name = get_map(self._flags.carla_host,
+                                      self._flags.carla_port,
+                                      self._flags.carla_timeout).name
+        except (ImportError, RuntimeError, ValueError):
+            self._logger.warning(
+                'Could not get the town; using generic traffic light boxes')
+
+    def _load_model(self):
+        """Acquires the model, which is shared by the operators that use the
+        same model file."""
+        self._model = acquire_frozen_graph(
+            self._flags.traffic_light_det_model_path,
+            self._flags.traffic_light_det_gpu_memory_fraction,
+            self._flags.inference_cpu_threads,
+            logger=self._logger)
+        # Get the tensors we're interested in.
+        graph_model = self._model.model
+        self._image_tensor = graph_model.get_tensor('image_tensor:0')
+        self._detection_boxes = graph_model.get_tensor('detection_boxes:0')
+        self._detection_scores = graph_model.get_tensor('detection_scores:0')
+        self._detection_classes = graph_model.get_tensor(
+            'detection_classes:0')
+        self._num_detections = graph_model.get_tensor('num_detections:0')
+
+    def _warm_up(self):
+        """Runs the model on a blank frame of the configured camera size."""
+        self._run_model(
+            np.zeros((1, self._flags.carla_camera_image_height,
+                      self._flags.carla_camera_image_width, 3),
+                     dtype=np.uint8))
+
+    def _run_model(self, images):
+        """Runs the model, and returns its (boxes, scores, classes,
+        num_detections) outputs."""
+        return self._model(
+            [
+                self._detection_boxes, self._detection_scores,
+                self._detection_classes, self._num_detections
+            ],
+            feed_dict={self._image_tensor: images})
 
     @staticmethod
-    def connect(camera_stream):
+    def connect(camera_stream,
+                can_bus_stream=None,
+                map_traffic_lights_stream=None):
         """Connects the operator to other streams.
 
         Args:
             camera_stream (:py:class:`erdos.ReadStream`): The stream on which
                 camera frames are received.
+            can_bus_stream (:py:class:`erdos.ReadStream`, optional): Stream on
+                which can bus info is received.
+            map_traffic_lights_stream (:py:class:`erdos.ReadStream`,
+                optional): Stream on which the traffic lights of the map are
+                received.
 
         Returns:
             :py:class:`erdos.WriteStream`: Stream on which the operator sends
@@ -97,38 +192,90 @@ class TrafficLightDetOperator(erdos.Operator):
         return [traffic_lights_stream]
 
     @erdos.profile_method()
-    def on_frame(self, msg, traffic_lights_stream):
+    def on_frame(self, msg, traffic_lights_stream=None):
         """Invoked whenever a frame message is received on the stream.
 
         Args:
             msg: A :py:class:`~pylot.perception.messages.FrameMessage`.
-            obstacles_stream (:py:class:`erdos.WriteStream`): Stream on which
-                the operator sends
+            traffic_lights_stream (:py:class:`erdos.WriteStream`): Stream on
+                which the operator sends
                 :py:class:`~pylot.perception.messages.TrafficLightsMessage`
-                messages for traffic lights.
+                messages for traffic lights. The frames are buffered until
+                the watermark if the operator uses regions.
         """
         self._logger.debug('@{}: {} received message'.format(
             msg.timestamp, self.config.name))
+        if self._use_regions:
+            self._frame_msgs.append(msg)
+            return
+        camera_setup = msg.frame.camera_setup
+        regions = np.array([[0, camera_setup.width, 0, camera_setup.height]])
+        self._pipeline.submit((msg, traffic_lights_stream, regions))
+
+    def on_can_bus_update(self, msg):
+        self._logger.debug('@{}: received can bus message'.format(
+            msg.timestamp))
+        self._can_bus_msgs.append(msg)
+
+    def on_map_traffic_lights_update(self, msg):
+        self._logger.debug('@{}: received map traffic lights'.format(
+            msg.timestamp))
+        self._map_traffic_lights_msgs.append(msg)
+
+    def on_watermark(self, timestamp, traffic_lights_stream):
+        """Detects the traffic lights in the regions of the frame, if the
+        operator uses regions, and forwards the watermark if the operator is
+        pipelined.
+
+        Args:
+            timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp
+                of the watermark.
+            traffic_lights_stream (:py:class:`erdos.WriteStream`): Stream on
+                which the watermark is forwarded.
+        """
+        if self._use_regions:
+            msg = self._frame_msgs.popleft()
+            vehicle_transform = self._can_bus_msgs.popleft().data.transform
+            map_traffic_lights = \
+                self._map_traffic_lights_msgs.popleft().obstacles
+            # The camera setup sent with the frame is relative to the car.
+            camera_setup = copy.deepcopy(msg.frame.camera_setup)
+            camera_setup.set_transform(vehicle_transform *
+                                       camera_setup.transform)
+            regions = get_traffic_light_regions(
+                map_traffic_lights, camera_setup, self._town_name,
+                self._flags.traffic_light_det_roi_padding,
+                self._flags.traffic_light_det_roi_max_distance)
+            self._logger.debug('@{}: {} detecting in regions {}'.format(
+                timestamp, self.config.name, regions.tolist()))
+            self._pipeline.submit((msg, traffic_lights_stream, regions))
+        if self._pipeline.threaded:
+            self._pipeline.run_after(lambda: traffic_lights_stream.send(
+                erdos.WatermarkMessage(timestamp)))
+
+    def _preprocess(self, item):
+        msg, traffic_lights_stream, regions = item
+        self._model_loader.wait()
         assert msg.frame.encoding == 'BGR', 'Expects BGR frames'
-        # Expand dimensions since the model expects images to have
-        # shape: [1, None, None, 3]
-        image_np_expanded = np.expand_dims(msg.frame.as_rgb_numpy_array(),
-                                           axis=0)
-        (boxes, scores, classes, num) = self._tf_session.run(
-            [
-                self._detection_boxes, self._detection_scores,
-                self._detection_classes, self._num_detections
-            ],
-            feed_dict={self._image_tensor: image_np_expanded})
+        images = None
+        if len(regions) > 0:
+            # The model expects images to have shape: [batch, None, None, 3]
+            images = crop_regions(msg.frame.as_rgb_numpy_array(), regions)
+        return msg, traffic_lights_stream, regions, images
 
-        num_detections = int(num[0])
-        labels = [self._labels[label] for label in classes[0][:num_detections]]
-        boxes = boxes[0][:num_detections]
-        scores = scores[0][:num_detections]
+    def _infer(self, item):
+        msg, traffic_lights_stream, regions, images = item
+        outputs = None
+        if images is not None:
+            outputs = self._run_model(images)
+        return msg, traffic_lights_stream, regions, images, outputs
 
-        traffic_lights = self.__convert_to_detected_tl(
-            boxes, scores, labels, msg.frame.camera_setup.height,
-            msg.frame.camera_setup.width)
+    def _postprocess(self, item):
+        msg, traffic_lights_stream, regions, images, outputs = item
+        traffic_lights = []
+        if outputs is not None:
+            traffic_lights = self.__convert_to_detected_tl(
+                outputs, regions, images.shape[1], images.shape[2])
 
         self._logger.debug('@{}: {} detected traffic lights {}'.format(
             msg.timestamp, self.config.name, traffic_lights))
@@ -147,19 +294,29 @@ class TrafficLightDetOperator(erdos.Operator):
         traffic_lights_stream.send(
             TrafficLightsMessage(msg.timestamp, traffic_lights))
 
-    def __convert_to_detected_tl(self, boxes, scores, labels, height, width):
+    def __convert_to_detected_tl(self, outputs, regions, height, width):
+        """Converts the detections in the images of the regions to traffic
+        lights in the frame.
+
+        The images are height by width, and each region is at the top left
+        corner of its image.
+        """
+        (boxes, scores, classes, num) = outputs
         traffic_lights = []
-        for index in range(len(scores)):
-            if scores[
-                    index] > self._flags.traffic_light_det_min_score_threshold:
-                bbox = BoundingBox2D(
-                    int(boxes[index][1] * width),  # x_min
-                    int(boxes[index][3] * width),  # x_max
-                    int(boxes[index][0] * height),  # y_min
-                    int(boxes[index][2] * height)  # y_max
-                )
-                traffic_lights.append(
-                    TrafficLight(scores[index],
-                                 labels[index],
-                                 bounding_box=bbox))
+        for index, (x_min, x_max, y_min, y_max) in enumerate(regions):
+            num_detections = int(num[index])
+            for box, score, label in zip(boxes[index][:num_detections],
+                                         scores[index][:num_detections],
+                                         classes[index][:num_detections]):
+                if score > self._flags.traffic_light_det_min_score_threshold:
+                    bbox = BoundingBox2D(
+                        min(x_min + int(box[1] * width), x_max),  # x_min
+                        min(x_min + int(box[3] * width), x_max),  # x_max
+                        min(y_min + int(box[0] * height), y_max),  # y_min
+                        min(y_min + int(box[2] * height), y_max)  # y_max
+                    )
+                    traffic_lights.append(
+                        TrafficLight(score,
+                                     self._labels[label],
+                                     bounding_box=bbox))
         return traffic_lights
@@ -188,65 +188,70 @@ class BoundingBox3D(object):
                              actor_transform.rotation.as_carla_rotation(),
                              life_time=time_between_frames / 1000.0)
 
-    def to_camera_view(self, obstacle_transform, extrinsic_matrix,
-                       intrinsic_matrix):
-        """Converts the coordinates of the bounding box for the given obstacle
-        to the coordinates in the view of the camera.
+    def get_corners(self, obstacle_transform):
+        """Retrieves the 8 corners of the bounding box for the given obstacle,
+        in world coordinates.
 
         This method retrieves the extent of the bounding box, transforms them
         to coordinates relative to the bounding box origin, then converts those
         to coordinates relative to the obstacle.
 
-        These coordinates are then considered to be in the world coordinate
-        system, which is mapped into the camera view. A negative z-value
-        signifies that the bounding box is behind the camera plane.
-
-        Note that this function does not cap the coordinates to be within the
-        size of the camera image.
-
         Args:
             obstacle_transform (:py:class:`~pylot.utils.Transform`): The
                 transform of the obstacle that the bounding box is associated
                 with.
-            extrinsic_matrix: The extrinsic matrix of the camera.
-            intrinsic_matrix: The intrinsic matrix of the camera.
 
         Returns:
-            A list of 8 Location instances specifying the 8 corners of the
+            :py:class:`~pylot.utils.LocationArray`: The 8 corners of the
             bounding box.
         """
         # Retrieve the eight coordinates of the bounding box with respect to
         # the origin of the bounding box.
-        import numpy as np
         extent = self.extent
-        bbox = np.array([
-            pylot.utils.Location(x=+extent.x, y=+extent.y, z=-extent.z),
-            pylot.utils.Location(x=-extent.x, y=+extent.y, z=-extent.z),
-            pylot.utils.Location(x=-extent.x, y=-extent.y, z=-extent.z),
-            pylot.utils.Location(x=+extent.x, y=-extent.y, z=-extent.z),
-            pylot.utils.Location(x=+extent.x, y=+extent.y, z=+extent.z),
-            pylot.utils.Location(x=-extent.x, y=+extent.y, z=+extent.z),
-            pylot.utils.Location(x=-extent.x, y=-extent.y, z=+extent.z),
-            pylot.utils.Location(x=+extent.x, y=-extent.y, z=+extent.z)
-        ])
+        bbox = pylot.utils.LocationArray(
+            np.array([[+extent.x, +extent.y, -extent.z],
+                      [-extent.x, +extent.y, -extent.z],
+                      [-extent.x, -extent.y, -extent.z],
+                      [+extent.x, -extent.y, -extent.z],
+                      [+extent.x, +extent.y, +extent.z],
+                      [-extent.x, +extent.y, +extent.z],
+                      [-extent.x, -extent.y, +extent.z],
+                      [+extent.x, -extent.y, +extent.z]]))
 
         # Transform the vertices with respect to the bounding box transform.
         bbox = self.transform.transform_locations(bbox)
 
         # Convert the bounding box relative to the world.
-        bbox = obstacle_transform.transform_locations(bbox)
+        return obstacle_transform.transform_locations(bbox)
 
-        # Obstacle's transform is relative to the world. Thus, the bbox
-        # contains the 3D bounding box vertices relative to the world.
-        camera_coordinates = []
-        for vertex in bbox:
-            location_2D = vertex.to_camera_view(extrinsic_matrix,
-                                                intrinsic_matrix)
+    def to_camera_view(self, obstacle_transform, extrinsic_matrix,
+                       intrinsic_matrix):
+        """Converts the coordinates of the bounding box for the given obstacle
+        to the coordinates in the view of the camera.
 
-            # Add the points to the image.
-            camera_coordinates.append(location_2D)
+        The corners of the bounding box (see :py:func:`.get_corners`) are
+        considered to be in the world coordinate system, which is mapped into
+        the camera view. A negative z-value signifies that the bounding box is
+        behind the camera plane.
 
-        return camera_coordinates
+        Note that this function does not cap the coordinates to be within the
+        size of the camera image. When a camera setup is available, prefer
+        :py:func:`~pylot.drivers.sensor_setup.CameraSetup.project_points`,
+        which caches the projection matrix of the camera.
+
+        Args:
+            obstacle_transform (:py:class:`~pylot.utils.Transform`): The
+                transform of the obstacle that the bounding box is associated
+                with.
+            extrinsic_matrix: The extrinsic matrix of the camera.
+            intrinsic_matrix: The intrinsic matrix of the camera.
+
+        Returns:
+            :py:class:`~pylot.utils.LocationArray`: The 8 corners of the
+            bounding box in the view of the camera.
+        """
+        return self.get_corners(obstacle_transform).to_camera_view(
+            extrinsic_matrix, intrinsic_matrix)
 
     def __repr__(self):
         return self.__str__()
@@ -347,6 +352,184 @@ class DetectedObstacle(object):
                 self.id, self.label, self.confidence, self.bounding_box)
 
 
+class DetectedObstacleArray(object):
+    """Stores detected obstacles in a columnar layout.
+
+    The obstacles are stored as numpy arrays, which are cheap to serialize
+    and can be processed without iterating over Python objects. The
+    :py:class:`.DetectedObstacle` views of the obstacles are created lazily.
+
+    Args:
+        bboxes: A N by 4 numpy array of (x_min, x_max, y_min, y_max)
+            bounding boxes.
+        confidences: A numpy array of N detection confidences.
+        label_codes: A numpy array of N indices in labels.
+        labels (list(:obj:`str`)): The labels that the codes refer to.
+        ids: A numpy array of N obstacle ids (-1 if the obstacle has no id).
+        locations: A N by 3 numpy array of the locations of the obstacles in
+            the world, or None. Rows of NaN denote obstacles without a
+            location.
+        rotations: A N by 3 numpy array of the (pitch, yaw, roll) rotations
+            of the obstacles in the world, or None.
+        detailed_labels (list(:obj:`str`)): The detailed labels of the
+            obstacles, or None.
+
+    Attributes:
+        bboxes: A N by 4 numpy array of (x_min, x_max, y_min, y_max)
+            bounding boxes.
+        confidences: A numpy array of N detection confidences.
+        label_codes: A numpy array of N indices in labels.
+        labels (list(:obj:`str`)): The labels that the codes refer to.
+        ids: A numpy array of N obstacle ids.
+        locations: A N by 3 numpy array of the locations of the obstacles.
+        rotations: A N by 3 numpy array of the rotations of the obstacles.
+    """
+    def __init__(self,
+                 bboxes,
+                 confidences,
+                 label_codes,
+                 labels,
+                 ids=None,
+                 locations=None,
+                 rotations=None,
+                 detailed_labels=None):
+        self.bboxes = np.reshape(bboxes, (-1, 4))
+        num_obstacles = len(self.bboxes)
+        self.confidences = np.asarray(confidences, dtype=np.float64)
+        self.label_codes = np.asarray(label_codes, dtype=np.int64)
+        self.labels = list(labels)
+        if ids is None:
+            ids = np.full(num_obstacles, -1)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        if locations is None:
+            locations = np.full((num_obstacles, 3), np.nan)
+        self.locations = np.reshape(locations, (-1, 3))
+        if rotations is None:
+            rotations = np.zeros((num_obstacles, 3))
+        self.rotations = np.reshape(rotations, (-1, 3))
+        self._detailed_labels = detailed_labels
+        assert (len(self.confidences) == len(self.label_codes) ==
+                len(self.ids) == len(self.locations) == len(self.rotations) ==
+                num_obstacles), 'The obstacle arrays have different lengths'
+        # The DetectedObstacle views, created lazily.
+        self._obstacles = None
+        self._serialize_obstacles = False
+
+    @classmethod
+    def from_obstacles(cls, obstacles):
+        """Creates a columnar array from a list of detected obstacles.
+
+        Args:
+            obstacles (list(:py:class:`.DetectedObstacle`)): The obstacles.
+
+        Returns:
+            :py:class:`.DetectedObstacleArray`: The obstacles in a columnar
+            layout, which returns the given obstacles as its views.
+        """
+        labels, label_codes = np.unique(
+            [obstacle.label for obstacle in obstacles], return_inverse=True)
+        locations = np.full((len(obstacles), 3), np.nan)
+        rotations = np.zeros((len(obstacles), 3))
+        for index, obstacle in enumerate(obstacles):
+            if obstacle.transform is not None:
+                location = obstacle.transform.location
+                rotation = obstacle.transform.rotation
+                locations[index] = (location.x, location.y, location.z)
+                rotations[index] = (rotation.pitch, rotation.yaw,
+                                    rotation.roll)
+        array = cls(bounding_boxes_to_array(
+            [obstacle.bounding_box for obstacle in obstacles]).astype(
+                np.int64), [obstacle.confidence for obstacle in obstacles],
+                    label_codes, labels.tolist(),
+                    [obstacle.id for obstacle in obstacles], locations,
+                    rotations,
+                    [obstacle.detailed_label for obstacle in obstacles])
+        array._obstacles = list(obstacles)
+        # Obstacles of subclasses (e.g., traffic lights) cannot be recreated
+        # from the arrays, so they are serialized with the arrays.
+        array._serialize_obstacles = any(
+            type(obstacle) is not DetectedObstacle for obstacle in obstacles)
+        return array
+
+    def get_labels(self):
+        """Returns a numpy array of the labels of the obstacles."""
+        return np.array(self.labels, dtype=object)[self.label_codes]
+
+    def get_label_mask(self, labels):
+        """Returns a boolean numpy array that is True for the obstacles that
+        have one of the given labels."""
+        codes = [
+            code for code, label in enumerate(self.labels) if label in labels
+        ]
+        return np.isin(self.label_codes, codes)
+
+    def select(self, indices):
+        """Returns the obstacles at the given indices (or boolean mask).
+
+        Returns:
+            :py:class:`.DetectedObstacleArray`: The selected obstacles.
+        """
+        indices = np.arange(len(self))[indices]
+        detailed_labels = None
+        if self._detailed_labels is not None:
+            detailed_labels = [self._detailed_labels[i] for i in indices]
+        array = DetectedObstacleArray(self.bboxes[indices],
+                                      self.confidences[indices],
+                                      self.label_codes[indices], self.labels,
+                                      self.ids[indices],
+                                      self.locations[indices],
+                                      self.rotations[indices],
+                                      detailed_labels)
+        if self._obstacles is not None:
+            array._obstacles = [self._obstacles[i] for i in indices]
+            array._serialize_obstacles = self._serialize_obstacles
+        return array
+
+    def as_obstacles(self):
+        """Returns the obstacles as a list of :py:class:`.DetectedObstacle`.
+
+        The list is created once, and cached.
+        """
+        if self._obstacles is None:
+            self._obstacles = [self._get_obstacle(i) for i in range(len(self))]
+        return self._obstacles
+
+    def _get_obstacle(self, index):
+        x_min, x_max, y_min, y_max = self.bboxes[index].tolist()
+        transform = None
+        if not np.isnan(self.locations[index]).any():
+            pitch, yaw, roll = self.rotations[index].tolist()
+            transform = pylot.utils.Transform(
+                pylot.utils.Location(*self.locations[index].tolist()),
+                pylot.utils.Rotation(pitch, yaw, roll))
+        detailed_label = ''
+        if self._detailed_labels is not None:
+            detailed_label = self._detailed_labels[index]
+        return DetectedObstacle(BoundingBox2D(x_min, x_max, y_min, y_max),
+                                float(self.confidences[index]),
+                                self.labels[self.label_codes[index]],
+                                int(self.ids[index]), transform,
+                                detailed_label)
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def __getstate__(self):
+        # The views are not serialized, unless they cannot be recreated from
+        # the arrays.
+        state = self.__dict__.copy()
+        if not self._serialize_obstacles:
+            state['_obstacles'] = None
+        return state
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return 'DetectedObstacleArray(num_obstacles: {}, labels: {})'.format(
+            len(self), self.get_labels().tolist())
+
+
 class DetectedLane(object):
     def __init__(self, left_marking, right_marking):
         self.left_marking = left_marking
@@ -360,13 +543,111 @@ class DetectedLane(object):
             self.left_marking, self.right_marking)
 
 
+# The 12 edges of a 3D bounding box, as pairs of indices of its 8 corners
+# (see :py:func:`.BoundingBox3D.get_corners`): the edges of the bottom plane,
+# the edges of the top plane, and the edges that connect the two planes.
+BOUNDING_BOX_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6],
+                               [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]])
+# Tolerance (in pixels) of the coordinates of the clipped edges.
+_CLIPPING_TOLERANCE = 1e-6
+
+
+def clip_segments(segments, image_width, image_height):
+    """Clips line segments to the image with the Liang-Barsky algorithm.
+
+    Args:
+        segments: A (..., 2, 2) numpy array of segments, in which the last
+            two axes store the (x, y) coordinates of the two end points of
+            each segment.
+        image_width (:obj:`int`): The width of the image.
+        image_height (:obj:`int`): The height of the image.
+
+    Returns:
+        A tuple of a numpy array of the clipped segments, which has the same
+        shape as segments, and a boolean numpy array that is True for the
+        segments that intersect the image (including its borders).
+    """
+    start = segments[..., 0, :]
+    delta = segments[..., 1, :] - start
+    t_enter = np.zeros(segments.shape[:-2])
+    t_exit = np.ones(segments.shape[:-2])
+    valid = np.all(np.isfinite(segments), axis=(-2, -1))
+    # Each border of the image is a constraint p * t <= q on the parameter t
+    # of the points start + t * delta of a segment.
+    for p, q in ((-delta[..., 0], start[..., 0]),
+                 (delta[..., 0], image_width - start[..., 0]),
+                 (-delta[..., 1], start[..., 1]),
+                 (delta[..., 1], image_height - start[..., 1])):
+        # Segments that are parallel to and outside of the border.
+        valid &= (p != 0) | (q >= 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = q / p
+        t_enter = np.where(p < 0, np.maximum(t_enter, t), t_enter)
+        t_exit = np.where(p > 0, np.minimum(t_exit, t), t_exit)
+    valid &= t_enter <= t_exit
+    clipped = np.stack((start + t_enter[..., None] * delta,
+                        start + t_exit[..., None] * delta),
+                       axis=-2)
+    return clipped, valid
+
+
+def get_bounding_boxes_in_camera_view(bb_coordinates, image_width,
+                                      image_height):
+    """Creates the bounding boxes in the view of the camera image from the
+    coordinates of many 3D bounding boxes at once.
+
+    The 12 edges of each bounding box are clipped to the image, and the 2D
+    bounding box is the extent of the clipped edges.
+
+    Args:
+        bb_coordinates: A N by 8 by 3 numpy array of the (x, y, depth)
+            coordinates of the 8 corners of N bounding boxes, relative to the
+            camera transform.
+        image_width (:obj:`int`): The width of the image being published by the
+            camera.
+        image_height (:obj:`int`): The height of the image being published by
+            the camera.
+
+    Returns:
+        A tuple of a N by 4 int numpy array of (x_min, x_max, y_min, y_max)
+        bounding boxes, and a boolean numpy array that is True for the
+        bounding boxes that fall into the view of the camera.
+    """
+    bb_coordinates = np.reshape(bb_coordinates, (-1, 8, 3))
+    # Make sure that atleast 2 of the bounding box coordinates are in front.
+    valid = np.count_nonzero(bb_coordinates[..., 2] >= 0, axis=1) >= 2
+    points = np.trunc(bb_coordinates[..., :2])
+    # (N, 12, 2, 2) array of the end points of the edges.
+    segments, segments_valid = clip_segments(points[:, BOUNDING_BOX_EDGES],
+                                             image_width, image_height)
+    valid &= np.any(segments_valid, axis=1)
+    # Compute the extent of the end points of the clipped edges.
+    mask = segments_valid[..., None, None]
+    mins = np.where(mask, segments, np.inf).min(axis=(1, 2))
+    maxs = np.where(mask, segments, -np.inf).max(axis=(1, 2))
+    mins[~valid] = 0
+    maxs[~valid] = 0
+    # The clipped end points are non-negative, so truncating them is
+    # flooring them. The tolerance absorbs the round-off of the points that
+    # are clipped onto the borders of the image.
+    mins = np.floor(mins + _CLIPPING_TOLERANCE).astype(np.int64)
+    maxs = np.floor(maxs + _CLIPPING_TOLERANCE).astype(np.int64)
+    valid &= np.all(mins < maxs, axis=1)
+    bboxes = np.column_stack((mins[:, 0], maxs[:, 0], mins[:, 1], maxs[:, 1]))
+    return bboxes, valid
+
+
 def get_bounding_box_in_camera_view(bb_coordinates, image_width, image_height):
     """Creates the bounding box in the view of the camera image using the
     coordinates generated with respect to the camera transform.
 
+    See :py:func:`.get_bounding_boxes_in_camera_view` to convert many
+    bounding boxes at once.
+
     Args:
-        bb_coordinates: 8 :py:class:`~pylot.utils.Location` coordinates of
-            the bounding box relative to the camera transform.
+        bb_coordinates: 8 :py:class:`~pylot.utils.Location` coordinates (or a
+            :py:class:`~pylot.utils.LocationArray`) of the bounding box
+            relative to the camera transform.
         image_width (:obj:`int`): The width of the image being published by the
             camera.
         image_height (:obj:`int`): The height of the image being published by
@@ -376,75 +657,165 @@ def get_bounding_box_in_camera_view(bb_coordinates, image_width, image_height):
         :py:class:`.BoundingBox2D`: a bounding box, or None if the bounding box
             does not fall into the view of the camera.
     """
-    # Make sure that atleast 2 of the bounding box coordinates are in front.
-    z_vals = [loc.z for loc in bb_coordinates if loc.z >= 0]
-    if len(z_vals) < 2:
+    if isinstance(bb_coordinates, pylot.utils.LocationArray):
+        bb_coordinates = bb_coordinates.as_numpy_array()
+    else:
+        bb_coordinates = [[loc.x, loc.y, loc.z] for loc in bb_coordinates]
+    bboxes, valid = get_bounding_boxes_in_camera_view(
+        np.asarray(bb_coordinates, dtype=np.float64), image_width,
+        image_height)
+    if not valid[0]:
         return None
+    x_min, x_max, y_min, y_max = bboxes[0].tolist()
+    return BoundingBox2D(x_min, x_max, y_min, y_max)
 
-    # Create the thresholding line segments of the camera view.
-    from shapely.geometry import LineString
-    left = LineString(((0, 0), (0, image_height)))
-    bottom = LineString(((0, image_height), (image_width, image_height)))
-    right = LineString(((image_width, image_height), (image_width, 0)))
-    top = LineString(((image_width, 0), (0, 0)))
-    camera_thresholds = [left, bottom, right, top]
-
-    def threshold(p1, p2):
-        points = []
-        # If the points are themselves within the image, add them to the
-        # set of thresholded points.
-        if (p1[0] >= 0 and p1[0] < image_width and p1[1] >= 0
-                and p1[1] < image_height):
-            points.append(p1)
-
-        if (p2[0] >= 0 and p2[0] < image_width and p2[1] >= 0
-                and p2[1] < image_height):
-            points.append(p2)
-
-        # Compute the intersection of the line segment formed by p1 -- p2
-        # with all the thresholds of the camera image.
-        p12 = LineString((p1, p2))
-        for camera_threshold in camera_thresholds:
-            p = p12.intersection(camera_threshold)
-            if not p.is_empty:
-                if p.geom_type == 'Point':
-                    points.append((p.x, p.y))
-                elif p.geom_type == 'LineString':
-                    for coord in p.coords:
-                        points.append((coord[0], coord[1]))
-        return points
-
-    # Go over each of the segments of the bounding box and threshold it to
-    # be inside the image.
-    thresholded_points = []
-    points = [(int(loc.x), int(loc.y)) for loc in bb_coordinates]
-    # Bottom plane thresholded.
-    thresholded_points.extend(threshold(points[0], points[1]))
-    thresholded_points.extend(threshold(points[1], points[2]))
-    thresholded_points.extend(threshold(points[2], points[3]))
-    thresholded_points.extend(threshold(points[3], points[0]))
-
-    # Top plane thresholded.
-    thresholded_points.extend(threshold(points[4], points[5]))
-    thresholded_points.extend(threshold(points[5], points[6]))
-    thresholded_points.extend(threshold(points[6], points[7]))
-    thresholded_points.extend(threshold(points[7], points[4]))
-
-    # Remaining segments thresholded.
-    thresholded_points.extend(threshold(points[0], points[4]))
-    thresholded_points.extend(threshold(points[1], points[5]))
-    thresholded_points.extend(threshold(points[2], points[6]))
-    thresholded_points.extend(threshold(points[3], points[7]))
-
-    if len(thresholded_points) == 0:
-        return None
-    else:
-        x = [int(x) for x, _ in thresholded_points]
-        y = [int(y) for _, y in thresholded_points]
-        if min(x) < max(x) and min(y) < max(y):
-            return BoundingBox2D(min(x), max(x), min(y), max(y))
-        else:
-            return None
+
+def crop_regions(frame, regions):
+    """Crops regions of a frame into a batch of images of the same size.
+
+    The crops are padded with zeros at the bottom and at the right, up to the
+    size of the largest region.
+
+    Args:
+        frame: A height by width by channels numpy array.
+        regions: A N by 4 numpy array of (x_min, x_max, y_min, y_max) regions
+            inside the frame.
+
+    Returns:
+        A N by max region height by max region width by channels numpy array
+        of the same dtype as the frame. A single region is returned as a view
+        of the frame (e.g., the entire frame is not copied).
+    """
+    regions = np.asarray(regions, dtype=np.int64).reshape(-1, 4)
+    if len(regions) == 1:
+        x_min, x_max, y_min, y_max = regions[0]
+        return frame[None, y_min:y_max, x_min:x_max]
+    height = int(np.max(regions[:, 3] - regions[:, 2], initial=0))
+    width = int(np.max(regions[:, 1] - regions[:, 0], initial=0))
+    crops = np.zeros((len(regions), height, width) + frame.shape[2:],
+                     dtype=frame.dtype)
+    for crop, (x_min, x_max, y_min, y_max) in zip(crops, regions):
+        crop[:y_max - y_min, :x_max - x_min] = frame[y_min:y_max, x_min:x_max]
+    return crops
+
+
+def _summed_area_table(values, dtype):
+    """Computes a summed-area table with a leading row and column of zeros,
+    such that entry (y, x) is the sum of values[:y, :x]."""
+    height, width = values.shape
+    table = np.zeros((height + 1, width + 1), dtype=dtype)
+    np.cumsum(values, axis=0, dtype=dtype, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, dtype=dtype, out=table[1:, 1:])
+    return table
+
+
+class SegmentedDepthIntegralImages(object):
+    """Summed-area tables of the pixels of segmentation classes and of their
+    depths.
+
+    The tables are built once per frame, and then the number of pixels of a
+    class in any bounding box and their mean depth are computed in constant
+    time per bounding box.
+
+    Args:
+        class_ids: A height by width numpy array of segmentation class ids.
+        depth: A height by width numpy array of depths.
+        classes (list(:obj:`int`)): The segmentation classes for which to
+            build tables.
+        depth_scale (:obj:`float`): Factor that converts the depths to
+            metres.
+        region: An optional (x_min, x_max, y_min, y_max) region of the frames
+            to which the tables are restricted. Bounding boxes are clipped to
+            the region.
+    """
+    def __init__(self,
+                 class_ids,
+                 depth,
+                 classes,
+                 depth_scale=1.0,
+                 region=None):
+        assert class_ids.shape == depth.shape, \
+            'The segmented and depth frames must have the same size'
+        height, width = class_ids.shape
+        if region is None:
+            region = (0, width, 0, height)
+        x_min, x_max, y_min, y_max = (int(coord) for coord in region)
+        self._x_min, self._x_max = max(x_min, 0), min(max(x_max, 0), width)
+        self._y_min, self._y_max = max(y_min, 0), min(max(y_max, 0), height)
+        class_ids = class_ids[self._y_min:self._y_max,
+                              self._x_min:self._x_max]
+        depth = depth[self._y_min:self._y_max, self._x_min:self._x_max]
+        self._depth_scale = depth_scale
+        self._tables = {}
+        for segmentation_class in set(classes):
+            mask = class_ids == segmentation_class
+            # The number of pixels of a frame fits in int32.
+            self._tables[segmentation_class] = (
+                _summed_area_table(mask, np.int32),
+                _summed_area_table(np.multiply(mask, depth, dtype=np.float64),
+                                   np.float64))
+
+    @classmethod
+    def from_frames(cls, depth_frame, segmented_frame, classes, region=None):
+        """Builds the tables from a depth frame and a segmented frame.
+
+        Args:
+            depth_frame (:py:class:`~pylot.perception.depth_frame.DepthFrame`):
+                The depth frame.
+            segmented_frame (:py:class:`~pylot.perception.segmentation.segmented_frame.SegmentedFrame`):
+                The segmented frame.
+            classes (list(:obj:`int`)): The segmentation classes for which to
+                build tables.
+            region: An optional (x_min, x_max, y_min, y_max) region of the
+                frames to which the tables are restricted.
+        """
+        return cls(segmented_frame.get_class_ids(),
+                   depth_frame.as_numpy_array(), classes,
+                   depth_frame.meters_per_unit, region)
+
+    def get_class_statistics(self, bboxes, classes):
+        """Computes the statistics of the pixels of a class in each bounding
+        box.
+
+        Args:
+            bboxes: A N by 4 numpy array of (x_min, x_max, y_min, y_max)
+                bounding boxes. The boxes are clipped to the frame (or to
+                the region of the tables).
+            classes: A numpy array of N segmentation classes, or a single
+                class for all the bounding boxes.
+
+        Returns:
+            A tuple of numpy arrays: the number of pixels of each (clipped)
+            bounding box, the fraction of these pixels that belong to the
+            class, and the mean depth (in metres) of the pixels of the class,
+            which is NaN for bounding boxes without pixels of the class.
+        """
+        bboxes = np.reshape(bboxes, (-1, 4)).astype(np.int64)
+        classes = np.broadcast_to(classes, len(bboxes))
+        # Coordinates of the bounding boxes in the tables.
+        x_min, x_max = (np.clip(bboxes[:, i], self._x_min, self._x_max) -
+                        self._x_min for i in (0, 1))
+        y_min, y_max = (np.clip(bboxes[:, i], self._y_min, self._y_max) -
+                        self._y_min for i in (2, 3))
+        num_pixels = (np.maximum(x_max - x_min, 0) *
+                      np.maximum(y_max - y_min, 0))
+        class_pixels = np.zeros(len(bboxes), dtype=np.int64)
+        depth_sums = np.zeros(len(bboxes))
+        for segmentation_class in np.unique(classes):
+            indices = np.nonzero(classes == segmentation_class)[0]
+            for table, sums in zip(self._tables[segmentation_class],
+                                   (class_pixels, depth_sums)):
+                sums[indices] = (table[y_max[indices], x_max[indices]] -
+                                 table[y_min[indices], x_max[indices]] -
+                                 table[y_max[indices], x_min[indices]] +
+                                 table[y_min[indices], x_min[indices]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fractions = np.where(num_pixels > 0, class_pixels / num_pixels,
+                                 0.0)
+            mean_depths = np.where(
+                class_pixels > 0,
+                depth_sums / class_pixels * self._depth_scale, np.nan)
+        return num_pixels, fractions, mean_depths
 
 
 def load_coco_labels(labels_path):
@@ -479,57 +850,118 @@ def load_coco_bbox_colors(coco_labels):
     return colors
 
 
+def bounding_boxes_to_array(bboxes):
+    """Converts bounding boxes to a numpy array.
+
+    Args:
+        bboxes (list(:py:class:`.BoundingBox2D`)): The bounding boxes.
+
+    Returns:
+        A N by 4 numpy array, in which each row stores the x_min, x_max,
+        y_min, and y_max of a bounding box.
+    """
+    return np.array([[bbox.x_min, bbox.x_max, bbox.y_min, bbox.y_max]
+                     for bbox in bboxes],
+                    dtype=np.float64).reshape(-1, 4)
+
+
+def iou_matrix(bboxes_a, bboxes_b):
+    """Computes the IoU of every pair of bounding boxes.
+
+    The IoUs are computed in the same way as
+    :py:func:`.BoundingBox2D.calculate_iou`.
+
+    Args:
+        bboxes_a: A list of N :py:class:`.BoundingBox2D`, or a N by 4 numpy
+            array of (x_min, x_max, y_min, y_max) rows.
+        bboxes_b: A list of M :py:class:`.BoundingBox2D`, or a M by 4 numpy
+            array of (x_min, x_max, y_min, y_max) rows.
+
+    Returns:
+        A N by M numpy array, in which entry (i, j) is the IoU of the i-th
+        bounding box of bboxes_a and the j-th bounding box of bboxes_b.
+    """
+    if not isinstance(bboxes_a, np.ndarray):
+        bboxes_a = bounding_boxes_to_array(bboxes_a)
+    if not isinstance(bboxes_b, np.ndarray):
+        bboxes_b = bounding_boxes_to_array(bboxes_b)
+    x_min_a, x_max_a, y_min_a, y_max_a = (bboxes_a[:, i, None]
+                                          for i in range(4))
+    x_min_b, x_max_b, y_min_b, y_max_b = (bboxes_b[:, i] for i in range(4))
+    inter_width = np.clip(
+        np.minimum(x_max_a, x_max_b) - np.maximum(x_min_a, x_min_b) + 1, 0,
+        None)
+    inter_height = np.clip(
+        np.minimum(y_max_a, y_max_b) - np.maximum(y_min_a, y_min_b) + 1, 0,
+        None)
+    inter_area = inter_width * inter_height
+    area_a = (x_max_a - x_min_a + 1) * (y_max_a - y_min_a + 1)
+    area_b = (x_max_b - x_min_b + 1) * (y_max_b - y_min_b + 1)
+    return inter_area / (area_a + area_b - inter_area)
+
+
+def match_bounding_boxes(ious, iou_threshold):
+    """Greedily matches bounding boxes in descending order of IoU.
+
+    Each bounding box is matched at most once, and only pairs with an IoU
+    greater than the threshold are matched.
+
+    Args:
+        ious: A N by M numpy array of IoUs (e.g., computed with
+            :py:func:`.iou_matrix`).
+        iou_threshold (:obj:`float`): The IoU above which boxes can be
+            matched.
+
+    Returns:
+        list((:obj:`int`, :obj:`int`)): The (row, column) indices of the
+        matched pairs, in descending order of IoU.
+    """
+    rows, cols = np.nonzero(ious > iou_threshold)
+    # Stable sort such that ties are matched in row-major order.
+    order = np.argsort(-ious[rows, cols], kind='stable')
+    rows_matched = np.zeros(ious.shape[0], dtype=bool)
+    cols_matched = np.zeros(ious.shape[1], dtype=bool)
+    max_matches = min(ious.shape)
+    matches = []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if not rows_matched[row] and not cols_matched[col]:
+            rows_matched[row] = True
+            cols_matched[col] = True
+            matches.append((row, col))
+            if len(matches) == max_matches:
+                break
+    return matches
+
+
 def get_prediction_results(ground_truths, predictions, iou_threshold):
     """Calculate the number of true positives, false positives and false
-    negatives from the given ground truth and predictions."""
-    true_pos, false_pos, false_neg = None, None, None
+    negatives from the given ground truth and predictions.
 
+    Args:
+        ground_truths: A list of :py:class:`.BoundingBox2D`, or a numpy
+            array of bounding boxes (see :py:func:`.iou_matrix`).
+        predictions: A list of :py:class:`.BoundingBox2D`, or a numpy array
+            of bounding boxes.
+        iou_threshold (:obj:`float`): The IoU above which a prediction
+            matches a ground truth.
+    """
     # If there are no predictions, then everything is a false negative.
     if len(predictions) == 0:
-        true_pos, false_pos = 0, 0
-        false_neg = len(ground_truths)
-        return true_pos, false_pos, false_neg
+        return 0, 0, len(ground_truths)
 
     # If there is no ground truth, everything is a false positive.
     if len(ground_truths) == 0:
-        true_pos, false_neg = 0, 0
-        false_pos = len(predictions)
-        return true_pos, false_pos, false_neg
-
-    # Iterate over the predictions and calculate the IOU of each prediction
-    # with each ground truth.
-    ious = []
-    for i, prediction in enumerate(predictions):
-        for j, ground_truth in enumerate(ground_truths):
-            iou = prediction.calculate_iou(ground_truth)
-            if iou > iou_threshold:
-                ious.append((i, j, iou))
-
-    # If no IOUs were over the threshold, return all predictions as false
-    # positives and all ground truths as false negatives.
-    if len(ious) == 0:
-        true_pos = 0
-        false_pos, false_neg = len(predictions), len(ground_truths)
-    else:
-        # Sort the IOUs and match each box only once.
-        ground_truths_matched, predictions_matched = set(), set()
-        matched = []
-        for prediction, ground_truth, iou in sorted(ious,
-                                                    key=lambda x: x[-1],
-                                                    reverse=True):
-            if (ground_truth not in ground_truths_matched
-                    and prediction not in predictions_matched):
-                ground_truths_matched.add(ground_truth)
-                predictions_matched.add(prediction)
-                matched.append((prediction, ground_truth, iou))
-
-        # The matches are the true positives.
-        true_pos = len(matched)
-        # The unmatched predictions are the false positives.
-        false_pos = len(predictions) - len(predictions_matched)
-        # The umatched ground truths are the false negatives.
-        false_neg = len(ground_truths) - len(ground_truths_matched)
-
+        return 0, len(predictions), 0
+
+    # Match each box only once, in descending order of IoU.
+    matches = match_bounding_boxes(iou_matrix(predictions, ground_truths),
+                                   iou_threshold)
+    # The matches are the true positives.
+    true_pos = len(matches)
+    # The unmatched predictions are the false positives.
+    false_pos = len(predictions) - true_pos
+    # The umatched ground truths are the false negatives.
+    false_neg = len(ground_truths) - true_pos
     return true_pos, false_pos, false_neg
 
 
@@ -556,40 +988,131 @@ def get_precision_recall_at_iou(ground_truths, predictions, iou_threshold):
     return get_precision_recall(true_pos, false_pos, false_neg)
 
 
-def get_mAP(ground_obstacles, obstacles):
-    """Return mAP with IoU threshold of 0.5"""
-    confidence_bbox = []
-    for obstacle in obstacles:
-        confidence_bbox.append((obstacle.confidence, obstacle.bounding_box))
-    # Sort bboxes descending by score.
-    confidence_bbox.sort()
-    confidence_bbox.reverse()
-    detected_bboxes = [bbox for (score, bbox) in confidence_bbox]
-    ground_bboxes = [obstacle.bounding_box for obstacle in ground_obstacles]
-    # Compute recall precision. The results are sorted in descending
-    # order by recall.
-    prec_rec = []
-    while (len(detected_bboxes) > 0):
-        # Get precision recall with 0.5 IoU threshold .
-        precision, recall = get_precision_recall_at_iou(
-            ground_bboxes, detected_bboxes, 0.5)
-        prec_rec.append((precision, recall))
-        detected_bboxes.pop()
-    # Append (0, 0) to also cover the area from first recall point to 0 recall.
-    prec_rec.append((0, 0))
-    avg_precision = 0.0
-    max_precision = 0.0
-    max_precision = None
-    last_recall = None
-    for (precision, recall) in prec_rec:
-        if max_precision is None:
-            max_precision = precision
-            last_recall = recall
-        else:
-            avg_precision += (last_recall - recall) * max_precision
-            max_precision = max(max_precision, precision)
-            last_recall = recall
-    return avg_precision
+def match_detections(ious, iou_threshold):
+    """Matches detections to ground truths in a single sweep.
+
+    The detections are visited in order, and each detection is matched to
+    the unmatched ground truth with which it has the highest IoU.
+
+    Args:
+        ious: A N by M numpy array of the IoUs of N detections, sorted in
+            descending order of confidence, and M ground truths.
+        iou_threshold (:obj:`float`): The IoU above which a detection
+            matches a ground truth.
+
+    Returns:
+        A numpy array of N booleans that are True for the true positives.
+    """
+    true_positives = np.zeros(ious.shape[0], dtype=bool)
+    ground_matched = np.zeros(ious.shape[1], dtype=bool)
+    # Only the detections that overlap any ground truth can be matched.
+    for row in np.nonzero(np.any(ious > iou_threshold, axis=1))[0]:
+        row_ious = np.where(ground_matched, -1, ious[row])
+        col = np.argmax(row_ious)
+        if row_ious[col] > iou_threshold:
+            true_positives[row] = True
+            ground_matched[col] = True
+    return true_positives
+
+
+def compute_average_precision(true_positives, num_ground_truths):
+    """Integrates the precision/recall curve of a sweep over detections.
+
+    Args:
+        true_positives: A numpy array of booleans that are True for the
+            detections that are true positives, sorted in descending order
+            of confidence.
+        num_ground_truths (:obj:`int`): The number of ground truths.
+
+    Returns:
+        :obj:`float`: The area under the interpolated precision/recall
+        curve.
+    """
+    if len(true_positives) == 0 or num_ground_truths == 0:
+        return 0.0
+    cumulative_true_positives = np.cumsum(true_positives)
+    precision = cumulative_true_positives / np.arange(
+        1,
+        len(true_positives) + 1)
+    recall = cumulative_true_positives / float(num_ground_truths)
+    # Interpolate the precision at each recall with the maximum precision at
+    # any greater recall.
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum(np.diff(recall, prepend=0) * precision))
+
+
+def get_obstacle_class(label):
+    """Returns the class of an obstacle label used to compute per class AP.
+
+    All the vehicle labels (e.g., car, truck) are grouped in the vehicle
+    class.
+    """
+    if label in VEHICLE_LABELS:
+        return 'vehicle'
+    return label
+
+
+def get_average_precisions(ground_obstacles,
+                           obstacles,
+                           iou_thresholds=(0.5, )):
+    """Computes the average precision of detected obstacles.
+
+    The IoUs of the obstacles are computed once, and they are used for
+    every IoU threshold and for every class.
+
+    Args:
+        ground_obstacles (list(:py:class:`.DetectedObstacle`)): The ground
+            obstacles.
+        obstacles (list(:py:class:`.DetectedObstacle`)): The detected
+            obstacles.
+        iou_thresholds (list(:obj:`float`)): The IoU thresholds at which to
+            compute the average precisions.
+
+    Returns:
+        A tuple of a numpy array with the average precision of all the
+        obstacles at each IoU threshold, and a dictionary that maps each
+        class (see :py:func:`.get_obstacle_class`) to a numpy array with the
+        average precisions of the class.
+    """
+    # Sort obstacles descending by confidence.
+    order = np.argsort([-obstacle.confidence for obstacle in obstacles],
+                       kind='stable')
+    obstacles = [obstacles[index] for index in order]
+    ious = iou_matrix(
+        [obstacle.bounding_box for obstacle in obstacles],
+        [obstacle.bounding_box for obstacle in ground_obstacles])
+    average_precisions = np.array([
+        compute_average_precision(match_detections(ious, iou_threshold),
+                                  len(ground_obstacles))
+        for iou_threshold in iou_thresholds
+    ])
+
+    classes = [get_obstacle_class(obstacle.label) for obstacle in obstacles]
+    ground_classes = [
+        get_obstacle_class(obstacle.label) for obstacle in ground_obstacles
+    ]
+    class_average_precisions = {}
+    for obstacle_class in set(classes) | set(ground_classes):
+        rows = [i for i, cls in enumerate(classes) if cls == obstacle_class]
+        cols = [
+            j for j, cls in enumerate(ground_classes) if cls == obstacle_class
+        ]
+        class_ious = ious[np.ix_(rows, cols)]
+        num_ground_truths = class_ious.shape[1]
+        class_average_precisions[obstacle_class] = np.array([
+            compute_average_precision(
+                match_detections(class_ious, iou_threshold),
+                num_ground_truths) for iou_threshold in iou_thresholds
+        ])
+    return average_precisions, class_average_precisions
+
+
+def get_mAP(ground_obstacles, obstacles, iou_threshold=0.5):
+    """Return mAP with IoU threshold of 0.5 (by default)."""
+    average_precisions, _ = get_average_precisions(ground_obstacles,
+                                                   obstacles,
+                                                   [iou_threshold])
+    return average_precisions[0]
 
 
 def get_obstacle_locations(obstacles, depth_msg, ego_transform, camera_setup,
@@ -601,11 +1124,17 @@ def get_obstacle_locations(obstacles, depth_msg, ego_transform, camera_setup,
         transformed_camera_setup.set_transform(
             ego_transform * transformed_camera_setup.transform)
 
+        # Project the point cloud once, and look up every obstacle in the
+        # resulting depth buffer.
+        depth_buffer = point_cloud.get_depth_buffer(transformed_camera_setup)
         obstacles_with_location = []
         for obstacle in obstacles:
-            location = point_cloud.get_pixel_location(
+            # Search for the closest point in a window around the center of
+            # the bounding box.
+            location = depth_buffer.get_pixel_location(
                 obstacle.bounding_box.get_center_point(),
-                transformed_camera_setup)
+                max(obstacle.bounding_box.get_width(),
+                    obstacle.bounding_box.get_height()) // 2)
             if location is not None:
                 obstacle.transform = pylot.utils.Transform(
                     location, pylot.utils.Rotation())
@@ -619,9 +1148,10 @@ def get_obstacle_locations(obstacles, depth_msg, ego_transform, camera_setup,
         depth_frame = depth_msg.frame
         depth_frame.camera_setup.set_transform(
             ego_transform * depth_frame.camera_setup.transform)
-        center_points = [
+        center_points = pylot.utils.Vector2DArray.from_vectors([
             obstacle.bounding_box.get_center_point() for obstacle in obstacles
-        ]
+        ])
+        # Only the center points are unprojected, not the entire frame.
         locations = depth_frame.get_pixel_locations(center_points)
         for index, obstacle in enumerate(obstacles):
             obstacle.transform = pylot.utils.Transform(locations[index],
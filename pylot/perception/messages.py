@@ -5,6 +5,7 @@ import erdos
 import pylot.perception.camera_frame
 import pylot.perception.depth_frame
 import pylot.perception.point_cloud
+from pylot.perception.detection.utils import DetectedObstacleArray
 from pylot.perception.segmentation.segmented_frame import SegmentedFrame
 
 
@@ -167,11 +168,24 @@ class IMUMessage(erdos.Message):
 class ObstaclesMessage(erdos.Message):
     """Used to send detected obstacles.
 
+    The obstacles can be sent either as a list of objects, or as a
+    :py:class:`~pylot.perception.detection.utils.DetectedObstacleArray`,
+    which is cheaper to serialize and to process with numpy. The message
+    converts lazily between the two representations.
+
+    Once the list is created or accessed, it is the authoritative
+    representation, because consumers can modify it (e.g., set the
+    transforms of the obstacles) before they forward the message. The
+    message then serializes the list, and obstacle_array returns a snapshot
+    of the list at the time of the access, whose changes are not reflected
+    in the message.
+
     Args:
         timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp of the
             message.
         obstacles (list(:py:class:`~pylot.perception.detection.utils.DetectedObstacle`)):
-            Detected obstacles.
+            Detected obstacles, or a
+            :py:class:`~pylot.perception.detection.utils.DetectedObstacleArray`.
         runtime (:obj:`float`, optional): The runtime of the operator that
             produced the obstacles (in ms).
 
@@ -179,21 +193,56 @@ class ObstaclesMessage(erdos.Message):
     Attributes:
         obstacles (list(:py:class:`~pylot.perception.detection.utils.DetectedObstacle`)):
             Detected obstacles.
+        obstacle_array (:py:class:`~pylot.perception.detection.utils.DetectedObstacleArray`):
+            Detected obstacles in a columnar layout. Only available for
+            messages that carry detected obstacles.
         runtime (:obj:`float`, optional): The runtime of the operator that
             produced the obstacles (in ms).
     """
     def __init__(self, timestamp, obstacles, runtime=0):
         super(ObstaclesMessage, self).__init__(timestamp, None)
-        self.obstacles = obstacles
+        if isinstance(obstacles, DetectedObstacleArray):
+            self._obstacle_array = obstacles
+            self._obstacles = None
+        else:
+            self._obstacle_array = None
+            self._obstacles = obstacles
         self.runtime = runtime
 
+    @property
+    def obstacles(self):
+        if self._obstacles is None:
+            self._obstacles = self._obstacle_array.as_obstacles()
+            # The list can be modified, so the array would become stale.
+            self._obstacle_array = None
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, obstacles):
+        self._obstacles = obstacles
+        self._obstacle_array = None
+
+    @property
+    def obstacle_array(self):
+        if self._obstacles is not None:
+            return DetectedObstacleArray.from_obstacles(self._obstacles)
+        return self._obstacle_array
+
+    def __getstate__(self):
+        # Only one of the representations is serialized.
+        state = self.__dict__.copy()
+        if self._obstacles is not None:
+            state['_obstacle_array'] = None
+        return state
+
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
         return 'ObstaclesMessage(timestamp: {}, runtime: {}, '\
             'obstacles: {})'.format(
-                self.timestamp, self.runtime, self.obstacles)
+                self.timestamp, self.runtime, self._obstacles
+                if self._obstacles is not None else self._obstacle_array)
 
 
 class ObstaclePositionsSpeedsMessage(erdos.Message):
@@ -0,0 +1,411 @@
+"""Implements a process-wide registry that shares models between operators.
+
+Operators that run in the same process and use the same model (e.g.,
+several detectors, or the per-camera copies of an operator) acquire a handle
+to it from the registry. The model is loaded once per (path, device, dtype,
+settings), and it is closed when the last handle is released.
+"""
+
+import contextlib
+import logging
+import os
+import resource
+import threading
+import time
+
+from pylot.utils import set_tf_loglevel, time_epoch_ms
+
+
+def get_resident_memory():
+    """Returns the resident memory (in bytes) of the process.
+
+    Falls back to the peak resident memory on platforms without procfs.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _ModelEntry(object):
+    """A model loaded by the registry, and its bookkeeping."""
+    def __init__(self, key, model, thread_safe, load_time, memory):
+        self.key = key
+        self.model = model
+        # Serializes the invocations of models that are not thread-safe.
+        self.lock = None if thread_safe else threading.Lock()
+        self.ref_count = 0
+        self.load_time = load_time
+        self.memory = memory
+
+
+class ModelHandle(object):
+    """A reference to a model that is shared through a
+    :py:class:`.ModelRegistry`.
+
+    Calling the handle invokes the model. The calls of the handles of a
+    model that is not thread-safe are serialized.
+
+    Attributes:
+        loaded (:obj:`bool`): True if the model was loaded when this handle
+            was acquired, False if the handle shares an already loaded model.
+    """
+    def __init__(self, registry, entry, loaded):
+        self._registry = registry
+        self._entry = entry
+        self.loaded = loaded
+
+    @property
+    def model(self):
+        """The shared model."""
+        return self._entry.model
+
+    @property
+    def key(self):
+        """The (path, device, dtype, settings) key of the model."""
+        return self._entry.key
+
+    @property
+    def device(self):
+        """The device on which the model runs."""
+        return self._entry.key[1]
+
+    @property
+    def load_time(self):
+        """Time (in ms) it took to load the model."""
+        return self._entry.load_time
+
+    @property
+    def memory(self):
+        """Resident memory (in bytes) the process gained when the model was
+        loaded."""
+        return self._entry.memory
+
+    def __call__(self, *args, **kwargs):
+        if self._entry is None:
+            raise ValueError('The model handle was released')
+        if self._entry.lock is None:
+            return self._entry.model(*args, **kwargs)
+        with self._entry.lock:
+            return self._entry.model(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Returns a context manager that yields the model, for libraries
+        that invoke the model themselves. Like calls of the handle, the uses
+        of a model that is not thread-safe are serialized."""
+        if self._entry is None:
+            raise ValueError('The model handle was released')
+        if self._entry.lock is None:
+            yield self._entry.model
+        else:
+            with self._entry.lock:
+                yield self._entry.model
+
+    def release(self):
+        """Releases the handle. The model is closed once all its handles are
+        released."""
+        if self._entry is not None:
+            self._registry._release(self._entry)
+            self._entry = None
+
+
+class ModelRegistry(object):
+    """Loads each model once, and hands out reference-counted handles to it.
+
+    The registry is thread-safe. Concurrent acquisitions of the same model
+    wait for a single load, while different models load concurrently.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        # The [lock, number of acquisitions that use it] that serializes the
+        # loads of each key, while acquisitions of the key are in progress.
+        self._load_locks = {}
+
+    def acquire(self,
+                path,
+                loader,
+                device='cpu',
+                dtype='float32',
+                thread_safe=False,
+                logger=None,
+                settings=()):
+        """Returns a handle to a model, and loads it if needed.
+
+        Args:
+            path (:obj:`str`): Path of the model.
+            loader: Function that loads and returns the model. It is only
+                invoked if the model is not loaded. The model must be
+                callable, and it can define a close method that is invoked
+                when the model is unloaded.
+            device (:obj:`str`): Device on which the model runs.
+            dtype (:obj:`str`): Data type of the weights of the model.
+            thread_safe (:obj:`bool`): True if the model can be invoked
+                concurrently from several threads.
+            logger (:obj:`logging.Logger`, optional): Logger to which the
+                load time and memory of the model are logged.
+            settings (:obj:`tuple`): Hashable settings with which the model
+                is loaded (e.g., the session options). Acquisitions with
+                different settings get different models.
+
+        Returns:
+            :py:class:`.ModelHandle`: A handle to the model.
+        """
+        key = (os.path.abspath(path), device, dtype, tuple(settings))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.ref_count += 1
+                return ModelHandle(self, entry, False)
+            load_lock = self._load_locks.setdefault(
+                key, [threading.Lock(), 0])
+            load_lock[1] += 1
+        try:
+            with load_lock[0]:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry.ref_count += 1
+                        return ModelHandle(self, entry, False)
+                memory = get_resident_memory()
+                start_time = time.time()
+                model = loader()
+                load_time = (time.time() - start_time) * 1000
+                memory = max(get_resident_memory() - memory, 0)
+                entry = _ModelEntry(key, model, thread_safe, load_time,
+                                    memory)
+                entry.ref_count = 1
+                with self._lock:
+                    self._entries[key] = entry
+        finally:
+            with self._lock:
+                load_lock[1] -= 1
+                if load_lock[1] == 0:
+                    del self._load_locks[key]
+        if logger is not None:
+            logger.info('Loaded model {} on {} ({}) in {:.1f} ms, using '
+                        '{:.1f} MB'.format(path, device, dtype, load_time,
+                                           memory / 2.0**20))
+        return ModelHandle(self, entry, True)
+
+    def get_stats(self):
+        """Returns the statistics of the loaded models.
+
+        Returns:
+            list(tuple): A (key, number of handles, load time in ms, memory in
+            bytes) tuple for each loaded model.
+        """
+        with self._lock:
+            return [(entry.key, entry.ref_count, entry.load_time,
+                     entry.memory) for entry in self._entries.values()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _release(self, entry):
+        with self._lock:
+            entry.ref_count -= 1
+            if entry.ref_count > 0:
+                return
+            del self._entries[entry.key]
+        close = getattr(entry.model, 'close', None)
+        if close is not None:
+            close()
+
+
+# The registry shared by the operators of the process.
+MODEL_REGISTRY = ModelRegistry()
+
+
+class ModelLoader(object):
+    """Loads and warms up the model of an operator.
+
+    The first inferences of a model pay for graph optimizations and memory
+    allocations. The loader runs dummy inferences after the model is loaded,
+    such that the first frame does not pay these costs. The model can be
+    loaded on a background thread, in which case the operator is constructed
+    right away, and :py:func:`.wait` gates the first inference.
+
+    Args:
+        load: Function that loads the model.
+        warm_up: Function that runs a dummy inference on the model.
+        num_warm_up_runs (:obj:`int`): Number of dummy inferences.
+        background (:obj:`bool`): True to load the model on a background
+            thread, False to load it before the constructor returns.
+        name (:obj:`str`): Name of the operator that uses the model.
+        csv_logger (:obj:`logging.Logger`, optional): Logger to which the load
+            time and the warm-up runtimes are logged, as model_load_time and
+            warm_up_runtime entries.
+
+    Attributes:
+        load_time (:obj:`float`): Time (in ms) it took to load the model.
+        warm_up_runtimes (list(:obj:`float`)): Runtimes (in ms) of the dummy
+            inferences.
+    """
+    def __init__(self,
+                 load,
+                 warm_up=None,
+                 num_warm_up_runs=0,
+                 background=False,
+                 name='model',
+                 csv_logger=None):
+        self._load = load
+        self._warm_up = warm_up
+        self._num_warm_up_runs = num_warm_up_runs if warm_up else 0
+        self._name = name
+        self._csv_logger = csv_logger
+        self._ready = threading.Event()
+        self._error = None
+        self.load_time = None
+        self.warm_up_runtimes = []
+        if background:
+            thread = threading.Thread(target=self._run,
+                                      name='{}-loader'.format(name))
+            thread.daemon = True
+            thread.start()
+        else:
+            self._run()
+            self.wait()
+
+    @property
+    def ready(self):
+        """True if the model is loaded and warmed up."""
+        return self._ready.is_set() and self._error is None
+
+    def wait(self):
+        """Blocks until the model is loaded and warmed up.
+
+        Raises:
+            The exception raised while loading or warming up the model.
+        """
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            start_time = time.time()
+            self._load()
+            self.load_time = (time.time() - start_time) * 1000
+            self._log('model_load_time', self.load_time)
+            for _ in range(self._num_warm_up_runs):
+                start_time = time.time()
+                self._warm_up()
+                runtime = (time.time() - start_time) * 1000
+                self.warm_up_runtimes.append(runtime)
+                self._log('warm_up_runtime', runtime)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    def _log(self, key, value):
+        if self._csv_logger is not None:
+            self._csv_logger.info('{},{},{},{:.4f}'.format(
+                time_epoch_ms(), self._name, key, value))
+
+
+class FrozenGraphModel(object):
+    """A TensorFlow frozen inference graph, and the session that runs it.
+
+    Calling the model runs the session.
+
+    Args:
+        path (:obj:`str`): Path to the model pb file.
+        gpu_memory_fraction (:obj:`float`): GPU memory fraction allocated to
+            the session.
+        num_threads (:obj:`int`): Number of threads used by the CPU kernels.
+            0 to let TensorFlow decide.
+    """
+    def __init__(self, path, gpu_memory_fraction, num_threads=0):
+        import tensorflow as tf
+        self.graph = tf.Graph()
+        # Load the model from the model file.
+        set_tf_loglevel(logging.ERROR)
+        with self.graph.as_default():
+            od_graph_def = tf.GraphDef()
+            with tf.gfile.GFile(path, 'rb') as fid:
+                serialized_graph = fid.read()
+                od_graph_def.ParseFromString(serialized_graph)
+                tf.import_graph_def(od_graph_def, name='')
+        gpu_options = tf.GPUOptions(
+            per_process_gpu_memory_fraction=gpu_memory_fraction)
+        # Create a TensorFlow session.
+        self.session = tf.Session(
+            graph=self.graph,
+            config=tf.ConfigProto(gpu_options=gpu_options,
+                                  intra_op_parallelism_threads=num_threads,
+                                  inter_op_parallelism_threads=num_threads))
+
+    def get_tensor(self, name):
+        return self.graph.get_tensor_by_name(name)
+
+    def __call__(self, fetches, feed_dict):
+        return self.session.run(fetches, feed_dict=feed_dict)
+
+    def close(self):
+        self.session.close()
+
+
+def acquire_frozen_graph(path,
+                         gpu_memory_fraction,
+                         num_threads=0,
+                         logger=None,
+                         registry=MODEL_REGISTRY):
+    """Acquires a handle to a shared :py:class:`.FrozenGraphModel`.
+
+    The model is only shared by the acquisitions that request the same
+    session settings.
+    """
+    device = 'gpu' if gpu_memory_fraction > 0 else 'cpu'
+    return registry.acquire(
+        path,
+        lambda: FrozenGraphModel(path, gpu_memory_fraction, num_threads),
+        device=device,
+        thread_safe=True,
+        logger=logger,
+        settings=(gpu_memory_fraction, num_threads))
+
+
+def acquire_torch_model(path,
+                        build_model,
+                        device=None,
+                        dtype='float32',
+                        num_threads=0,
+                        logger=None,
+                        registry=MODEL_REGISTRY):
+    """Acquires a handle to a shared torch model in evaluation mode.
+
+    Args:
+        path (:obj:`str`): Path to the state dict of the model.
+        build_model: Function that returns the model, which the state dict is
+            loaded into.
+        device (:obj:`str`): Torch device on which the model runs. Defaults
+            to cuda if it is available.
+        dtype (:obj:`str`): float32, or float16 to run the model in half
+            precision.
+        num_threads (:obj:`int`): Number of threads used by torch on the CPU.
+            0 to let torch decide.
+    """
+    import torch
+    if device is None:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+    def load():
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        model = build_model()
+        model.load_state_dict(torch.load(path, map_location=device))
+        model = model.to(device)
+        if dtype == 'float16':
+            model = model.half()
+        return model.eval()
+
+    return registry.acquire(path,
+                            load,
+                            device=device,
+                            dtype=dtype,
+                            logger=logger)
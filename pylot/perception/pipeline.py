@@ -0,0 +1,163 @@
+"""Implements a helper that overlaps the stages of perception operators."""
+
+import logging
+import threading
+try:
+    import queue as queue
+except ImportError:
+    import Queue as queue
+
+# Kinds of the entries that flow through the stage queues.
+_ITEM = 0
+_CALLBACK = 1
+_STOP = 2
+# Callbacks that run even if items were dropped.
+_BARRIER = 3
+
+
+class Pipeline(object):
+    """Runs items through a sequence of stages (e.g., pre-processing,
+    inference, and post-processing).
+
+    If the pipeline is threaded, each stage runs on its own worker thread, and
+    the stages are connected by bounded queues. While an item is in a stage,
+    the next item can be in the previous stage, and the previous item in the
+    next stage. Items complete the stages in the order in which they are
+    submitted. Otherwise, the stages run on the thread that submits the item.
+
+    Args:
+        stages (list(callable)): The stages. The first stage is invoked with
+            the submitted items, and each of the other stages with the value
+            returned by the previous stage. The last stage is expected to
+            emit its results (e.g., to send them on a stream).
+        threaded (:obj:`bool`): True to run the stages on worker threads.
+        queue_size (:obj:`int`): Maximum number of items that wait before
+            each stage. :py:func:`.submit` blocks while the first queue is
+            full.
+        name (:obj:`str`): Name used for the worker threads.
+        logger (:obj:`logging.Logger`, optional): Logger to which the
+            exceptions raised by the stages on the worker threads are
+            logged.
+    """
+    def __init__(self,
+                 stages,
+                 threaded=True,
+                 queue_size=1,
+                 name='pipeline',
+                 logger=None):
+        if len(stages) == 0:
+            raise ValueError('A pipeline requires at least one stage')
+        if queue_size < 1:
+            raise ValueError('Unexpected queue size {}'.format(queue_size))
+        self._stages = stages
+        self._threaded = threaded
+        self._logger = logger or logging.getLogger(name)
+        self._error = None
+        self._queues = []
+        self._threads = []
+        if threaded:
+            self._queues = [
+                queue.Queue(maxsize=queue_size) for _ in range(len(stages))
+            ]
+            for index in range(len(stages)):
+                thread = threading.Thread(target=self._run_stage,
+                                          args=(index, ),
+                                          name='{}-stage-{}'.format(
+                                              name, index))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    @property
+    def threaded(self):
+        """True if the stages run on worker threads."""
+        return self._threaded
+
+    def submit(self, item):
+        """Submits an item to the first stage.
+
+        If the pipeline is threaded, an exception raised by a stage drops the
+        item, and it is logged. It is not raised to the submitting thread,
+        which would drop the next, healthy item instead. Otherwise, the
+        exception propagates out of this call.
+        """
+        if self._threaded:
+            self._queues[0].put((_ITEM, item))
+        else:
+            for stage in self._stages:
+                item = stage(item)
+
+    def run_after(self, callback):
+        """Invokes callback once all the previously submitted items have
+        completed the last stage (e.g., to forward a watermark).
+
+        If the pipeline is threaded, the callback runs on the thread of the
+        last stage. If a stage raised an exception on any item submitted
+        since the previous callback, the callback is not invoked, like it is
+        not invoked when the exception propagates out of
+        :py:func:`.submit` in the non-threaded pipeline.
+        """
+        if self._threaded:
+            self._queues[0].put((_CALLBACK, callback))
+        else:
+            callback()
+
+    def drain(self):
+        """Blocks until all the submitted items have completed the stages.
+
+        Raises:
+            The first exception raised by a stage since the previous call of
+            :py:func:`.drain` or :py:func:`.close`, if any.
+        """
+        if self._threaded:
+            done = threading.Event()
+            self._queues[0].put((_BARRIER, done.set))
+            done.wait()
+        self._raise_error()
+
+    def close(self):
+        """Completes the submitted items, and stops the worker threads."""
+        if self._threaded:
+            self._queues[0].put((_STOP, None))
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+            self._threaded = False
+        self._raise_error()
+
+    def _run_stage(self, index):
+        stage = self._stages[index]
+        is_last = index == len(self._stages) - 1
+        next_queue = None if is_last else self._queues[index + 1]
+        # True if an item was dropped since the previous callback.
+        dropped = False
+        while True:
+            kind, value = self._queues[index].get()
+            if kind == _CALLBACK and dropped:
+                # The callback (e.g., which forwards a watermark) must not
+                # run for the items that were not completed.
+                dropped = False
+                continue
+            try:
+                if kind == _ITEM:
+                    value = stage(value)
+                elif kind in (_CALLBACK, _BARRIER) and is_last:
+                    value()
+            except Exception as e:
+                # The item is dropped, and the error is raised when the
+                # pipeline is drained or closed.
+                self._logger.exception('Stage {} failed'.format(index))
+                if self._error is None:
+                    self._error = e
+                if kind == _ITEM:
+                    dropped = True
+                continue
+            if not is_last:
+                next_queue.put((kind, value))
+            if kind == _STOP:
+                return
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
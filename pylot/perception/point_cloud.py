@@ -3,7 +3,35 @@ import numpy as np
 from numpy.linalg import inv
 import os
 
-from pylot.utils import Location, Transform, Vector2D
+import pylot.perception.binary_format as binary_format
+from pylot.utils import Location, LocationArray, Vector2D
+
+# Rotations that convert points in lidar coordinates to points in camera
+# coordinates. See CameraSetup in pylot/drivers/sensor_setup.py for camera
+# coordinate axis orientations.
+#
+# The CARLA Lidar coordinate space is defined as:
+# +x to right, +y out of the screen, +z down.
+#
+# The Velodyne coordinate space is defined as:
+# +x into the screen, +y to the left, and +z up.
+#
+# Note: We're using the ROS velodyne driver coordinate
+# system, not the one specified in the Velodyne manual.
+# Link to the ROS coordinate system:
+# https://www.ros.org/reps/rep-0103.html#axis-orientation
+_LIDAR_TO_CAMERA_MATRICES = {
+    'sensor.lidar.ray_cast': np.array([[1, 0, 0], [0, 0, 1], [0, -1, 0]]),
+    'velodyne': np.array([[0, -1, 0], [0, 0, -1], [1, 0, 0]]),
+}
+# The rotations are axis permutations with sign flips. Camera axis i is lidar
+# axis _LIDAR_TO_CAMERA_AXES[lidar_type][0][i] multiplied by
+# _LIDAR_TO_CAMERA_AXES[lidar_type][1][i].
+_LIDAR_TO_CAMERA_AXES = {
+    lidar_type: (np.argmax(np.abs(matrix), axis=1),
+                 matrix[np.arange(3), np.argmax(np.abs(matrix), axis=1)])
+    for lidar_type, matrix in _LIDAR_TO_CAMERA_MATRICES.items()
+}
 
 
 class PointCloud(object):
@@ -31,40 +59,111 @@ class PointCloud(object):
     def from_carla_point_cloud(cls, carla_pc, lidar_setup):
         """Creates a pylot point cloud from a carla point cloud.
 
+        The points are copied only once, when they are converted to camera
+        coordinates.
+
         Returns:
           :py:class:`.PointCloud`: A point cloud.
         """
         points = np.frombuffer(carla_pc.raw_data, dtype=np.dtype('f4'))
-        points = copy.deepcopy(points)
         points = np.reshape(points, (int(points.shape[0] / 3), 3))
         return cls(points, lidar_setup)
 
     def _to_camera_coordinates(self, points):
-        # Converts points in lidar coordinates to points in camera coordinates.
-        # See CameraSetup in pylot/drivers/sensor_setup.py for coordinate
-        # axis orientations.
-        #
-        # The CARLA Lidar coordinate space is defined as:
-        # +x to right, +y out of the screen, +z down.
-        #
-        # The Velodyne coordinate space is defined as:
-        # +x into the screen, +y to the left, and +z up.
-        #
-        # Note: We're using the ROS velodyne driver coordinate
-        # system, not the one specified in the Velodyne manual.
-        # Link to the ROS coordinate system:
-        # https://www.ros.org/reps/rep-0103.html#axis-orientation
-        if self._lidar_setup.lidar_type == 'sensor.lidar.ray_cast':
-            to_camera_transform = Transform(matrix=np.array(
-                [[1, 0, 0, 0], [0, 0, 1, 0], [0, -1, 0, 0], [0, 0, 0, 1]]))
-        elif self._lidar_setup.lidar_type == 'velodyne':
-            to_camera_transform = Transform(matrix=np.array(
-                [[0, -1, 0, 0], [0, 0, -1, 0], [1, 0, 0, 0], [0, 0, 0, 1]]))
-        else:
+        """Converts points in lidar coordinates to float32 points in camera
+        coordinates.
+
+        The conversion only permutes the axes and flips their signs, so each
+        camera axis is written directly from the corresponding lidar axis.
+        The input points are not modified, and they are copied exactly once.
+        """
+        if self._lidar_setup.lidar_type not in _LIDAR_TO_CAMERA_AXES:
             raise ValueError('Unexpected lidar type {}'.format(
                 self._lidar_setup.lidar_type))
-        transformed_points = to_camera_transform.transform_points(points)
-        return transformed_points
+        axes, signs = _LIDAR_TO_CAMERA_AXES[self._lidar_setup.lidar_type]
+        points = np.reshape(points, (-1, 3))
+        camera_points = np.empty((len(points), 3), dtype=np.float32)
+        for index in range(3):
+            np.multiply(points[:, axes[index]],
+                        signs[index],
+                        out=camera_points[:, index],
+                        casting='unsafe')
+        return camera_points
+
+    def crop(self,
+             max_range=None,
+             fov=None,
+             min_height=None,
+             max_height=None):
+        """Selects the points that are within a region of interest.
+
+        The region is defined relative to the lidar.
+
+        Args:
+            max_range (:obj:`float`): Maximum distance (in metres) of the
+                points from the lidar.
+            fov (:obj:`float`): Horizontal field of view (in degrees),
+                centered on the forward axis of the lidar.
+            min_height (:obj:`float`): Minimum height (in metres) of the
+                points relative to the lidar.
+            max_height (:obj:`float`): Maximum height (in metres) of the
+                points relative to the lidar.
+
+        Returns:
+            :py:class:`.PointCloud`: A point cloud with the selected points.
+        """
+        # The points are in camera coordinates: +x to right, +y down, and
+        # +z forward.
+        x, y, z = self.points[:, 0], self.points[:, 1], self.points[:, 2]
+        mask = np.ones(len(self.points), dtype=bool)
+        if max_range is not None:
+            mask &= x * x + y * y + z * z <= max_range * max_range
+        if fov is not None:
+            mask &= np.abs(np.arctan2(x, z)) <= np.radians(fov) / 2
+        if min_height is not None:
+            mask &= -y >= min_height
+        if max_height is not None:
+            mask &= -y <= max_height
+        return self._with_points(self.points[mask])
+
+    def voxel_downsample(self, leaf_size):
+        """Downsamples the point cloud using a voxel grid.
+
+        The points that fall in the same cubic voxel are replaced by their
+        centroid.
+
+        Args:
+            leaf_size (:obj:`float`): Size (in metres) of the voxels.
+
+        Returns:
+            :py:class:`.PointCloud`: A point cloud with at most one point per
+            voxel.
+        """
+        if leaf_size <= 0:
+            raise ValueError('leaf_size should be positive')
+        if len(self.points) == 0:
+            return self._with_points(self.points)
+        voxels = np.floor(self.points / leaf_size).astype(np.int64)
+        voxels -= voxels.min(axis=0)
+        # Hash the voxel coordinates into a single integer key.
+        extent = voxels.max(axis=0) + 1
+        keys = (voxels[:, 0] * extent[1] + voxels[:, 1]) * extent[2] + \
+            voxels[:, 2]
+        _, inverse, counts = np.unique(keys,
+                                       return_inverse=True,
+                                       return_counts=True)
+        centroids = np.empty((len(counts), 3), dtype=self.points.dtype)
+        for axis in range(3):
+            centroids[:, axis] = np.bincount(
+                inverse, weights=self.points[:, axis]) / counts
+        return self._with_points(centroids)
+
+    def _with_points(self, points):
+        """Returns a copy of the point cloud with different camera
+        coordinate points."""
+        point_cloud = copy.copy(self)
+        point_cloud.points = points
+        return point_cloud
 
     def get_pixel_location(self, pixel, camera_setup):
         """ Gets the 3D world location from pixel coordinates.
@@ -97,6 +196,23 @@ class PointCloud(object):
                                   camera_point_cloud[2])
         return pixel_location
 
+    def get_depth_buffer(self, camera_setup):
+        """Projects the point cloud into a camera-aligned depth buffer.
+
+        The buffer is computed once, and it answers pixel location queries
+        without scanning the entire point cloud. Like
+        :py:func:`.get_pixel_location`, it assumes that the point cloud and
+        the camera are at the same location.
+
+        Args:
+            camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
+                The setup of the camera.
+
+        Returns:
+            :py:class:`.DepthBuffer`: The depth buffer.
+        """
+        return DepthBuffer(self.points, camera_setup)
+
     @staticmethod
     def get_closest_point_in_point_cloud(fwd_points, pixel):
         """Finds the closest depth normalized point cloud point.
@@ -123,20 +239,34 @@ class PointCloud(object):
                         fwd_points[closest_index][1],
                         fwd_points[closest_index][2])
 
-    def save(self, timestamp, data_path, file_base):
+    def save(self, timestamp, data_path, file_base, file_format='ply'):
         """Saves the point cloud to a file.
 
         Args:
             timestamp (:obj:`int`): Timestamp associated with the point cloud.
             data_path (:obj:`str`): Path where to save the point cloud.
             file_base (:obj:`str`): Base name of the file.
+            file_format (:obj:`str`): ply to save a .ply file, or bin to save
+                the float32 points in camera coordinates in a
+                :py:mod:`~pylot.perception.binary_format` .bin file.
         """
-        import open3d as o3d
-        file_name = os.path.join(data_path,
-                                 '{}-{}.ply'.format(file_base, timestamp))
-        pcd = o3d.PointCloud()
-        pcd.points = o3d.Vector3dVector(self.points)
-        o3d.write_point_cloud(file_name, pcd)
+        if file_format == 'bin':
+            file_name = os.path.join(data_path,
+                                     '{}-{}.bin'.format(file_base, timestamp))
+            binary_format.write(file_name,
+                                self.points.astype(np.float32, copy=False),
+                                timestamp,
+                                self._lidar_setup,
+                                coordinates='camera')
+        elif file_format == 'ply':
+            import open3d as o3d
+            file_name = os.path.join(data_path,
+                                     '{}-{}.ply'.format(file_base, timestamp))
+            pcd = o3d.PointCloud()
+            pcd.points = o3d.Vector3dVector(self.points)
+            o3d.write_point_cloud(file_name, pcd)
+        else:
+            raise ValueError('Unexpected file format {}'.format(file_format))
 
     def __repr__(self):
         return self.__str__()
@@ -144,3 +274,157 @@ class PointCloud(object):
     def __str__(self):
         return 'PointCloud(transform: {}, number of points: {})'.format(
             self.transform, len(self.points))
+
+
+class DepthBuffer(object):
+    """Sparse depth image obtained by projecting a point cloud into a camera.
+
+    Each pixel stores the depth of, and the index of, the nearest point that
+    projects onto it.
+
+    Args:
+        points: A (number of points) by 3 numpy array of points in camera
+            coordinates.
+        camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
+            The setup of the camera.
+
+    Attributes:
+        depth: A height by width numpy array with the depth (in metres) of
+            the nearest point that projects onto each pixel, or inf if no
+            point projects onto the pixel.
+        indices: A height by width numpy array with the index of the nearest
+            point that projects onto each pixel, or -1 if no point projects
+            onto the pixel.
+        camera_setup (:py:class:`~pylot.drivers.sensor_setup.CameraSetup`):
+            The setup of the camera.
+    """
+    def __init__(self, points, camera_setup):
+        self.camera_setup = camera_setup
+        width, height = camera_setup.width, camera_setup.height
+        self.depth = np.full((height, width), np.inf)
+        self.indices = np.full((height, width), -1, dtype=np.int64)
+        # Select only points that are in front.
+        fwd_indices = np.nonzero(points[:, 2] > 0.0)[0]
+        fwd_points = points[fwd_indices]
+        self._intrinsic_mat = camera_setup.get_intrinsic_matrix()
+        # Continuous pixel coordinates of the points that are in front.
+        pixels = np.dot(fwd_points / fwd_points[:, 2:3],
+                        self._intrinsic_mat.T)[:, :2]
+        self._fwd_indices = fwd_indices
+        self._fwd_pixels = pixels
+        self._points = points
+        pixels = np.round(pixels).astype(np.int64)
+        in_view = ((pixels[:, 0] >= 0) & (pixels[:, 0] < width) &
+                   (pixels[:, 1] >= 0) & (pixels[:, 1] < height))
+        pixels = pixels[in_view]
+        depths = fwd_points[in_view, 2]
+        indices = fwd_indices[in_view]
+        # Keep the nearest point of every pixel: sort the points by depth,
+        # and select the first point of every pixel.
+        order = np.argsort(depths, kind='stable')
+        flat_pixels = (pixels[:, 1] * width + pixels[:, 0])[order]
+        flat_pixels, first = np.unique(flat_pixels, return_index=True)
+        self.depth.flat[flat_pixels] = depths[order][first]
+        self.indices.flat[flat_pixels] = indices[order][first]
+
+    def get_pixel_location(self, pixel, search_radius=None):
+        """Gets the 3D world location from pixel coordinates.
+
+        The depth of the pixel is the depth of the point whose projection is
+        the closest to the pixel. The closest point is first searched in a
+        window around the pixel, which costs O(window area), and then in the
+        entire point cloud.
+
+        Args:
+            pixel (:py:class:`~pylot.utils.Vector2D`): Pixel coordinates.
+            search_radius (:obj:`int`): Half size of the window in which the
+                closest point is searched. Defaults to searching only the
+                pixel.
+
+        Returns:
+            :py:class:`~pylot.utils.Location`: The 3D world location, or None
+            if all the point cloud points are behind.
+        """
+        index = self._get_closest_point_index(int(pixel.x), int(pixel.y),
+                                              search_radius or 0)
+        if index is None:
+            return None
+        location = self._unproject(np.array([[pixel.x, pixel.y]]),
+                                   self._points[index, 2])[0]
+        return Location(location[0], location[1], location[2])
+
+    def get_pixel_locations(self, pixels, search_radius=None):
+        """Gets the 3D world locations from pixel coordinates.
+
+        Args:
+            pixels (:py:class:`~pylot.utils.Vector2DArray`): Pixel
+                coordinates.
+            search_radius (:obj:`int`): Half size of the window in which the
+                closest point is searched.
+
+        Returns:
+            :py:class:`~pylot.utils.LocationArray`: The 3D world locations,
+            or None if all the point cloud points are behind.
+        """
+        pixel_coords = pixels.as_numpy_array()
+        indices = []
+        for x, y in pixel_coords.astype(np.int64):
+            index = self._get_closest_point_index(x, y, search_radius or 0)
+            if index is None:
+                return None
+            indices.append(index)
+        return LocationArray(
+            self._unproject(pixel_coords, self._points[indices, 2]))
+
+    def get_bounding_box_depths(self, bboxes, statistic=np.median):
+        """Computes a depth statistic over the points in each bounding box.
+
+        Args:
+            bboxes (list(:py:class:`~pylot.perception.detection.utils.BoundingBox2D`)):
+                Bounding boxes in the camera view.
+            statistic: Function that reduces an array to a scalar (e.g.,
+                np.median, np.min).
+
+        Returns:
+            A numpy array of depths (in metres), one per bounding box. The
+            depth is NaN for bounding boxes that do not contain any point.
+        """
+        depths = np.full(len(bboxes), np.nan)
+        for index, bbox in enumerate(bboxes):
+            crop = self.depth[max(bbox.y_min, 0):max(bbox.y_max, 0),
+                              max(bbox.x_min, 0):max(bbox.x_max, 0)]
+            crop = crop[np.isfinite(crop)]
+            if crop.size > 0:
+                depths[index] = statistic(crop)
+        return depths
+
+    def _get_closest_point_index(self, x, y, search_radius):
+        height, width = self.indices.shape
+        x_min, x_max = max(x - search_radius, 0), min(x + search_radius + 1,
+                                                      width)
+        y_min, y_max = max(y - search_radius, 0), min(y + search_radius + 1,
+                                                      height)
+        ys, xs = np.nonzero(self.indices[y_min:y_max, x_min:x_max] >= 0)
+        if len(ys) > 0:
+            closest = np.argmin((xs + x_min - x)**2 + (ys + y_min - y)**2)
+            return self.indices[ys[closest] + y_min, xs[closest] + x_min]
+        # Fall back to the closest projection in the entire point cloud.
+        if len(self._fwd_pixels) == 0:
+            return None
+        dist = np.sum((self._fwd_pixels - np.array([x, y]))**2, axis=1)
+        return self._fwd_indices[np.argmin(dist)]
+
+    def _unproject(self, pixels, depths):
+        """Converts pixels and their depths to world locations."""
+        p2d = np.column_stack((pixels, np.ones(len(pixels))))
+        locations = np.dot(p2d, inv(self._intrinsic_mat).T)
+        locations *= np.reshape(depths, (-1, 1))
+        to_world_transform = self.camera_setup.get_unreal_transform()
+        return to_world_transform.transform_points(locations)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return 'DepthBuffer(camera_setup: {}, number of pixels: {})'.format(
+            self.camera_setup, np.count_nonzero(self.indices >= 0))
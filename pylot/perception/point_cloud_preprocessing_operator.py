@@ -0,0 +1,81 @@
+"""Implements an operator that crops and downsamples point clouds."""
+import erdos
+import time
+
+from pylot.perception.messages import PointCloudMessage
+from pylot.utils import time_epoch_ms
+
+
+class PointCloudPreprocessingOperator(erdos.Operator):
+    """Crops point clouds to a region of interest, and downsamples them.
+
+    Args:
+        point_cloud_stream (:py:class:`erdos.ReadStream`): The stream on which
+            :py:class:`~pylot.perception.messages.PointCloudMessage` are
+            received.
+        preprocessed_point_cloud_stream (:py:class:`erdos.WriteStream`):
+            Stream on which the operator sends the preprocessed
+            :py:class:`~pylot.perception.messages.PointCloudMessage`.
+        flags (absl.flags): Object to be used to access absl flags.
+
+    Attributes:
+        _logger (:obj:`logging.Logger`): Instance to be used to log messages.
+        _csv_logger (:obj:`logging.Logger`): Used to log runtime stats.
+        _flags (absl.flags): Object to be used to access absl flags.
+    """
+    def __init__(self, point_cloud_stream, preprocessed_point_cloud_stream,
+                 flags):
+        point_cloud_stream.add_callback(self.on_point_cloud,
+                                        [preprocessed_point_cloud_stream])
+        self._flags = flags
+        self._logger = erdos.utils.setup_logging(self.config.name,
+                                                 self.config.log_file_name)
+        self._csv_logger = erdos.utils.setup_csv_logging(
+            self.config.name + '-csv', self.config.csv_log_file_name)
+
+    @staticmethod
+    def connect(point_cloud_stream):
+        """Connects the operator to other streams.
+
+        Args:
+            point_cloud_stream (:py:class:`erdos.ReadStream`): The stream on
+                which point clouds are received.
+
+        Returns:
+            :py:class:`erdos.WriteStream`: Stream on which the operator sends
+            the preprocessed point clouds.
+        """
+        preprocessed_point_cloud_stream = erdos.WriteStream()
+        return [preprocessed_point_cloud_stream]
+
+    @erdos.profile_method()
+    def on_point_cloud(self, msg, preprocessed_point_cloud_stream):
+        """Invoked whenever a point cloud message is received on the stream.
+
+        Args:
+            msg (:py:class:`~pylot.perception.messages.PointCloudMessage`):
+                Received message.
+            preprocessed_point_cloud_stream (:py:class:`erdos.WriteStream`):
+                Stream on which the operator sends the preprocessed point
+                clouds.
+        """
+        self._logger.debug('@{}: {} received message'.format(
+            msg.timestamp, self.config.name))
+        start_time = time.time()
+        point_cloud = msg.point_cloud.crop(
+            max_range=self._flags.point_cloud_max_range,
+            fov=self._flags.point_cloud_fov,
+            min_height=self._flags.point_cloud_min_height,
+            max_height=self._flags.point_cloud_max_height)
+        if self._flags.point_cloud_voxel_size > 0:
+            point_cloud = point_cloud.voxel_downsample(
+                self._flags.point_cloud_voxel_size)
+        # Get runtime in ms.
+        runtime = (time.time() - start_time) * 1000
+        self._csv_logger.info('{},{},{},{:.4f}'.format(
+            time_epoch_ms(), self.config.name, 'runtime', runtime))
+        self._logger.debug('@{}: reduced point cloud from {} to {}'.format(
+            msg.timestamp, len(msg.point_cloud.points),
+            len(point_cloud.points)))
+        preprocessed_point_cloud_stream.send(
+            PointCloudMessage(msg.timestamp, point_cloud))
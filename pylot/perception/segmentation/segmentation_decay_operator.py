@@ -1,7 +1,11 @@
 from collections import deque
 import erdos
+import numpy as np
 import time
 
+from pylot.perception.segmentation.utils import \
+    compute_confusion_matrix_from_encoding, \
+    compute_iou_from_confusion_matrix, encode_ground_class_ids
 from pylot.utils import time_epoch_ms
 
 
@@ -27,6 +31,8 @@ class SegmentationDecayOperator(erdos.Operator):
                                                  self.config.log_file_name)
         self._csv_logger = erdos.utils.setup_csv_logging(
             self.config.name + '-csv', self.config.csv_log_file_name)
+        # Buffer of (game time, encoded class ids) of the frames within the
+        # max latency.
         self._ground_frames = deque()
 
     @staticmethod
@@ -49,22 +55,26 @@ class SegmentationDecayOperator(erdos.Operator):
     def on_ground_segmented_frame(self, msg, iou_stream):
         assert len(msg.timestamp.coordinates) == 1
         start_time = time.time()
-        # We don't fully transform it to cityscapes palette to avoid
-        # introducing extra latency.
-        frame = msg.frame
+        game_time = msg.timestamp.coordinates[0]
+        # The class ids of the frame are extracted once, and the buffered
+        # frames are stored encoded, so that each comparison is a single
+        # addition and bincount.
+        class_ids = np.ravel(msg.frame.get_class_ids())
 
-        if len(self._ground_frames) > 0:
-            # Pop the oldest frame if it's older than the max latency
-            # we're interested in.
-            if (msg.timestamp.coordinates[0] - self._ground_frames[0][0] >
-                    self._flags.decay_max_latency):
-                self._ground_frames.popleft()
+        # Pop the frames that are older than the max latency we're
+        # interested in.
+        while (len(self._ground_frames) > 0 and game_time -
+               self._ground_frames[0][0] > self._flags.decay_max_latency):
+            self._ground_frames.popleft()
 
+        if len(self._ground_frames) > 0:
             cur_time = time_epoch_ms()
-            for timestamp, ground_frame in self._ground_frames:
-                (mean_iou, class_iou) = \
-                    ground_frame.compute_semantic_iou_using_masks(frame)
-                time_diff = msg.timestamp.coordinates[0] - timestamp
+            for timestamp, encoded_ground_frame in self._ground_frames:
+                (mean_iou,
+                 class_iou) = compute_iou_from_confusion_matrix(
+                     compute_confusion_matrix_from_encoding(
+                         encoded_ground_frame, class_ids))
+                time_diff = game_time - timestamp
                 self._logger.info(
                     'Segmentation ground latency {} ; mean IoU {}'.format(
                         time_diff, mean_iou))
@@ -90,8 +100,9 @@ class SegmentationDecayOperator(erdos.Operator):
                         cur_time, self.config.name, time_diff,
                         class_iou[vehicle_key]))
 
-        # Append the processed image to the buffer.
-        self._ground_frames.append((msg.timestamp.coordinates[0], frame))
+        # Append the encoded frame to the buffer.
+        self._ground_frames.append(
+            (game_time, encode_ground_class_ids(class_ids)))
 
         runtime = (time.time() - start_time) * 1000
         self._logger.info(
@@ -4,12 +4,18 @@ from absl import flags
 import drn.segment
 from drn.segment import DRNSeg
 import erdos
+import numpy as np
 import time
 from torch.autograd import Variable
 import torch
 
 from pylot.perception.messages import SegmentedFrameMessage
+from pylot.perception.model_registry import ModelLoader, \
+    acquire_torch_model
+from pylot.perception.pipeline import Pipeline
 from pylot.perception.segmentation.segmented_frame import SegmentedFrame
+from pylot.perception.segmentation.utils import \
+    cityscapes_palette_to_class_ids
 from pylot.utils import time_epoch_ms
 
 flags.DEFINE_string(
@@ -24,7 +30,15 @@ class SegmentationDRNOperator(erdos.Operator):
     """Semantically segments frames using a DRN segmentation model.
 
     The operator receives frames on a camera stream, and runs a model for each
-    frame.
+    frame. If the --perception_pipelining flag is set, the pre-processing,
+    inference, and post-processing of consecutive frames overlap, and the
+    operator forwards the watermarks once the frames of their timestamps have
+    been sent. The operator must then be connected with flow_watermarks set
+    to False.
+
+    The model is warmed up with --model_warm_up_runs dummy inferences. If
+    --background_model_loading is set, the model loads on a background
+    thread, and the first frame waits until it is ready.
 
     Args:
         camera_stream (:py:class:`erdos.ReadStream`): The stream on which
@@ -41,17 +55,54 @@ class SegmentationDRNOperator(erdos.Operator):
         self._flags = flags
         self._logger = erdos.utils.setup_logging(self.config.name,
                                                  self.config.log_file_name)
+        # Lookup table from the classes predicted by the model to Carla
+        # class ids, obtained by reversing the palette of the model.
+        self._class_ids = cityscapes_palette_to_class_ids(
+            drn.segment.CARLA_CITYSCAPE_PALETTE)
+        self._csv_logger = erdos.utils.setup_csv_logging(
+            self.config.name + '-csv', self.config.csv_log_file_name)
+        self._model_loader = ModelLoader(self._load_model, self._warm_up,
+                                         flags.model_warm_up_runs,
+                                         flags.background_model_loading,
+                                         self.config.name, self._csv_logger)
+        self._pipeline = Pipeline(
+            [self._preprocess, self._infer, self._postprocess],
+            threaded=flags.perception_pipelining,
+            queue_size=flags.perception_pipeline_queue_size,
+            name=self.config.name,
+            logger=self._logger)
+        if self._pipeline.threaded:
+            camera_stream.add_watermark_callback(self.on_watermark,
+                                                 [segmented_stream])
+
+    def _load_model(self):
+        """Acquires the model, which is shared by the operators that use the
+        same model file."""
         arch = "drn_d_22"
         classes = 19
-        self._pallete = drn.segment.CARLA_CITYSCAPE_PALETTE
-        self._model = DRNSeg(arch,
-                             classes,
-                             pretrained_model=None,
-                             pretrained=False)
-        self._model.load_state_dict(
-            torch.load(self._flags.segmentation_model_path))
-        if torch.cuda.is_available():
-            self._model = torch.nn.DataParallel(self._model).cuda()
+        self._model = acquire_torch_model(
+            self._flags.segmentation_model_path,
+            lambda: DRNSeg(
+                arch, classes, pretrained_model=None, pretrained=False),
+            num_threads=self._flags.inference_cpu_threads,
+            logger=self._logger)
+
+    def _warm_up(self):
+        """Runs the model on a blank frame of the configured camera size."""
+        self._run_model(
+            torch.zeros(1, 3, self._flags.carla_camera_image_height,
+                        self._flags.carla_camera_image_width))
+
+    def _run_model(self, image):
+        """Runs the model, and returns the predicted class of each pixel."""
+        image_var = Variable(image.to(self._model.device),
+                             requires_grad=False,
+                             volatile=True)
+
+        final = self._model(image_var)[0]
+        _, pred = torch.max(final, 1)
+
+        return pred.cpu().data.numpy()[0]
 
     @staticmethod
     def connect(camera_stream):
@@ -82,22 +133,48 @@ class SegmentationDRNOperator(erdos.Operator):
         """
         self._logger.debug('@{}: {} received message'.format(
             msg.timestamp, self.config.name))
+        self._pipeline.submit((msg, segmented_stream))
+
+    def on_watermark(self, timestamp, segmented_stream):
+        """Forwards the watermark once the frames up to its timestamp have
+        been processed.
+
+        Args:
+            timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp
+                of the watermark.
+            segmented_stream (:py:class:`erdos.WriteStream`): Stream on which
+                the watermark is forwarded.
+        """
+        self._pipeline.run_after(
+            lambda: segmented_stream.send(erdos.WatermarkMessage(timestamp)))
+
+    def _preprocess(self, item):
+        msg, segmented_stream = item
+        # The first frame waits for the model, which is not included in its
+        # runtime.
+        self._model_loader.wait()
         start_time = time.time()
         assert msg.frame.encoding == 'BGR', 'Expects BGR frames'
-        image = torch.from_numpy(msg.frame.frame.transpose(
-            [2, 0, 1])).unsqueeze(0).float()
-        image_var = Variable(image, requires_grad=False, volatile=True)
+        image = torch.from_numpy(
+            msg.frame.as_bgr_numpy_array().transpose([2, 0, 1]).astype(
+                np.float32)).unsqueeze(0)
+        return msg, segmented_stream, start_time, image
 
-        final = self._model(image_var)[0]
-        _, pred = torch.max(final, 1)
+    def _infer(self, item):
+        msg, segmented_stream, start_time, image = item
+        return msg, segmented_stream, start_time, self._run_model(image)
 
-        pred = pred.cpu().data.numpy()[0]
-        # After we apply the pallete, the image is in RGB format
-        image_np = self._pallete[pred.squeeze()]
+    def _postprocess(self, item):
+        msg, segmented_stream, start_time, pred = item
+        class_ids = self._class_ids[pred.squeeze()]
 
-        # Get runtime in ms.
+        # Get runtime in ms. If the operator is pipelined, the runtime also
+        # includes the time the frame waited for the other frames' stages.
         runtime = (time.time() - start_time) * 1000
-        frame = SegmentedFrame(image_np, 'cityscapes', msg.frame.camera_setup)
+        frame = SegmentedFrame(class_ids, 'carla', msg.frame.camera_setup)
+        # Consumers expect the output in the cityscapes encoding; the palette
+        # frame is only computed if it is requested.
+        frame.transform_to_cityscapes()
         if self._flags.visualize_segmentation_output:
             frame.visualize(self.config.name, msg.timestamp)
         segmented_stream.send(
@@ -4,6 +4,8 @@ from absl import flags
 import erdos
 import heapq
 
+from pylot.perception.segmentation.utils import ConfusionMatrix, \
+    compute_iou_from_confusion_matrix
 from pylot.utils import time_epoch_ms
 
 flags.DEFINE_enum('segmentation_metric', 'mIoU', ['mIoU', 'timely-mIoU'],
@@ -43,6 +45,8 @@ class SegmentationEvalOperator(erdos.Operator):
         self._segmented_start_end_times = []
         self._sim_interval = None
         self._last_notification = None
+        # Confusion matrix accumulated over all the evaluated frames.
+        self._confusion_matrix = ConfusionMatrix()
 
     @staticmethod
     def connect(ground_segmented_stream, segmented_stream):
@@ -129,14 +133,20 @@ class SegmentationEvalOperator(erdos.Operator):
             return base + self._sim_interval
 
     def __compute_mean_iou(self, ground_frame, segmented_frame):
-        ground_frame.transform_to_cityscapes()
+        frame_matrix = self._confusion_matrix.update(
+            ground_frame.get_class_ids(), segmented_frame.get_class_ids())
         (mean_iou,
-         class_iou) = ground_frame.compute_semantic_iou(segmented_frame)
+         class_iou) = compute_iou_from_confusion_matrix(frame_matrix)
         self._logger.info('IoU class scores: {}'.format(class_iou))
         self._logger.info('mean IoU score: {}'.format(mean_iou))
         self._csv_logger.info('{},{},{},{}'.format(
             time_epoch_ms(), self.config.name, self._flags.segmentation_metric,
             mean_iou))
+        # mIoU over all the frames evaluated so far.
+        (dataset_mean_iou, _) = self._confusion_matrix.get_iou()
+        self._csv_logger.info('{},{},{},{}'.format(
+            time_epoch_ms(), self.config.name,
+            'dataset-' + self._flags.segmentation_metric, dataset_mean_iou))
 
     def __get_ground_segmentation_at(self, timestamp):
         for (time, frame) in self._ground_frames:
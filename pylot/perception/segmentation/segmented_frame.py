@@ -5,49 +5,19 @@ import PIL.Image as Image
 from skimage import measure
 
 from pylot.perception.detection.utils import BoundingBox2D
+import pylot.perception.segmentation.utils
+from pylot.perception.segmentation.utils import CITYSCAPES_CLASSES, \
+    CITYSCAPES_LABELS
 from pylot.utils import add_timestamp
 
-# Semantic Labels
-CITYSCAPES_LABELS = {
-    0: "unlabeled",
-    1: "building",
-    2: "fence",
-    3: "other",
-    4: "person",
-    5: "pole",
-    6: "road_line",
-    7: "road",
-    8: "sidewalk",
-    9: "vegetation",
-    10: "car",
-    11: "wall",
-    12: "traffic_sign",
-}
-
-# Cityscapes palette.
-CITYSCAPES_CLASSES = {
-    0: [0, 0, 0],  # None
-    1: [70, 70, 70],  # Buildings
-    2: [190, 153, 153],  # Fences
-    3: [72, 0, 90],  # Other
-    4: [220, 20, 60],  # Pedestrians
-    5: [153, 153, 153],  # Poles
-    6: [157, 234, 50],  # RoadLines
-    7: [128, 64, 128],  # Roads
-    8: [244, 35, 232],  # Sidewalks
-    9: [107, 142, 35],  # Vegetation
-    10: [0, 0, 255],  # Vehicles
-    11: [102, 102, 156],  # Walls
-    12: [220, 220, 0]  # TrafficSigns
-}
-# XXX(ionel): Note! These Carla cityscapes classes do not cover all
-# the classes from CITYSCAPES. Hence, we can't compare segmentation
-# outputs to ground truth.
-
 
 class SegmentedFrame(object):
     """Stores a semantically segmented frame.
 
+    The frame is always stored as a uint8 map of class ids. Frames that are
+    created from the cityscapes palette are converted to class ids once,
+    and the cityscapes palette is computed lazily when it is needed.
+
     Args:
         frame: A numpy array storring the segmented frame.
         encoding (:obj:`str`): The encoding of the frame (carla | cityscapes).
@@ -55,64 +25,71 @@ class SegmentedFrame(object):
             The camera setup used by the sensor that generated this frame.
 
     Attributes:
-        frame: A numpy array storring the segmented frame.
-        encoding (:obj:`str`): The encoding of the frame (carla | cityscapes).
+        encoding (:obj:`str`): The encoding in which the frame is returned by
+            :py:func:`.as_numpy_array` (carla | cityscapes).
         camera_setup (:py:class:`~pylot.drivers.sensor_setup.SegmentedCameraSetup`):
             The camera setup used by the sensor that generated this frame.
     """
     def __init__(self, frame, encoding, camera_setup):
-        if encoding == 'carla' or encoding == 'cityscapes':
-            self._frame = frame
-            self.encoding = encoding
-            self.camera_setup = camera_setup
+        if encoding == 'carla':
+            self._frame = np.asarray(frame, dtype=np.uint8)
+        elif encoding == 'cityscapes':
+            self._frame = pylot.perception.segmentation.utils.\
+                cityscapes_palette_to_class_ids(frame)
         else:
             raise ValueError(
                 'Unexpected encoding {} for segmented frame'.format(encoding))
+        self.encoding = encoding
+        self.camera_setup = camera_setup
         self._class_masks = None
+        # The frame in the cityscapes palette, computed lazily.
+        self._cityscapes_frame = None
 
     @classmethod
     def from_carla_image(cls, carla_image, camera_setup):
         """Creates a pylot camera frame from a CARLA frame.
 
-        Note:
-            This conversion is slow.
-
         Returns:
             :py:class:`.SegmentedFrame`: A segmented camera frame.
         """
         # Converts the array containing CARLA semantic segmentation labels
         # to a 2D array containing the label of each pixel.
-        import numpy as np
         import carla
         if not isinstance(carla_image, carla.Image):
             raise ValueError('carla_image should be of type carla.Image')
         __frame = np.frombuffer(carla_image.raw_data, dtype=np.dtype("uint8"))
         __frame = np.reshape(__frame,
                              (carla_image.height, carla_image.width, 4))
-        return cls(__frame[:, :, 2], 'carla', camera_setup)
+        return cls(np.ascontiguousarray(__frame[:, :, 2]), 'carla',
+                   camera_setup)
 
     def as_cityscapes_palette(self):
         """Returns the frame to the Carla cityscapes pallete.
 
+        The palette frame is computed once with a lookup table, and it is
+        cached.
+
         Returns:
-           A numpy array.
+           A height by width by 3 uint8 numpy array.
         """
-        if self.encoding == 'cityscapes':
-            return self._frame
-        else:
-            result = np.zeros((self._frame.shape[0], self._frame.shape[1], 3),
-                              dtype=np.uint8)
-            for key, value in CITYSCAPES_CLASSES.items():
-                result[np.where(self._frame == key)] = value
-            return result
+        if self._cityscapes_frame is None:
+            self._cityscapes_frame = pylot.perception.segmentation.utils.\
+                CITYSCAPES_PALETTE_LUT[self._frame]
+        return self._cityscapes_frame
 
     def as_numpy_array(self):
-        """Returns the segmented frame as a numpy array."""
+        """Returns the segmented frame as a numpy array, in the encoding of
+        the frame."""
+        if self.encoding == 'cityscapes':
+            return self.as_cityscapes_palette()
         return self._frame
 
     def transform_to_cityscapes(self):
-        """Transforms the frame to a cityscapes frame."""
-        self._frame = self.as_cityscapes_palette()
+        """Transforms the frame to a cityscapes frame.
+
+        The frame keeps its class ids; only the encoding in which the frame
+        is returned changes.
+        """
         self.encoding = 'cityscapes'
 
     def get_traffic_sign_bounding_boxes(self, min_width=2, min_height=3):
@@ -122,8 +99,6 @@ class SegmentedFrame(object):
             list(:py:class:`~pylot.perception.detection.utils.BoundingBox2D`):
             Traffic sign bounding boxes.
         """
-        assert self.encoding == 'carla', \
-            'Not implemented on cityscapes encoding'
         # Set the pixels we are interested in to True.
         traffic_signs_frame = self._get_traffic_sign_pixels()
         # Extracts bounding box from frame.
@@ -143,84 +118,52 @@ class SegmentedFrame(object):
 
     def _get_per_class_masks(self):
         """ Build a cache of class key to frame mask."""
-        assert self.encoding == 'carla', \
-            'Not implemented on cityscapes encoding'
         if self._class_masks is not None:
             return self._class_masks
         else:
             self._class_masks = []
             for key, value in CITYSCAPES_CLASSES.items():
-                mask = np.zeros((self._frame.shape[0], self._frame.shape[1]))
-                mask[np.where(self._frame == key)] = 1
-                self._class_masks.append(mask)
+                self._class_masks.append(
+                    (self._frame == key).astype(np.uint8))
         return self._class_masks
 
+    def get_class_ids(self):
+        """Returns the frame as a height by width array of class ids."""
+        return self._frame
+
     def compute_semantic_iou(self, other_frame):
         """Computes IoU for a segmented frame.
 
+        The IoU is computed from the confusion matrix of the frames, which is
+        obtained in a single pass over the pixels. The frames can use either
+        encoding.
+
         Args:
             other_frame (:py:class:`.SegmentedFrame`): The frame for which to
             compute IoU.
 
         Returns:
-            A tuple comprising of mIoU and a list of IoUs.
+            A tuple comprising of mIoU and a dictionary of IoUs.
         """
-        assert (self.encoding == 'cityscapes'
-                and other_frame.encoding == 'cityscapes'
-                ), 'Not implemented on carla encoding'
-        iou = {}
-        for key, value in CITYSCAPES_CLASSES.items():
-            #  Do not include None in the mIoU
-            if key == 0:
-                continue
-            target = np.zeros((self._frame.shape[0], self._frame.shape[1], 3))
-            prediction = np.zeros(
-                (self._frame.shape[0], self._frame.shape[1], 3))
-            target[np.where(self._frame == value)] = 1
-            prediction[np.where(other_frame._frame == value)] = 1
-            intersection = np.logical_and(target, prediction)
-            union = np.logical_or(target, prediction)
-            sum_intersection = np.sum(intersection)
-            sum_union = np.sum(union)
-            # Ignore non-existing classes.
-            if sum_union > 0:
-                iou[key] = float(sum_intersection) / float(sum_union)
-        mean_iou = np.mean(list(iou.values()))
-        return (mean_iou, iou)
+        return pylot.perception.segmentation.utils.compute_semantic_iou(
+            self.get_class_ids(), other_frame.get_class_ids())
 
     def compute_semantic_iou_using_masks(self, other_frame):
         """Computes IoU for a segmented frame.
 
-        Computes IoU from per class image masks. This method is the fastest if
-        the frames already have precomputed masks.
+        Deprecated: Use :py:func:`.compute_semantic_iou`, which no longer
+        needs per class masks.
 
         Args:
             other_frame (:py:class:`.SegmentedFrame`): The frame for which to
             compute IoU.
 
         Returns:
-            A tuple comprising of mIoU and a list of IoUs.
+            A tuple comprising of mIoU and a dictionary of IoUs.
         """
-        assert self.encoding == 'carla' and other_frame.encoding == 'carla', \
-            'Not implemented on cityscapes encoding'
-        masks = self._get_per_class_masks()
-        other_masks = other_frame._get_per_class_masks()
-        iou = {}
-        for i in range(1, len(CITYSCAPES_CLASSES)):
-            intersection = np.logical_and(masks[i], other_masks[i])
-            union = np.logical_or(masks[i], other_masks[i])
-            sum_intersection = np.sum(intersection)
-            sum_union = np.sum(union)
-
-            # Ignore non-existing classes.
-            if sum_union > 0:
-                iou[i] = float(sum_intersection) / float(sum_union)
-                mean_iou = np.mean(list(iou.values()))
-        return (mean_iou, iou)
+        return self.compute_semantic_iou(other_frame)
 
     def save_per_class_masks(self, data_path, timestamp):
-        assert self.encoding == 'carla', \
-            'Not implemented on cityscapes encoding'
         masks = self._get_per_class_masks()
         assert len(timestamp.coordinates) == 1
         for k, v in CITYSCAPES_LABELS.items():
@@ -246,30 +189,30 @@ class SegmentedFrame(object):
 
     def visualize(self, window_name, timestamp=None):
         """Creates a cv2 window to visualize the segmented frame."""
-        cityscapes_frame = self.as_cityscapes_palette()
-        # Convert to BGR
-        cityscapes_frame = cityscapes_frame[:, :, ::-1]
+        # Convert to BGR. The copy ensures that the timestamp is not drawn
+        # on the cached palette frame.
+        cityscapes_frame = np.ascontiguousarray(
+            self.as_cityscapes_palette()[:, :, ::-1])
         if timestamp is not None:
             add_timestamp(cityscapes_frame, timestamp)
         cv2.imshow(window_name, cityscapes_frame)
         cv2.waitKey(1)
 
     def draw_point(self, point, color, r=3):
-        """ Draws a colored point on the segmented frame."""
-        cv2.circle(self._frame, (int(point.x), int(point.y)), r, color, -1)
+        """ Draws a colored point on the cityscapes palette of the frame."""
+        cv2.circle(self.as_cityscapes_palette(), (int(point.x), int(point.y)),
+                   r, color, -1)
 
     def draw_box(self, start_point, end_point, color, thickness=3):
-        """ Draw a colored box defined by start_point, end_point."""
+        """ Draw a colored box defined by start_point, end_point on the
+        cityscapes palette of the frame."""
         start = (int(start_point.x), int(start_point.y))
         end = (int(end_point.x), int(end_point.y))
-        cv2.rectangle(self._frame, start, end, color, thickness)
+        cv2.rectangle(self.as_cityscapes_palette(), start, end, color,
+                      thickness)
 
     def _get_traffic_sign_pixels(self):
         """ Returns a frame with the traffic sign pixels set to True."""
-        # Shape is height, width
-        traffic_signs_frame = np.zeros(
-            (self._frame.shape[0], self._frame.shape[1]), dtype=np.bool)
         # 12 is the key for TrafficSigns segmentation in Carla.
         # Apply mask to only select traffic signs and traffic lights.
-        traffic_signs_frame[np.where(self._frame == 12)] = True
-        return traffic_signs_frame
+        return self._frame == 12
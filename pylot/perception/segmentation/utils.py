@@ -0,0 +1,267 @@
+import numpy as np
+
+# Semantic Labels
+CITYSCAPES_LABELS = {
+    0: "unlabeled",
+    1: "building",
+    2: "fence",
+    3: "other",
+    4: "person",
+    5: "pole",
+    6: "road_line",
+    7: "road",
+    8: "sidewalk",
+    9: "vegetation",
+    10: "car",
+    11: "wall",
+    12: "traffic_sign",
+}
+
+# Cityscapes palette.
+CITYSCAPES_CLASSES = {
+    0: [0, 0, 0],  # None
+    1: [70, 70, 70],  # Buildings
+    2: [190, 153, 153],  # Fences
+    3: [72, 0, 90],  # Other
+    4: [220, 20, 60],  # Pedestrians
+    5: [153, 153, 153],  # Poles
+    6: [157, 234, 50],  # RoadLines
+    7: [128, 64, 128],  # Roads
+    8: [244, 35, 232],  # Sidewalks
+    9: [107, 142, 35],  # Vegetation
+    10: [0, 0, 255],  # Vehicles
+    11: [102, 102, 156],  # Walls
+    12: [220, 220, 0]  # TrafficSigns
+}
+# XXX(ionel): Note! These Carla cityscapes classes do not cover all
+# the classes from CITYSCAPES. Hence, we can't compare segmentation
+# outputs to ground truth.
+
+NUM_CLASSES = len(CITYSCAPES_CLASSES)
+
+# Lookup table from class id to cityscapes color. Class ids that are not in
+# the palette are mapped to black.
+CITYSCAPES_PALETTE_LUT = np.zeros((256, 3), dtype=np.uint8)
+for _key, _color in CITYSCAPES_CLASSES.items():
+    CITYSCAPES_PALETTE_LUT[_key] = _color
+
+
+def _pack_rgb(frame):
+    """Packs the RGB channels of a frame into a single int64 per pixel."""
+    frame = np.asarray(frame, dtype=np.int64)
+    return (frame[..., 0] << 16) | (frame[..., 1] << 8) | frame[..., 2]
+
+
+# Reverse palette lookup table: the sorted packed colors of the palette, and
+# the class id of each of them.
+_PALETTE_KEYS = _pack_rgb(
+    np.array([CITYSCAPES_CLASSES[key] for key in range(NUM_CLASSES)]))
+_PALETTE_ORDER = np.argsort(_PALETTE_KEYS)
+_SORTED_PALETTE_KEYS = _PALETTE_KEYS[_PALETTE_ORDER]
+
+
+def cityscapes_palette_to_class_ids(frame):
+    """Converts a frame in the cityscapes palette to class ids.
+
+    Args:
+        frame: A height by width by 3 numpy array of RGB cityscapes colors.
+
+    Returns:
+        A height by width uint8 numpy array of class ids. Colors that are not
+        in the palette are mapped to class 0 (unlabeled).
+    """
+    keys = _pack_rgb(frame)
+    positions = np.searchsorted(_SORTED_PALETTE_KEYS, keys)
+    positions = np.minimum(positions, NUM_CLASSES - 1)
+    class_ids = _PALETTE_ORDER[positions].astype(np.uint8)
+    class_ids[_SORTED_PALETTE_KEYS[positions] != keys] = 0
+    return class_ids
+
+
+def get_class_ids(frame, encoding):
+    """Returns the class id map of a segmented frame.
+
+    Args:
+        frame: A numpy array storing the segmented frame.
+        encoding (:obj:`str`): The encoding of the frame (carla |
+            cityscapes).
+
+    Returns:
+        A height by width numpy array of class ids.
+    """
+    if encoding == 'carla':
+        return frame
+    elif encoding == 'cityscapes':
+        return cityscapes_palette_to_class_ids(frame)
+    else:
+        raise ValueError(
+            'Unexpected encoding {} for segmented frame'.format(encoding))
+
+
+def encode_ground_class_ids(ground_class_ids, num_classes=NUM_CLASSES):
+    """Encodes a ground truth class id map for confusion matrix computations.
+
+    The encoding can be computed once per frame, and it can be compared with
+    any number of predictions using
+    :py:func:`.compute_confusion_matrix_from_encoding`.
+
+    Args:
+        ground_class_ids: A numpy array of ground truth class ids.
+        num_classes (:obj:`int`): Number of classes.
+
+    Returns:
+        A flat numpy array of ground truth class ids multiplied by the number
+        of classes. Class ids that are out of range are encoded as
+        num_classes squared, which is ignored by the confusion matrix. The
+        array is uint8 if all the codes fit in it.
+    """
+    num_codes = num_classes * num_classes
+    dtype = np.uint8 if num_codes < 256 else np.int64
+    class_ids = np.ravel(ground_class_ids)
+    encoded = class_ids.astype(dtype) * dtype(num_classes)
+    # The codes of out of range ids could have wrapped around into valid
+    # codes.
+    encoded[(class_ids < 0) | (class_ids >= num_classes)] = num_codes
+    return encoded
+
+
+def compute_confusion_matrix_from_encoding(encoded_ground_class_ids,
+                                           class_ids,
+                                           num_classes=NUM_CLASSES):
+    """Computes the confusion matrix of a segmentation with a single
+    bincount over the combined codes ground * num_classes + prediction.
+
+    Args:
+        encoded_ground_class_ids: Ground truth class ids encoded by
+            :py:func:`.encode_ground_class_ids`.
+        class_ids: A numpy array of predicted class ids, with as many
+            elements as the ground truth.
+        num_classes (:obj:`int`): Number of classes.
+
+    Returns:
+        A num_classes by num_classes int64 numpy array, in which entry (i, j)
+        is the number of pixels of class i that are predicted as class j.
+        Pixels with class ids that are not smaller than num_classes are not
+        counted.
+    """
+    class_ids = np.ravel(class_ids)
+    # The predicted ids are checked before they are cast to the dtype of
+    # the encoding, in which they could wrap around.
+    valid = ((encoded_ground_class_ids < num_classes * num_classes)
+             & (class_ids >= 0) & (class_ids < num_classes))
+    codes = encoded_ground_class_ids[valid] + class_ids[valid].astype(
+        encoded_ground_class_ids.dtype, copy=False)
+    return np.bincount(codes, minlength=num_classes * num_classes).reshape(
+        num_classes, num_classes)
+
+
+def compute_confusion_matrix(ground_class_ids,
+                             class_ids,
+                             num_classes=NUM_CLASSES):
+    """Computes the confusion matrix of a segmentation in a single pass.
+
+    Args:
+        ground_class_ids: A numpy array of ground truth class ids.
+        class_ids: A numpy array of predicted class ids, of the same shape.
+        num_classes (:obj:`int`): Number of classes.
+
+    Returns:
+        A num_classes by num_classes int64 numpy array, in which entry (i, j)
+        is the number of pixels of class i that are predicted as class j.
+        Pixels with class ids that are not smaller than num_classes are not
+        counted.
+    """
+    return compute_confusion_matrix_from_encoding(
+        encode_ground_class_ids(ground_class_ids, num_classes), class_ids,
+        num_classes)
+
+
+def compute_iou_from_confusion_matrix(confusion_matrix, ignore_classes=(0, )):
+    """Computes the per class IoU and the mIoU from a confusion matrix.
+
+    Args:
+        confusion_matrix: A num_classes by num_classes numpy array.
+        ignore_classes: Classes that are not included in the mIoU (by
+            default, the unlabeled class).
+
+    Returns:
+        A tuple comprising of mIoU and a dictionary of IoUs. Classes that
+        do not appear in either the ground truth or the prediction are not
+        included.
+    """
+    intersection = np.diag(confusion_matrix)
+    union = (confusion_matrix.sum(axis=0) + confusion_matrix.sum(axis=1) -
+             intersection)
+    return compute_iou_from_counts(intersection, union, ignore_classes)
+
+
+def compute_iou_from_counts(intersection, union, ignore_classes=(0, )):
+    """Computes the per class IoU and the mIoU from pixel counts.
+
+    Args:
+        intersection: A numpy array with the number of pixels of each class
+            that are in both segmentations.
+        union: A numpy array with the number of pixels of each class that are
+            in either segmentation.
+        ignore_classes: Classes that are not included in the mIoU.
+
+    Returns:
+        A tuple comprising of mIoU and a dictionary of IoUs.
+    """
+    iou = {}
+    for key in np.nonzero(union)[0]:
+        if key not in ignore_classes:
+            iou[int(key)] = float(intersection[key]) / float(union[key])
+    mean_iou = np.mean(list(iou.values())) if iou else float('nan')
+    return (mean_iou, iou)
+
+
+def compute_semantic_iou(ground_class_ids,
+                         class_ids,
+                         num_classes=NUM_CLASSES):
+    """Computes the IoU of a segmentation.
+
+    Args:
+        ground_class_ids: A numpy array of ground truth class ids.
+        class_ids: A numpy array of predicted class ids, of the same shape.
+        num_classes (:obj:`int`): Number of classes.
+
+    Returns:
+        A tuple comprising of mIoU and a dictionary of IoUs.
+    """
+    return compute_iou_from_confusion_matrix(
+        compute_confusion_matrix(ground_class_ids, class_ids, num_classes))
+
+
+class ConfusionMatrix(object):
+    """Accumulates a segmentation confusion matrix across frames.
+
+    Args:
+        num_classes (:obj:`int`): Number of classes.
+
+    Attributes:
+        matrix: A num_classes by num_classes int64 numpy array, in which entry
+            (i, j) is the number of pixels of class i that are predicted as
+            class j.
+    """
+    def __init__(self, num_classes=NUM_CLASSES):
+        self._num_classes = num_classes
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, ground_class_ids, class_ids):
+        """Adds the pixels of a frame to the confusion matrix.
+
+        Returns:
+            The confusion matrix of the frame.
+        """
+        frame_matrix = compute_confusion_matrix(ground_class_ids, class_ids,
+                                                self._num_classes)
+        self.matrix += frame_matrix
+        return frame_matrix
+
+    def get_iou(self):
+        """Returns the mIoU and the per class IoUs over all the frames."""
+        return compute_iou_from_confusion_matrix(self.matrix)
+
+    def reset(self):
+        self.matrix[:] = 0
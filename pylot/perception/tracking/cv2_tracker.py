@@ -17,7 +17,8 @@ class MultiObjectCV2Tracker(MultiObjectTracker):
         """
         self._tracker = cv2.MultiTracker_create()
         for obstacle in obstacles:
-            self._tracker.add(cv2.TrackerKCF_create(), frame.frame,
+            self._tracker.add(cv2.TrackerKCF_create(),
+                              frame.as_bgr_numpy_array(),
                               obstacle.as_width_height_bbox())
             # self._tracker.add(cv2.TrackerMOSSE_create(), frame.frame, bbox)
 
@@ -27,7 +28,7 @@ class MultiObjectCV2Tracker(MultiObjectTracker):
         Args:
             frame: perception.camera_frame.CameraFrame to track in.
         """
-        ok, bboxes = self._tracker.update(frame.frame)
+        ok, bboxes = self._tracker.update(frame.as_bgr_numpy_array())
         if not ok:
             return False, []
         obstacles = []
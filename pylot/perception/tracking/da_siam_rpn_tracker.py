@@ -3,12 +3,13 @@ import cv2
 import erdos
 from lapsolver import solve_dense
 import numpy as np
-import torch
 
 from DaSiamRPN.code.net import SiamRPNvot
 from DaSiamRPN.code.run_SiamRPN import SiamRPN_init, SiamRPN_track
 
-from pylot.perception.detection.utils import BoundingBox2D, DetectedObstacle
+from pylot.perception.detection.utils import BoundingBox2D, \
+    DetectedObstacle, iou_matrix
+from pylot.perception.model_registry import acquire_torch_model
 from pylot.perception.tracking.multi_object_tracker import MultiObjectTracker
 
 flags.DEFINE_string('da_siam_rpn_model_path',
@@ -20,14 +21,17 @@ MAX_MISSED_DETECTIONS = 2
 
 
 class SingleObjectDaSiamRPNTracker(object):
-    def __init__(self, frame, obstacle, siam_net):
+    def __init__(self, frame, obstacle, siam_net_handle):
         """ Construct a single obstacle tracker.
 
         Args:
             frame (:py:class:`~pylot.perception.camera_frame.CameraFrame`):
                 Frame to reinitialize with.
             obstacle: perception.detection.utils.DetectedObstacle.
+            siam_net_handle (:py:class:`~pylot.perception.model_registry.ModelHandle`):
+                Handle to the shared siam network.
         """
+        self._siam_net_handle = siam_net_handle
         self.obstacle = obstacle
         self.missed_det_updates = 0
         center_point = obstacle.bounding_box.get_center_point()
@@ -36,8 +40,9 @@ class SingleObjectDaSiamRPNTracker(object):
             obstacle.bounding_box.get_width(),
             obstacle.bounding_box.get_height()
         ])
-        self._tracker = SiamRPN_init(frame.frame, target_pos, target_size,
-                                     siam_net)
+        with siam_net_handle.locked() as siam_net:
+            self._tracker = SiamRPN_init(frame.as_bgr_numpy_array(),
+                                         target_pos, target_size, siam_net)
 
     def track(self, frame):
         """ Tracks obstacles in a frame.
@@ -46,7 +51,11 @@ class SingleObjectDaSiamRPNTracker(object):
             frame (:py:class:`~pylot.perception.camera_frame.CameraFrame`):
                 Frame to track in.
         """
-        self._tracker = SiamRPN_track(self._tracker, frame.frame)
+        # The tracker state references the network, which must only be used
+        # while its lock is held.
+        with self._siam_net_handle.locked():
+            self._tracker = SiamRPN_track(self._tracker,
+                                          frame.as_bgr_numpy_array())
         target_pos = self._tracker['target_pos']
         target_sz = self._tracker['target_sz']
         self.obstacle.bounding_box = BoundingBox2D(
@@ -64,12 +73,26 @@ class MultiObjectDaSiamRPNTracker(MultiObjectTracker):
         # Initialize the siam network.
         self._logger = erdos.utils.setup_logging(
             'multi_object_da_siam_rpn_tracker', flags.log_file_name)
-        self._siam_net = SiamRPNvot()
-        self._siam_net.load_state_dict(torch.load(
-            flags.da_siam_rpn_model_path))
-        self._siam_net.eval().cuda()
+        # The network is shared by the trackers that use the same model.
+        self._siam_net_handle = acquire_torch_model(
+            flags.da_siam_rpn_model_path,
+            SiamRPNvot,
+            device='cuda',
+            logger=self._logger)
         self._trackers = []
 
+    def close(self):
+        """Releases the siam network. The tracker cannot be used after."""
+        if self._siam_net_handle is not None:
+            self._trackers = []
+            self._siam_net_handle.release()
+            self._siam_net_handle = None
+
+    def __del__(self):
+        # The handle is missing if the network failed to load.
+        if getattr(self, '_siam_net_handle', None) is not None:
+            self.close()
+
     def initialize(self, frame, obstacles):
         """ Reinitializes a multiple obstacle tracker.
 
@@ -80,14 +103,15 @@ class MultiObjectDaSiamRPNTracker(MultiObjectTracker):
         # Create a tracker for each obstacle.
         for obstacle in obstacles:
             self._trackers.append(
-                SingleObjectDaSiamRPNTracker(frame, obstacle, self._siam_net))
+                SingleObjectDaSiamRPNTracker(frame, obstacle,
+                                             self._siam_net_handle))
 
     def reinitialize(self, frame, obstacles):
         if self._trackers == []:
             self.initialize(frame, obstacles)
         # Create matrix of similarities between detection and tracker bboxes.
         cost_matrix = self._create_hungarian_cost_matrix(
-            frame.frame, obstacles)
+            frame.as_bgr_numpy_array(), obstacles)
         # Run linear assignment (Hungarian Algo) with matrix
         row_ids, col_ids = solve_dense(cost_matrix)
         matched_obstacle_indices, matched_tracker_indices = set(row_ids), set(
@@ -124,22 +148,19 @@ class MultiObjectDaSiamRPNTracker(MultiObjectTracker):
 
         for obstacle in unmatched_obstacles:
             updated_trackers.append(
-                SingleObjectDaSiamRPNTracker(frame, obstacle, self._siam_net))
+                SingleObjectDaSiamRPNTracker(frame, obstacle,
+                                             self._siam_net_handle))
 
         self._trackers = updated_trackers
 
     def _create_hungarian_cost_matrix(self, frame, obstacles):
-        # Create cost matrix with shape (num_bboxes, num_trackers)
-        cost_matrix = [[0 for _ in range(len(self._trackers))]
-                       for __ in range(len(obstacles))]
-        for i, obstacle in enumerate(obstacles):
-            for j, tracker in enumerate(self._trackers):
-                obstacle_bbox = obstacle.bounding_box
-                tracker_bbox = tracker.obstacle.bounding_box
-                iou = obstacle_bbox.calculate_iou(tracker_bbox)
-                # If track too far from det, mark pair impossible with np.nan
-                if iou > ASSOCIATION_THRESHOLD:
-                    cost_matrix[i][j] = iou
-                else:
-                    cost_matrix[i][j] = np.nan
-        return np.array(cost_matrix)
+        # Create cost matrix with shape (num_bboxes, num_trackers). The
+        # assignment minimizes the cost, so pairs with higher IoU must have
+        # lower cost.
+        ious = iou_matrix(
+            [obstacle.bounding_box for obstacle in obstacles],
+            [tracker.obstacle.bounding_box for tracker in self._trackers])
+        cost_matrix = 1 - ious
+        # If track too far from det, mark pair impossible with np.nan
+        cost_matrix[ious <= ASSOCIATION_THRESHOLD] = np.nan
+        return cost_matrix
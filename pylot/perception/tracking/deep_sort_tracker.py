@@ -43,7 +43,7 @@ class MultiObjectDeepSORTTracker(MultiObjectTracker):
             ]
             confidence_scores = [obstacle.confidence for obstacle in obstacles]
             self.tracker, detections_class = self._deepsort.run_deep_sort(
-                frame.frame, confidence_scores, bboxes)
+                frame.as_bgr_numpy_array(), confidence_scores, bboxes)
         if self.tracker:
             obstacles = []
             for track in self.tracker.tracks:
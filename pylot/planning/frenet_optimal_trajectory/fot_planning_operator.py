@@ -12,7 +12,7 @@ from pylot.planning.frenet_optimal_trajectory.frenet_optimal_trajectory_planner.
     FrenetOptimalTrajectory.fot_wrapper \
     import compute_initial_conditions, get_fot_frenet_space
 from pylot.planning.messages import WaypointsMessage
-from pylot.utils import Location, Rotation, Transform
+from pylot.utils import Location, Rotation, Transform, TransformArray
 
 DEFAULT_DISTANCE_THRESHOLD = 30  # 30 meters radius around of ego
 DEFAULT_NUM_WAYPOINTS = 100  # 100 waypoints to plan for
@@ -274,26 +274,27 @@ class FOTPlanningOperator(erdos.Operator):
         Construct an obstacle list of proximal objects given vehicle_transform.
         """
         obstacle_list = []
+        ego_origin = np.array(
+            [vehicle_transform.location.x, vehicle_transform.location.y])
         # look over all predictions
         for prediction in prediction_msg.predictions:
             # use all prediction times as potential obstacles
-            for transform in prediction.trajectory:
-                global_obstacle = vehicle_transform * transform
-                obstacle_origin = [
-                    global_obstacle.location.x, global_obstacle.location.y
-                ]
-                dist_to_ego = np.linalg.norm([
-                    vehicle_transform.location.x - obstacle_origin[0],
-                    vehicle_transform.location.y - obstacle_origin[1]
-                ])
-                # TODO (@fangedward): Fix this hack
-                # Prediction also sends a prediction for ego vehicle
-                # This will always be the closest to the ego vehicle
-                # Filter out until this is removed from prediction
-                if dist_to_ego < 2:  # this allows max vel to be 20m/s
-                    break
-                elif dist_to_ego < DEFAULT_DISTANCE_THRESHOLD:
-                    obstacle_list.append(obstacle_origin)
+            global_obstacles = vehicle_transform * \
+                TransformArray.from_transforms(prediction.trajectory)
+            obstacle_origins = global_obstacles.locations[:, :2]
+            dist_to_ego = np.linalg.norm(obstacle_origins - ego_origin,
+                                         axis=1)
+            # TODO (@fangedward): Fix this hack
+            # Prediction also sends a prediction for ego vehicle
+            # This will always be the closest to the ego vehicle
+            # Filter out until this is removed from prediction
+            # this allows max vel to be 20m/s
+            too_close = np.nonzero(dist_to_ego < 2)[0]
+            if len(too_close) > 0:
+                obstacle_origins = obstacle_origins[:too_close[0]]
+                dist_to_ego = dist_to_ego[:too_close[0]]
+            obstacle_list.extend(
+                obstacle_origins[dist_to_ego < DEFAULT_DISTANCE_THRESHOLD])
 
         if len(obstacle_list) == 0:
             return np.empty((0, 2))
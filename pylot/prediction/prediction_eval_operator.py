@@ -7,7 +7,7 @@ from pylot.perception.detection.utils import VEHICLE_LABELS
 from pylot.perception.tracking.obstacle_trajectory import ObstacleTrajectory
 from pylot.prediction.messages import PredictionMessage
 from pylot.prediction.obstacle_prediction import ObstaclePrediction
-from pylot.utils import time_epoch_ms, Vector2D
+from pylot.utils import time_epoch_ms, TransformArray, Vector2D
 
 
 class PredictionEvalOperator(erdos.Operator):
@@ -79,10 +79,9 @@ class PredictionEvalOperator(erdos.Operator):
             # in world coordinates, for speedup when calculating metrics.
             ground_trajectories_dict = {}
             for obstacle in tracking_msg.obstacle_trajectories:
-                cur_trajectory = []
-                for past_transform in obstacle.trajectory:
-                    world_coord = vehicle_transform * past_transform
-                    cur_trajectory.append(world_coord)
+                cur_trajectory = (vehicle_transform *
+                                  TransformArray.from_transforms(
+                                      obstacle.trajectory)).as_transforms()
 
                 ground_trajectories_dict[obstacle.id] = \
                     ObstacleTrajectory(obstacle.label,
@@ -98,10 +97,9 @@ class PredictionEvalOperator(erdos.Operator):
         # queue.
         obstacle_predictions_list = []
         for obstacle in prediction_msg.predictions:
-            cur_trajectory = []
-            for past_transform in obstacle.trajectory:
-                world_coord = vehicle_transform * past_transform
-                cur_trajectory.append(world_coord)
+            cur_trajectory = (vehicle_transform *
+                              TransformArray.from_transforms(
+                                  obstacle.trajectory)).as_transforms()
             # Get the current transform of the obstacle, which is the last
             # trajectory value.
             cur_transform = obstacle.trajectory[-1]
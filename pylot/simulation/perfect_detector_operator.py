@@ -3,6 +3,7 @@ from collections import deque
 import erdos
 
 import pylot.simulation.utils
+from pylot.perception.detection.obstacle import Obstacle
 from pylot.perception.detection.utils import DetectedObstacle
 from pylot.perception.messages import ObstaclesMessage
 
@@ -206,20 +207,22 @@ class PerfectDetectorOperator(erdos.Operator):
             list(:py:class:`~pylot.perception.detection.utils.DetectedObstacle`):
             List of detected obstacles.
         """
+        # Calculate the distance of the obstacles from the vehicle, and
+        # convert to camera view the ones that are less than
+        # perfect_detection_max_distance metres away.
+        obstacles = [
+            obstacle for obstacle in obstacles
+            if obstacle.distance(vehicle_transform) <=
+            self._flags.perfect_detection_max_distance
+        ]
+        # Convert all the obstacles at once.
+        bboxes = Obstacle.get_bounding_boxes_in_camera_view(
+            obstacles, depth_frame, segmented_frame)
         det_obstacles = []
-        for obstacle in obstacles:
-            # Calculate the distance of the obstacle from the vehicle, and
-            # convert to camera view if it is less than
-            # perfect_detection_max_distance metres away.
-            if obstacle.distance(
-                    vehicle_transform
-            ) > self._flags.perfect_detection_max_distance:
-                bbox = None
-            else:
-                bbox = obstacle.to_camera_view(depth_frame, segmented_frame)
-                if bbox:
-                    det_obstacles.append(
-                        DetectedObstacle(bbox, 1.0, obstacle.label,
-                                         obstacle.id, obstacle.transform,
-                                         obstacle.detailed_label))
+        for obstacle, bbox in zip(obstacles, bboxes):
+            if bbox:
+                det_obstacles.append(
+                    DetectedObstacle(bbox, 1.0, obstacle.label, obstacle.id,
+                                     obstacle.transform,
+                                     obstacle.detailed_label))
         return det_obstacles
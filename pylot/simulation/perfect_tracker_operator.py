@@ -47,7 +47,7 @@ class PerfectTrackerOperator(erdos.Operator):
         # of vehicles and people to our current perspective.
         can_bus_transform = can_bus_msg.data.transform
 
-        obstacle_trajectories = []
+        obstacles = []
         # Only consider obstacles which still exist at the most recent
         # timestamp.
         for obstacle in obstacles_msg.obstacles:
@@ -55,18 +55,33 @@ class PerfectTrackerOperator(erdos.Operator):
                 # Do no track the ego-vehicle.
                 continue
             self._obstacles[obstacle.id].append(obstacle)
+            obstacles.append(obstacle)
+
+        # Gather the past frames of all the obstacles, and compute the
+        # locations of the centers of their bounding boxes, in relation to the
+        # CanBus measurement, in a single batch.
+        past_obstacles = [
+            past_obstacle for obstacle in obstacles
+            for past_obstacle in self._obstacles[obstacle.id]
+        ]
+        v_transforms = pylot.utils.TransformArray.from_transforms(
+            [past.transform for past in past_obstacles]) * \
+            pylot.utils.TransformArray.from_transforms(
+                [past.bounding_box.transform for past in past_obstacles])
+        new_locations = can_bus_transform.inverse_transform_points(
+            v_transforms.locations)
+
+        obstacle_trajectories = []
+        index = 0
+        for obstacle in obstacles:
             cur_obstacle_trajectory = []
-            # Iterate through past frames of this obstacle.
-            for past_obstacle_loc in self._obstacles[obstacle.id]:
-                # Get the location of the center of the obstacle's bounding
-                # box, in relation to the CanBus measurement.
-                v_transform = past_obstacle_loc.transform * \
-                                past_obstacle_loc.bounding_box.transform
-                new_location = can_bus_transform.inverse_transform_locations(
-                    [v_transform.location])[0]
+            for _ in range(len(self._obstacles[obstacle.id])):
+                x, y, z = new_locations[index]
                 cur_obstacle_trajectory.append(
-                    pylot.utils.Transform(location=new_location,
-                                          rotation=pylot.utils.Rotation()))
+                    pylot.utils.Transform(
+                        location=pylot.utils.Location(x, y, z),
+                        rotation=pylot.utils.Rotation()))
+                index += 1
             obstacle_trajectories.append(
                 ObstacleTrajectory(obstacle.label, obstacle.id,
                                    obstacle.bounding_box,
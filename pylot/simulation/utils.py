@@ -8,8 +8,10 @@ from pylot.perception.depth_frame import DepthFrame
 from pylot.perception.detection.obstacle import Obstacle
 from pylot.perception.detection.speed_limit_sign import SpeedLimitSign
 from pylot.perception.detection.stop_sign import StopSign
-from pylot.perception.detection.traffic_light import TrafficLight
-from pylot.perception.detection.utils import BoundingBox2D
+from pylot.perception.detection.traffic_light import \
+    TRAFFIC_LIGHT_SEGMENTATION_CLASS, TrafficLight
+from pylot.perception.detection.utils import BoundingBox2D, \
+    SegmentedDepthIntegralImages
 
 # Type used to send location info from Carla.
 LocationGeo = namedtuple('LocationGeo', 'latitude, longitude, altitude')
@@ -190,15 +192,25 @@ def get_traffic_lights_obstacles(traffic_lights, depth_frame, segmented_frame,
         List of detected traffic light obstacles.
     """
     camera_transform = depth_frame.camera_setup.get_transform()
-    # Iterate over all the traffic lights, and figure out which ones are
-    # facing us and are visible in the camera view.
+    # Figure out which traffic lights are facing us.
+    traffic_lights = [
+        light for light in traffic_lights
+        if light.is_traffic_light_visible(camera_transform, town_name)
+    ]
+    if len(traffic_lights) == 0:
+        return []
+    # Build the integral images of the frames once for all the traffic
+    # lights.
+    integral_images = SegmentedDepthIntegralImages.from_frames(
+        depth_frame, segmented_frame, [TRAFFIC_LIGHT_SEGMENTATION_CLASS])
+    # Iterate over the traffic lights, and figure out which ones are visible
+    # in the camera view.
     detected = []
     for light in traffic_lights:
-        if not light.is_traffic_light_visible(camera_transform, town_name):
-            continue
         detected.extend(
             light.get_all_detected_traffic_light_boxes(
-                town_name, depth_frame, segmented_frame.as_numpy_array()))
+                town_name, depth_frame, segmented_frame.get_class_ids(),
+                integral_images))
     return detected
 
 
@@ -215,6 +215,102 @@ class Vector2D(object):
         return 'Vector2D(x={}, y={})'.format(self.x, self.y)
 
 
+class Vector2DArray(object):
+    """Stores a set of 2D vectors as an (N, 2) numpy array, and provides
+    vectorized versions of the :py:class:`.Vector2D` helper functions.
+
+    Args:
+        points: A (number of vectors) by 2 numpy array, where each row is the
+            (x, y) coordinates of a vector, or a flat array of interleaved
+            (x, y) coordinates.
+
+    Raises:
+        ValueError: If points is not of either of these shapes.
+
+    Attributes:
+        points: A (number of vectors) by 2 numpy array, where each row is the
+            (x, y) coordinates of a vector.
+    """
+    def __init__(self, points):
+        self.points = _to_point_array(points, 2)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        """Creates a vector array from a list of pylot 2D vectors.
+
+        Args:
+            vectors (list(:py:class:`.Vector2D`)): List of 2D vectors.
+
+        Returns:
+            :py:class:`.Vector2DArray`: A 2D vector array.
+        """
+        return cls(np.array([[vector.x, vector.y] for vector in vectors]))
+
+    def as_vectors(self):
+        """Converts the array to a list of pylot 2D vectors."""
+        return [Vector2D(x, y) for x, y in self.points]
+
+    def as_numpy_array(self):
+        """Retrieves the vectors as a (number of vectors) by 2 numpy array."""
+        return self.points
+
+    @property
+    def x(self):
+        return self.points[:, 0]
+
+    @property
+    def y(self):
+        return self.points[:, 1]
+
+    def get_angle(self, other):
+        """Computes the angles between the vectors and another vector (or the
+        vectors of another array of the same length)."""
+        other = _as_points(other, 2)
+        angle = np.arctan2(self.y, self.x) - np.arctan2(
+            other[..., 1], other[..., 0])
+        angle = np.where(angle > math.pi, angle - 2 * math.pi, angle)
+        return np.where(angle < -math.pi, angle + 2 * math.pi, angle)
+
+    def get_vector_and_magnitude(self, other):
+        """Calculates vectors and magnitudes between the vectors and another
+        vector (or the vectors of another array of the same length).
+
+        Returns:
+            :py:class:`.Vector2DArray`, numpy.ndarray: A tuple comprising of
+            the normalized 2D vectors and their magnitudes.
+        """
+        return _get_vector_and_magnitude(self.points - _as_points(other, 2))
+
+    def l1_distance(self, other):
+        """Calculates the L1 distances between the vectors and another vector
+        (or the vectors of another array of the same length)."""
+        return np.sum(np.abs(self.points - _as_points(other, 2)), axis=1)
+
+    def l2_distance(self, other):
+        """Calculates the L2 distances between the vectors and another vector
+        (or the vectors of another array of the same length)."""
+        return np.linalg.norm(self.points - _as_points(other, 2), axis=1)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            x, y = self.points[index]
+            return Vector2D(x, y)
+        return Vector2DArray(self.points[index])
+
+    def __iter__(self):
+        for x, y in self.points:
+            yield Vector2D(x, y)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return 'Vector2DArray(number of vectors: {})'.format(len(self))
+
+
 class Location(Vector3D):
     """Stores a 3D location, and provides useful helper methods.
 
@@ -304,6 +400,181 @@ class Location(Vector3D):
         return 'Location(x={}, y={}, z={})'.format(self.x, self.y, self.z)
 
 
+class LocationArray(object):
+    """Stores a set of 3D locations as an (N, 3) numpy array, and provides
+    vectorized versions of the :py:class:`.Location` helper functions.
+
+    The class avoids the allocation of one Python object per point. Indexing
+    the array with an integer, or iterating over it, yields
+    :py:class:`.Location` instances.
+
+    Args:
+        points: A (number of locations) by 3 numpy array, where each row is
+            the (x, y, z) coordinates of a location, or a flat array of
+            interleaved (x, y, z) coordinates.
+
+    Raises:
+        ValueError: If points is not of either of these shapes.
+
+    Attributes:
+        points: A (number of locations) by 3 numpy array, where each row is
+            the (x, y, z) coordinates of a location.
+    """
+    def __init__(self, points):
+        self.points = _to_point_array(points, 3)
+
+    @classmethod
+    def from_locations(cls, locations):
+        """Creates a location array from a list of pylot locations.
+
+        Args:
+            locations (list(:py:class:`.Location`)): List of locations.
+
+        Returns:
+            :py:class:`.LocationArray`: A location array.
+        """
+        return cls(
+            np.array([[loc.x, loc.y, loc.z] for loc in locations],
+                     dtype=np.float64))
+
+    def as_locations(self):
+        """Converts the array to a list of pylot locations."""
+        return [Location(x, y, z) for x, y, z in self.points]
+
+    def as_numpy_array(self):
+        """Retrieves the locations as a (number of locations) by 3 numpy
+        array."""
+        return self.points
+
+    @property
+    def x(self):
+        return self.points[:, 0]
+
+    @property
+    def y(self):
+        return self.points[:, 1]
+
+    @property
+    def z(self):
+        return self.points[:, 2]
+
+    def distance(self, other):
+        """Calculates the Euclidean distances between the locations and
+        another location (or the locations of another array of the same
+        length).
+
+        Returns:
+            numpy.ndarray: The Euclidean distances.
+        """
+        return np.linalg.norm(self.points - _as_points(other, 3), axis=1)
+
+    def l1_distance(self, other):
+        """Calculates the L1 distances between the locations and another
+        location (or the locations of another array of the same length).
+
+        Returns:
+            numpy.ndarray: The L1 distances.
+        """
+        return np.sum(np.abs(self.points - _as_points(other, 3)), axis=1)
+
+    def get_vector_and_magnitude(self, other):
+        """Calculates the 2D vectors and magnitudes between the locations and
+        another location (or the locations of another array of the same
+        length).
+
+        Returns:
+            :py:class:`.Vector2DArray`, numpy.ndarray: A tuple comprising of
+            the normalized 2D vectors and their magnitudes.
+        """
+        return _get_vector_and_magnitude(self.points[:, :2] -
+                                         _as_points(other, 3)[..., :2])
+
+    def to_camera_view(self, extrinsic_matrix, intrinsic_matrix):
+        """Converts the locations to the view of the camera using the
+        extrinsic and the intrinsic matrix.
+
+        See :py:func:`.Vector3D.to_camera_view`.
+
+        Returns:
+            :py:class:`.LocationArray`: The (x, y) pixel coordinates and the
+            depth of each location.
+        """
+        inverse_extrinsic = np.linalg.inv(extrinsic_matrix)
+        # Transform the points to the camera in 3D.
+        transformed_3D_pos = np.dot(inverse_extrinsic[:3, :3],
+                                    self.points.T) + inverse_extrinsic[:3, 3:]
+        # Transform the points to 2D.
+        position_2D = np.dot(intrinsic_matrix, transformed_3D_pos)
+        # Normalize the 2D points.
+        return LocationArray(
+            np.stack([
+                position_2D[0] / position_2D[2],
+                position_2D[1] / position_2D[2], position_2D[2]
+            ],
+                     axis=1))
+
+    def __add__(self, other):
+        return LocationArray(self.points + _as_points(other, 3))
+
+    def __sub__(self, other):
+        return LocationArray(self.points - _as_points(other, 3))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            x, y, z = self.points[index]
+            return Location(x, y, z)
+        return LocationArray(self.points[index])
+
+    def __iter__(self):
+        for x, y, z in self.points:
+            yield Location(x, y, z)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return 'LocationArray(number of locations: {})'.format(len(self))
+
+
+def _to_point_array(points, dims):
+    """Converts points to an (N, dims) numpy array.
+
+    Only (N, dims) arrays and flat arrays whose length is a multiple of dims
+    are accepted, so that mis-shaped inputs are not silently regrouped.
+    """
+    points = np.asarray(points)
+    if points.ndim == 2 and points.shape[1] == dims:
+        return points
+    if points.ndim == 1 and len(points) % dims == 0:
+        return np.reshape(points, (-1, dims))
+    raise ValueError('Expected an (N, {0}) array or a flat array whose '
+                     'length is a multiple of {0}, got shape {1}'.format(
+                         dims, points.shape))
+
+
+def _as_points(other, dims):
+    """Converts a vector, or an array of vectors, to a numpy array of points
+    with dims coordinates."""
+    if isinstance(other, (LocationArray, Vector2DArray)):
+        return other.points
+    elif isinstance(other, Vector3D):
+        return np.array([other.x, other.y, other.z])[:dims]
+    elif isinstance(other, Vector2D):
+        return np.array([other.x, other.y])
+    return np.asarray(other)
+
+
+def _get_vector_and_magnitude(vecs):
+    """Normalizes an (N, 2) array of vectors and returns them together with
+    their magnitudes."""
+    magnitudes = np.linalg.norm(vecs, axis=1)
+    scale = np.where(magnitudes > 0.00001, magnitudes, 1.0)
+    return Vector2DArray(vecs / scale[:, None]), magnitudes
+
+
 class Transform(object):
     """A class that stores the location and rotation of an obstacle.
 
@@ -332,31 +603,69 @@ class Transform(object):
         matrix: The transformation matrix used to convert points in the 3D
             coordinate space with respect to the location and rotation of the
             given object.
+
+    Note:
+        The rotation, the forward vector and the inverse of the matrix are
+        computed lazily and cached. Transforms should therefore not be
+        mutated after they are created.
     """
     def __init__(self, location=None, rotation=None, matrix=None):
         if matrix is not None:
             self.matrix = matrix
-            self.location = Location(matrix[0, 3], matrix[1, 3], matrix[2, 3])
-
-            # Forward vector is retrieved from the matrix.
-            self.forward_vector = Vector3D(self.matrix[0, 0],
-                                           self.matrix[1, 0], self.matrix[2,
-                                                                          0])
-            pitch_r = math.asin(self.forward_vector.z)
-            yaw_r = math.acos(
-                np.clip(self.forward_vector.x / math.cos(pitch_r), -1, 1))
-            roll_r = math.asin(matrix[2, 1] / (-1 * math.cos(pitch_r)))
-            self.rotation = Rotation(math.degrees(pitch_r),
-                                     math.degrees(yaw_r), math.degrees(roll_r))
+            # The location and the rotation are retrieved from the matrix
+            # only when they are first accessed, because recovering the Euler
+            # angles is expensive and many transforms (e.g., the result of a
+            # composition) are only used to transform points.
+            self._location, self._rotation = None, None
         else:
-            self.location, self.rotation = location, rotation
-            self.matrix = Transform._create_matrix(self.location,
-                                                   self.rotation)
-
+            self._location, self._rotation = location, rotation
+            self.matrix = Transform._create_matrix(self._location,
+                                                   self._rotation)
+        self._forward_vector = None
+        self._inverse_matrix = None
+
+    @property
+    def location(self):
+        if self._location is None:
+            self._location = Location(self.matrix[0, 3], self.matrix[1, 3],
+                                      self.matrix[2, 3])
+        return self._location
+
+    @property
+    def rotation(self):
+        if self._rotation is None:
+            forward_vector = self.forward_vector
+            pitch_r = math.asin(forward_vector.z)
+            yaw_r = math.acos(
+                np.clip(forward_vector.x / math.cos(pitch_r), -1, 1))
+            roll_r = math.asin(self.matrix[2, 1] / (-1 * math.cos(pitch_r)))
+            self._rotation = Rotation(math.degrees(pitch_r),
+                                      math.degrees(yaw_r),
+                                      math.degrees(roll_r))
+        return self._rotation
+
+    @property
+    def forward_vector(self):
+        if self._forward_vector is None:
             # Forward vector is retrieved from the matrix.
-            self.forward_vector = Vector3D(self.matrix[0, 0],
-                                           self.matrix[1, 0], self.matrix[2,
-                                                                          0])
+            self._forward_vector = Vector3D(self.matrix[0, 0],
+                                            self.matrix[1, 0], self.matrix[2,
+                                                                           0])
+        return self._forward_vector
+
+    def _get_inverse_matrix(self):
+        """Returns the (cached) inverse of the transformation matrix.
+
+        The matrix is a rigid-body transformation, so the inverse is computed
+        in closed form as (R^T, -R^T t).
+        """
+        if self._inverse_matrix is None:
+            rotation_t = self.matrix[:3, :3].T
+            inverse_matrix = np.identity(4)
+            inverse_matrix[:3, :3] = rotation_t
+            inverse_matrix[:3, 3] = -np.dot(rotation_t, self.matrix[:3, 3])
+            self._inverse_matrix = inverse_matrix
+        return self._inverse_matrix
 
     @classmethod
     def from_carla_transform(cls, transform):
@@ -476,7 +785,7 @@ class Transform(object):
         Returns:
             An n by 3 numpy array of transformed points.
         """
-        return self.__transform(points, np.linalg.inv(self.matrix))
+        return self.__transform(points, self._get_inverse_matrix())
 
     def transform_locations(self, locations):
         """Transforms the given set of locations (specified in the coordinate
@@ -488,11 +797,16 @@ class Transform(object):
         conversion between a numpy array and list of locations.
 
         Args:
-            points (list(:py:class:`.Location`)): List of locations.
+            locations (list(:py:class:`.Location`) or
+                :py:class:`.LocationArray`): Locations to transform.
 
         Returns:
-            list(:py:class:`.Location`): List of transformed points.
+            list(:py:class:`.Location`) or :py:class:`.LocationArray`: The
+            transformed locations, of the same type as locations.
         """
+        if isinstance(locations, LocationArray):
+            return LocationArray(
+                self.__transform(locations.points, self.matrix))
         points = np.array([loc.as_numpy_array() for loc in locations])
         transformed_points = self.__transform(points, self.matrix)
         return [Location(x, y, z) for x, y, z in transformed_points]
@@ -507,15 +821,20 @@ class Transform(object):
         conversion between a numpy array and list of locations.
 
         Args:
-            points (list(:py:class:`.Location`)): List of locations.
+            locations (list(:py:class:`.Location`) or
+                :py:class:`.LocationArray`): Locations to transform.
 
         Returns:
-            list(:py:class:`.Location`): List of transformed points.
+            list(:py:class:`.Location`) or :py:class:`.LocationArray`: The
+            transformed locations, of the same type as locations.
         """
-
+        if isinstance(locations, LocationArray):
+            return LocationArray(
+                self.__transform(locations.points,
+                                 self._get_inverse_matrix()))
         points = np.array([loc.as_numpy_array() for loc in locations])
         transformed_points = self.__transform(points,
-                                              np.linalg.inv(self.matrix))
+                                              self._get_inverse_matrix())
         return [Location(x, y, z) for x, y, z in transformed_points]
 
     def as_carla_transform(self):
@@ -572,6 +891,8 @@ class Transform(object):
         return d_angle < 90.0
 
     def __mul__(self, other):
+        if isinstance(other, TransformArray):
+            return TransformArray(np.matmul(self.matrix, other.matrices))
         new_matrix = np.dot(self.matrix, other.matrix)
         return Transform(matrix=new_matrix)
 
@@ -586,6 +907,143 @@ class Transform(object):
             return "Transform({})".format(str(self.matrix))
 
 
+class TransformArray(object):
+    """Stores a batch of transforms as an (N, 4, 4) array of matrices.
+
+    The class provides batched versions of the :py:class:`.Transform`
+    operations (composition, inversion, and point transformation), which
+    avoid building a Python :py:class:`.Transform` object for every
+    intermediate result when many poses have to be processed at once.
+
+    Args:
+        matrices: A (number of transforms) by 4 by 4 numpy array, where each
+            entry is the transformation matrix of a transform.
+
+    Attributes:
+        matrices: A (number of transforms) by 4 by 4 numpy array, where each
+            entry is the transformation matrix of a transform.
+    """
+    def __init__(self, matrices):
+        matrices = np.asarray(matrices, dtype=np.float64)
+        if matrices.ndim != 3 or matrices.shape[1:] != (4, 4):
+            raise ValueError(
+                'Expected an (N, 4, 4) array of matrices, got {}'.format(
+                    matrices.shape))
+        self.matrices = matrices
+
+    @classmethod
+    def from_transforms(cls, transforms):
+        """Creates a transform array from a list of pylot transforms.
+
+        Args:
+            transforms (list(:py:class:`.Transform`)): List of transforms.
+
+        Returns:
+            :py:class:`.TransformArray`: A transform array.
+        """
+        if len(transforms) == 0:
+            return cls(np.empty((0, 4, 4)))
+        return cls(np.stack([transform.matrix for transform in transforms]))
+
+    def as_transforms(self):
+        """Converts the transform array to a list of pylot transforms.
+
+        Returns:
+            list(:py:class:`.Transform`): List of transforms.
+        """
+        return [Transform(matrix=matrix) for matrix in self.matrices]
+
+    @property
+    def locations(self):
+        """A (number of transforms) by 3 numpy array of the locations of the
+        transforms."""
+        return self.matrices[:, :3, 3]
+
+    def inverse(self):
+        """Inverts all the transforms in the array.
+
+        The transforms are rigid-body transformations, so the inverse is
+        computed in closed form (R^T, -R^T t) instead of with a general
+        matrix inversion.
+
+        Returns:
+            :py:class:`.TransformArray`: The inverted transforms.
+        """
+        rotations_t = np.transpose(self.matrices[:, :3, :3], (0, 2, 1))
+        inverse = np.zeros_like(self.matrices)
+        inverse[:, :3, :3] = rotations_t
+        inverse[:, :3, 3] = -np.einsum('nij,nj->ni', rotations_t,
+                                       self.matrices[:, :3, 3])
+        inverse[:, 3, 3] = 1
+        return TransformArray(inverse)
+
+    def transform_points(self, points):
+        """Transforms points from the coordinate space of each transform to
+        the world coordinate space.
+
+        Args:
+            points: Either a (number of transforms) by 3 numpy array, in which
+                case the i-th point is transformed by the i-th transform, or a
+                (number of transforms) by (number of points) by 3 numpy array,
+                in which case the i-th set of points is transformed by the
+                i-th transform.
+
+        Returns:
+            A numpy array of transformed points of the same shape as points.
+        """
+        return TransformArray.__transform(points, self.matrices)
+
+    def inverse_transform_points(self, points):
+        """Transforms points from world coordinate space to be relative to
+        each transform.
+
+        Args:
+            points: Either a (number of transforms) by 3 numpy array, or a
+                (number of transforms) by (number of points) by 3 numpy
+                array. See :py:func:`.transform_points`.
+
+        Returns:
+            A numpy array of transformed points of the same shape as points.
+        """
+        return TransformArray.__transform(points, self.inverse().matrices)
+
+    @staticmethod
+    def __transform(points, matrices):
+        points = np.asarray(points)
+        rotations, translations = matrices[:, :3, :3], matrices[:, :3, 3]
+        if points.ndim == 2:
+            return np.einsum('nij,nj->ni', rotations, points) + translations
+        elif points.ndim == 3:
+            return (np.einsum('nij,nmj->nmi', rotations, points) +
+                    translations[:, None, :])
+        raise ValueError('Unexpected points shape {}'.format(points.shape))
+
+    def __mul__(self, other):
+        """Composes the transforms.
+
+        If other is a :py:class:`.Transform`, it is composed with every
+        transform in the array. If other is a :py:class:`.TransformArray`, the
+        transforms are composed pair-wise.
+        """
+        if isinstance(other, TransformArray):
+            return TransformArray(np.matmul(self.matrices, other.matrices))
+        return TransformArray(np.matmul(self.matrices, other.matrix))
+
+    def __len__(self):
+        return len(self.matrices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TransformArray(self.matrices[index])
+        return Transform(matrix=self.matrices[index])
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return 'TransformArray(number of transforms: {})'.format(len(self))
+
+
 class CanBus(object):
     """Class used to wrap ego-vehicle information.
 
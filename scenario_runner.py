@@ -86,11 +86,16 @@ def driver():
     pylot.operator_creator.add_carla_collision_logging(vehicle_id_stream,
                                                        can_bus_stream)
 
+    side_camera_streams = None
+    if FLAGS.obstacle_detection and FLAGS.batched_obstacle_detection:
+        side_camera_streams = pylot.operator_creator.add_left_right_cameras(
+            transform, vehicle_id_stream)
+
     obstacles_stream = pylot.component_creator.add_obstacle_detection(
         center_camera_stream, center_camera_setup, can_bus_stream,
         depth_stream, depth_camera_stream, ground_segmented_stream,
         ground_obstacles_stream, ground_speed_limit_signs_stream,
-        ground_stop_signs_stream)
+        ground_stop_signs_stream, side_camera_streams)
 
     traffic_lights_stream = \
         pylot.component_creator.add_traffic_light_detection(
@@ -0,0 +1,71 @@
+"""Micro-benchmark for the transform operations used on the hot paths.
+
+The benchmark emulates the workload of the perfect tracker: for every tracked
+obstacle it composes the transform of the obstacle with the transform of its
+bounding box, for every entry in the obstacle's history, and converts the
+resulting locations into the coordinate space of the ego-vehicle.
+"""
+import timeit
+
+from absl import app
+from absl import flags
+
+import numpy as np
+
+from pylot.utils import Location, Rotation, Transform, TransformArray
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer('num_obstacles', 100, 'Number of tracked obstacles')
+flags.DEFINE_integer('num_steps', 10, 'Length of the obstacle histories')
+flags.DEFINE_integer('num_runs', 20, 'Number of times to run each workload')
+
+
+def random_transform():
+    return Transform(Location(*np.random.uniform(-100, 100, 3)),
+                     Rotation(*np.random.uniform(-30, 30, 3)))
+
+
+def compose_eager(histories, ego_transform):
+    """Composes transforms one at a time, reading the Euler angles of every
+    intermediate result (i.e., the cost paid when they are eagerly computed).
+    """
+    for history in histories:
+        for transform, bbox_transform in history:
+            v_transform = transform * bbox_transform
+            v_transform.rotation
+            ego_transform.inverse_transform_locations([v_transform.location])
+
+
+def compose_lazy(histories, ego_transform):
+    """Composes transforms one at a time, without reading the Euler angles."""
+    for history in histories:
+        for transform, bbox_transform in history:
+            v_transform = transform * bbox_transform
+            ego_transform.inverse_transform_locations([v_transform.location])
+
+
+def compose_batched(histories, ego_transform):
+    """Composes all the transforms at once using TransformArray."""
+    entries = [entry for history in histories for entry in history]
+    v_transforms = TransformArray.from_transforms(
+        [transform for transform, _ in entries]) * \
+        TransformArray.from_transforms(
+            [bbox_transform for _, bbox_transform in entries])
+    ego_transform.inverse_transform_points(v_transforms.locations)
+
+
+def main(argv):
+    histories = [[(random_transform(), random_transform())
+                  for _ in range(FLAGS.num_steps)]
+                 for _ in range(FLAGS.num_obstacles)]
+    ego_transform = random_transform()
+    for workload in [compose_eager, compose_lazy, compose_batched]:
+        runtime = timeit.timeit(lambda: workload(histories, ego_transform),
+                                number=FLAGS.num_runs)
+        print('{}: {:.2f} ms per tick'.format(workload.__name__,
+                                              runtime * 1000 / FLAGS.num_runs))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -28,7 +28,6 @@ setup(
         "pytest",
         "scikit-image<0.15",
         "scipy==1.2.2",
-        "shapely==1.6.4",
         "tensorflow-gpu>=1.12",
         "torch==1.3.1",
         "torchvision==0.2.1",
@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+import pytest
+
+erdos = pytest.importorskip('erdos')
+
+from pylot.perception.detection.batched_detection_operator import \
+    BatchedDetectionOperator  # noqa: E402
+
+Config = namedtuple('Config', 'name log_file_name csv_log_file_name')
+Flags = namedtuple(
+    'Flags',
+    'obstacle_detection_max_batch_size obstacle_detection_batch_deadline')
+Timestamp = namedtuple('Timestamp', 'coordinates')
+Message = namedtuple('Message', 'timestamp')
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, callback, write_streams=None):
+        self.callbacks.append(callback)
+
+
+@pytest.fixture
+def operator(monkeypatch):
+    monkeypatch.setattr(erdos, 'add_watermark_callback',
+                        lambda read_streams, write_streams, callback: None)
+    monkeypatch.setattr(erdos.utils, 'setup_logging',
+                        lambda *args, **kwargs: None)
+    monkeypatch.setattr(erdos.utils, 'setup_csv_logging',
+                        lambda *args, **kwargs: None)
+    monkeypatch.setattr(BatchedDetectionOperator,
+                        'config',
+                        Config('batched_detector', None, None),
+                        raising=False)
+    monkeypatch.setattr(BatchedDetectionOperator, '_start_model_loading',
+                        lambda self, model_path: None)
+    batches = []
+    monkeypatch.setattr(BatchedDetectionOperator, '_run_batch',
+                        lambda self, batch: batches.append(batch))
+    camera_streams = [FakeStream() for _ in range(3)]
+    obstacles_streams = [FakeStream() for _ in range(3)]
+    operator = object.__new__(BatchedDetectionOperator)
+    operator.__init__(*(camera_streams + obstacles_streams), 'model.pb',
+                      Flags(8, 1000.0))
+    return operator, camera_streams, batches
+
+
+def test_frames_of_all_cameras_run_in_one_batch(operator):
+    operator, camera_streams, batches = operator
+    for time in [1, 2]:
+        for camera_index in [2, 0, 1]:
+            [callback] = camera_streams[camera_index].callbacks
+            callback(Message(Timestamp([time])))
+        assert len(batches) == time
+        assert [camera_index for camera_index, _ in batches[-1]] == \
+            [2, 0, 1]
+        assert all(msg.timestamp.coordinates == [time]
+                   for _, msg in batches[-1])
+
+
+def test_watermark_runs_incomplete_batch(operator):
+    operator, camera_streams, batches = operator
+    for camera_index in [0, 1]:
+        camera_streams[camera_index].callbacks[0](Message(Timestamp([1])))
+    assert batches == []
+    operator.on_watermark(Timestamp([1]))
+    assert [len(batch) for batch in batches] == [2]
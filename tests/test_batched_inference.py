@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from pylot.perception.model_registry import FrozenGraphModel
+
+tf = pytest.importorskip('tensorflow')
+if not hasattr(tf, 'GraphDef'):
+    pytest.skip('Requires the TensorFlow 1 graph API',
+                allow_module_level=True)
+
+
+def _write_detection_graph(path):
+    """Writes a tiny frozen graph with the inputs and outputs of the object
+    detection models, which detects one box per image whose score is the
+    mean intensity of the image."""
+    graph = tf.Graph()
+    with graph.as_default():
+        images = tf.placeholder(tf.uint8, [None, None, None, 3],
+                                name='image_tensor')
+        batch_size = tf.shape(images)[0]
+        scores = tf.reduce_mean(tf.cast(images, tf.float32),
+                                axis=[1, 2, 3]) / 255.0
+        tf.identity(tf.reshape(scores, [-1, 1]), name='detection_scores')
+        tf.identity(tf.tile(tf.constant([[[0.1, 0.2, 0.5, 0.6]]]),
+                            [batch_size, 1, 1]),
+                    name='detection_boxes')
+        tf.identity(tf.ones([batch_size, 1]), name='detection_classes')
+        tf.identity(tf.ones([batch_size]), name='num_detections')
+    with tf.gfile.GFile(str(path), 'wb') as graph_file:
+        graph_file.write(graph.as_graph_def().SerializeToString())
+
+
+def test_batched_inference_matches_per_frame_inference(tmp_path):
+    path = tmp_path / 'frozen_inference_graph.pb'
+    _write_detection_graph(path)
+    model = FrozenGraphModel(str(path), 0)
+    fetches = [
+        model.get_tensor(name) for name in [
+            'detection_boxes:0', 'detection_scores:0',
+            'detection_classes:0', 'num_detections:0'
+        ]
+    ]
+    image_tensor = model.get_tensor('image_tensor:0')
+    images = np.stack([
+        np.full((12, 16, 3), value, dtype=np.uint8)
+        for value in [0, 51, 255]
+    ])
+    batched = model(fetches, {image_tensor: images})
+    assert np.allclose(batched[1][:, 0], [0.0, 0.2, 1.0])
+    for index in range(len(images)):
+        single = model(fetches, {image_tensor: images[index:index + 1]})
+        for batched_output, output in zip(batched, single):
+            assert np.allclose(batched_output[index], output[0])
+    model.close()
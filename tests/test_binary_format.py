@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import pylot.perception.binary_format as binary_format
+from pylot.drivers.sensor_setup import CameraSetup, LidarSetup
+from pylot.perception.depth_frame import DepthFrame
+from pylot.perception.point_cloud import PointCloud
+from pylot.utils import Location, Rotation, Transform
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_write_read(tmp_path, mmap):
+    data = np.arange(12, dtype=np.float32).reshape(4, 3)
+    file_name = str(tmp_path / 'data-10.bin')
+    camera_setup = CameraSetup('camera', 'sensor.camera.depth', 4, 3,
+                               Transform(Location(1, 2, 3), Rotation(0, 90,
+                                                                     0)))
+    binary_format.write(file_name, data, 10, camera_setup, extra='value')
+    header, read_data = binary_format.read(file_name, mmap)
+    assert np.array_equal(read_data, data)
+    assert read_data.dtype == np.float32
+    assert not read_data.flags.writeable
+    assert header['timestamp'] == 10
+    assert header['extra'] == 'value'
+    assert header['sensor_setup']['class'] == 'CameraSetup'
+    assert header['sensor_setup']['width'] == 4
+    assert header['sensor_setup']['transform']['location'] == [1, 2, 3]
+
+
+def test_read_invalid_file(tmp_path):
+    file_name = str(tmp_path / 'data-10.bin')
+    with open(file_name, 'wb') as f:
+        f.write(b'not a binary file')
+    with pytest.raises(ValueError):
+        binary_format.read(file_name)
+
+
+def test_point_cloud_save_and_iterate(tmp_path):
+    lidar_setup = LidarSetup('lidar', 'sensor.lidar.ray_cast',
+                             Transform(Location(), Rotation()))
+    for timestamp in [20, 3, 100]:
+        point_cloud = PointCloud(np.full((timestamp, 3), timestamp),
+                                 lidar_setup)
+        point_cloud.save(timestamp, str(tmp_path), 'lidar', 'bin')
+    frames = list(binary_format.iterate(str(tmp_path), 'lidar'))
+    assert [header['timestamp'] for header, _ in frames] == [3, 20, 100]
+    for header, points in frames:
+        assert points.shape == (header['timestamp'], 3)
+        assert header['sensor_setup']['lidar_type'] == 'sensor.lidar.ray_cast'
+
+
+@pytest.mark.parametrize("file_format, in_meters, atol", [
+    ('float16', False, 1e-3),
+    ('uint16', False, 1e-5),
+    ('uint16', True, 1e-2),
+])
+def test_depth_frame_save_binary(tmp_path, file_format, in_meters, atol):
+    frame = np.random.RandomState(0).uniform(0, 1, (3, 4)).astype(np.float32)
+    if in_meters:
+        frame *= 1000
+    depth_frame = DepthFrame(frame, None, in_meters)
+    depth_frame.save(7, str(tmp_path), 'depth', file_format)
+    loaded = DepthFrame.from_binary_file(str(tmp_path / 'depth-7.bin'))
+    assert loaded.frame.dtype == np.float32
+    assert loaded.in_meters == in_meters
+    assert np.allclose(loaded.frame, frame, rtol=1e-3, atol=atol)
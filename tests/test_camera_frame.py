@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+
+import pylot.utils  # noqa: E402
+from pylot.perception.camera_frame import CameraFrame  # noqa: E402
+
+
+class FakeObstacle(object):
+    """Draws a white pixel at the top left corner of the image."""
+    def visualize_on_img(self, image_np, bbox_color_map, ego_transform=None):
+        image_np[0, 0] = 255
+
+
+@pytest.fixture
+def no_timestamp(monkeypatch):
+    monkeypatch.setattr(pylot.utils, 'add_timestamp',
+                        lambda image_np, timestamp: None)
+
+
+@pytest.mark.parametrize("writeable", [True, False])
+def test_annotations_do_not_leak_into_shared_frames(no_timestamp, writeable):
+    shared = np.zeros((4, 6, 3), dtype=np.uint8)
+    shared.setflags(write=writeable)
+    frame = CameraFrame(shared, 'BGR')
+    other_frame = CameraFrame(shared, 'BGR')
+    assert frame.as_bgr_numpy_array()[0, 0, 0] == 0
+    frame.annotate_with_bounding_boxes(0, [FakeObstacle()])
+    assert not shared.any()
+    assert not other_frame.as_bgr_numpy_array().any()
+    # The cached arrays are invalidated by the draws.
+    assert frame.as_bgr_numpy_array()[0, 0, 0] == 255
+    assert frame.as_rgb_numpy_array()[0, 0, 0] == 255
+
+
+def test_frame_is_copied_once(no_timestamp):
+    frame = CameraFrame(np.zeros((4, 6, 3), dtype=np.uint8), 'BGR')
+    frame.annotate_with_bounding_boxes(0, [FakeObstacle()])
+    owned = frame.frame
+    frame.annotate_with_bounding_boxes(1, [])
+    assert frame.frame is owned
+    # Arrays that are assigned to the frame are not owned either.
+    assigned = np.zeros((4, 6, 3), dtype=np.uint8)
+    frame.frame = assigned
+    frame.annotate_with_bounding_boxes(2, [FakeObstacle()])
+    assert not assigned.any() and frame.frame[0, 0, 0] == 255
@@ -0,0 +1,205 @@
+import numpy as np
+import pickle
+import pytest
+from types import SimpleNamespace
+
+from pylot.perception.detection.utils import BoundingBox2D, \
+    DetectedObstacle, DetectedObstacleArray, bounding_boxes_to_array, \
+    clip_segments, compute_average_precision, get_average_precisions, \
+    get_bounding_box_in_camera_view, get_bounding_boxes_in_camera_view, \
+    get_mAP, get_prediction_results, iou_matrix, match_bounding_boxes, \
+    match_detections
+import pylot.utils
+
+
+def random_bboxes(rng, num_bboxes):
+    bboxes = []
+    for _ in range(num_bboxes):
+        x_min, y_min = rng.randint(0, 100, 2)
+        width, height = rng.randint(1, 40, 2)
+        bboxes.append(
+            BoundingBox2D(x_min, x_min + width, y_min, y_min + height))
+    return bboxes
+
+
+def test_iou_matrix():
+    rng = np.random.RandomState(0)
+    bboxes_a = random_bboxes(rng, 20)
+    bboxes_b = random_bboxes(rng, 15)
+    ious = iou_matrix(bboxes_a, bboxes_b)
+    assert ious.shape == (20, 15)
+    for i, bbox_a in enumerate(bboxes_a):
+        for j, bbox_b in enumerate(bboxes_b):
+            assert np.isclose(ious[i, j], bbox_a.calculate_iou(bbox_b))
+    assert np.allclose(
+        iou_matrix(bounding_boxes_to_array(bboxes_a), bboxes_b), ious)
+    assert iou_matrix(bboxes_a, []).shape == (20, 0)
+
+
+@pytest.mark.parametrize("iou_threshold, expected", [
+    (0.1, [(1, 0), (0, 1)]),
+    (0.65, [(1, 0)]),
+    (0.9, []),
+])
+def test_match_bounding_boxes(iou_threshold, expected):
+    ious = np.array([[0.6, 0.5], [0.7, 0.2], [0.3, 0.0]])
+    assert match_bounding_boxes(ious, iou_threshold) == expected
+
+
+@pytest.mark.parametrize("num_ground, num_predictions", [(0, 3), (3, 0),
+                                                         (10, 12)])
+def test_get_prediction_results(num_ground, num_predictions):
+    rng = np.random.RandomState(1)
+    ground_truths = random_bboxes(rng, num_ground)
+    predictions = random_bboxes(rng, num_predictions)
+    # Brute force greedy matching.
+    pairs = sorted([(p.calculate_iou(g), i, j)
+                    for i, p in enumerate(predictions)
+                    for j, g in enumerate(ground_truths)],
+                   key=lambda x: x[0],
+                   reverse=True)
+    matched_predictions, matched_ground = set(), set()
+    for iou, i, j in pairs:
+        if (iou > 0.1 and i not in matched_predictions
+                and j not in matched_ground):
+            matched_predictions.add(i)
+            matched_ground.add(j)
+    true_pos = len(matched_predictions)
+    assert get_prediction_results(ground_truths, predictions,
+                                  0.1) == (true_pos,
+                                           num_predictions - true_pos,
+                                           num_ground - true_pos)
+
+
+def test_get_mAP():
+    ground = [BoundingBox2D(0, 10, 0, 10), BoundingBox2D(50, 60, 50, 60)]
+    ground_obstacles = [
+        SimpleNamespace(bounding_box=ground[0], label='person'),
+        SimpleNamespace(bounding_box=ground[1], label='car')
+    ]
+    obstacles = [
+        SimpleNamespace(bounding_box=ground[0],
+                        confidence=0.9,
+                        label='person'),
+        SimpleNamespace(bounding_box=BoundingBox2D(20, 30, 20, 30),
+                        confidence=0.8,
+                        label='person'),
+        SimpleNamespace(bounding_box=ground[1],
+                        confidence=0.7,
+                        label='truck'),
+    ]
+    assert get_mAP(ground_obstacles, obstacles[:1]) == pytest.approx(0.5)
+    assert get_mAP(ground_obstacles, obstacles) == pytest.approx(0.5 + 0.5 *
+                                                                 2 / 3)
+    assert get_mAP(ground_obstacles, []) == 0
+
+
+def test_get_average_precisions():
+    ground_obstacles = [
+        SimpleNamespace(bounding_box=BoundingBox2D(0, 9, 0, 9),
+                        label='person'),
+        SimpleNamespace(bounding_box=BoundingBox2D(50, 59, 50, 59),
+                        label='car'),
+    ]
+    obstacles = [
+        # IoU of 0.8 with the person.
+        SimpleNamespace(bounding_box=BoundingBox2D(0, 7, 0, 9),
+                        confidence=0.5,
+                        label='person'),
+        # IoU of 0.6 with the car, but labelled as a person.
+        SimpleNamespace(bounding_box=BoundingBox2D(50, 55, 50, 59),
+                        confidence=0.9,
+                        label='person'),
+    ]
+    average_precisions, class_average_precisions = get_average_precisions(
+        ground_obstacles, obstacles, [0.5, 0.7, 0.9])
+    assert np.allclose(average_precisions, [1, 0.25, 0])
+    assert set(class_average_precisions.keys()) == {'person', 'vehicle'}
+    assert np.allclose(class_average_precisions['person'], [0.5, 0.5, 0])
+    assert np.allclose(class_average_precisions['vehicle'], [0, 0, 0])
+
+
+def test_compute_average_precision():
+    true_positives = np.array([True, False, True, False])
+    # Precisions 1, 1/2, 2/3, 1/2 at recalls 1/3, 1/3, 2/3, 2/3.
+    assert compute_average_precision(true_positives, 3) == pytest.approx(
+        1 / 3 + 1 / 3 * 2 / 3)
+    assert compute_average_precision(true_positives, 0) == 0
+    assert match_detections(np.array([[0.6, 0.8], [0.7, 0.1]]),
+                            0.5).tolist() == [True, True]
+
+
+@pytest.mark.parametrize("segment, expected_segment, expected_valid", [
+    ([[10, 20], [30, 40]], [[10, 20], [30, 40]], True),
+    ([[-10, 50], [110, 50]], [[0, 50], [100, 50]], True),
+    ([[50, -50], [50, 50]], [[50, 0], [50, 50]], True),
+    ([[-10, -10], [-5, 50]], None, False),
+    ([[150, 10], [150, 90]], None, False),
+    ([[100, 10], [100, 90]], [[100, 10], [100, 90]], True),
+])
+def test_clip_segments(segment, expected_segment, expected_valid):
+    clipped, valid = clip_segments(np.array([segment], dtype=np.float64),
+                                   100, 100)
+    assert valid[0] == expected_valid
+    if expected_valid:
+        assert np.allclose(clipped[0], expected_segment)
+
+
+def test_get_bounding_boxes_in_camera_view():
+    # A box in view, a box that is clipped by the image, and a box behind
+    # the camera.
+    corners = np.array([[10, 20], [30, 20], [30, 40], [10, 40]] * 2,
+                       dtype=np.float64)
+    bb_coordinates = np.zeros((3, 8, 3))
+    bb_coordinates[0, :, :2] = corners
+    bb_coordinates[0, :, 2] = 5
+    bb_coordinates[1, :, :2] = corners * 3 + 0.5
+    bb_coordinates[1, :, 2] = 5
+    bb_coordinates[2, :, :2] = corners
+    bb_coordinates[2, 1:, 2] = -5
+    bboxes, valid = get_bounding_boxes_in_camera_view(bb_coordinates, 100, 80)
+    assert valid.tolist() == [True, True, False]
+    assert bboxes[0].tolist() == [10, 30, 20, 40]
+    assert bboxes[1].tolist() == [30, 90, 60, 80]
+    bbox = get_bounding_box_in_camera_view(
+        pylot.utils.LocationArray(bb_coordinates[0]), 100, 80)
+    assert (bbox.x_min, bbox.x_max, bbox.y_min, bbox.y_max) == (10, 30, 20,
+                                                                40)
+    assert get_bounding_box_in_camera_view(
+        pylot.utils.LocationArray(bb_coordinates[2]), 100, 80) is None
+
+
+def test_detected_obstacle_array():
+    obstacles = [
+        DetectedObstacle(BoundingBox2D(0, 10, 0, 20), 0.9, 'person', 3),
+        DetectedObstacle(
+            BoundingBox2D(5, 15, 10, 30), 0.5, 'car', 4,
+            pylot.utils.Transform(pylot.utils.Location(1, 2, 3),
+                                  pylot.utils.Rotation(0, 90, 0))),
+        DetectedObstacle(BoundingBox2D(20, 30, 0, 5), 0.7, 'person', 5),
+    ]
+    array = DetectedObstacleArray.from_obstacles(obstacles)
+    assert len(array) == 3
+    assert array.bboxes.tolist() == [[0, 10, 0, 20], [5, 15, 10, 30],
+                                     [20, 30, 0, 5]]
+    assert array.get_labels().tolist() == ['person', 'car', 'person']
+    assert array.get_label_mask({'person'}).tolist() == [True, False, True]
+    assert np.isnan(array.locations[0]).all()
+    assert array.locations[1].tolist() == [1, 2, 3]
+    # The views of an array built from obstacles are the obstacles.
+    assert array.as_obstacles() == obstacles
+    people = array.select(array.get_label_mask({'person'}))
+    assert people.ids.tolist() == [3, 5]
+    assert people.as_obstacles() == [obstacles[0], obstacles[2]]
+    # The views are recreated from the arrays after serialization.
+    views = pickle.loads(pickle.dumps(array)).as_obstacles()
+    for view, obstacle in zip(views, obstacles):
+        assert view.bounding_box.as_width_height_bbox() == \
+            obstacle.bounding_box.as_width_height_bbox()
+        assert (view.label, view.id) == (obstacle.label, obstacle.id)
+        assert view.confidence == pytest.approx(obstacle.confidence)
+    assert views[0].transform is None
+    assert views[1].transform.location.as_numpy_array().tolist() == [1, 2, 3]
+    assert views[1].transform.rotation.yaw == 90
+    empty = DetectedObstacleArray.from_obstacles([])
+    assert len(empty) == 0 and empty.as_obstacles() == []
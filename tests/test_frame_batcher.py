@@ -0,0 +1,91 @@
+from collections import namedtuple
+
+import pytest
+
+from pylot.perception.detection.frame_batcher import FrameBatcher
+
+Timestamp = namedtuple('Timestamp', 'coordinates')
+Message = namedtuple('Message', 'timestamp')
+
+
+def _msg(time):
+    return Message(Timestamp([time]))
+
+
+def test_batch_released_when_all_cameras_arrive():
+    batcher = FrameBatcher(3, 8, 100)
+    assert batcher.add(0, _msg(1), arrival_time=0) == []
+    assert batcher.add(2, _msg(1), arrival_time=0.001) == []
+    batches = batcher.add(1, _msg(1), arrival_time=0.002)
+    assert [[camera for camera, _ in batch] for batch in batches] == \
+        [[0, 2, 1]]
+    assert len(batcher) == 0
+
+
+def test_frames_ahead_are_batched_with_previous_timestamp():
+    batcher = FrameBatcher(2, 8, 100)
+    assert batcher.add(0, _msg(1), arrival_time=0) == []
+    assert batcher.add(0, _msg(2), arrival_time=0.001) == []
+    batches = batcher.add(1, _msg(1), arrival_time=0.002)
+    assert len(batches) == 1
+    assert [(camera, msg.timestamp.coordinates[0])
+            for camera, msg in batches[0]] == [(0, 1), (0, 2), (1, 1)]
+    # Frames are counted again from scratch after a batch.
+    assert batcher.add(1, _msg(2), arrival_time=0.003) == []
+
+
+@pytest.mark.parametrize("arrival_time, num_batches", [(0.009, 0),
+                                                       (0.010, 1),
+                                                       (0.5, 1)])
+def test_deadline(arrival_time, num_batches):
+    batcher = FrameBatcher(2, 8, 10)
+    batcher.add(0, _msg(1), arrival_time=0)
+    batches = batcher.add(0, _msg(2), arrival_time=arrival_time)
+    assert len(batches) == num_batches
+
+
+def test_expired_frames_released_without_arrivals():
+    batcher = FrameBatcher(2, 8, 10)
+    assert batcher.get_deadline() is None
+    batcher.add(0, _msg(1), arrival_time=1.0)
+    batcher.add(0, _msg(2), arrival_time=1.005)
+    assert batcher.get_deadline() == pytest.approx(1.01)
+    assert batcher.release_expired(now=1.009) == []
+    [batch] = batcher.release_expired(now=1.01)
+    assert [msg.timestamp.coordinates[0] for _, msg in batch] == [1, 2]
+    assert batcher.get_deadline() is None
+
+
+@pytest.mark.parametrize("max_batch_size, batch_sizes, num_buffered",
+                         [(1, [1, 1, 1, 1], 0), (3, [3], 1), (4, [4], 0)])
+def test_max_batch_size(max_batch_size, batch_sizes, num_buffered):
+    batcher = FrameBatcher(4, max_batch_size, 100)
+    batches = []
+    for camera in range(4):
+        batches.extend(batcher.add(camera, _msg(1), arrival_time=0))
+    assert [len(batch) for batch in batches] == batch_sizes
+    assert len(batcher) == num_buffered
+    batches.extend(batcher.flush())
+    assert [camera for batch in batches for camera, _ in batch] == \
+        [0, 1, 2, 3]
+
+
+def test_flush():
+    batcher = FrameBatcher(3, 8, 100)
+    for time in [1, 2, 3]:
+        assert batcher.add(0, _msg(time), arrival_time=0) == []
+    batches = batcher.flush(Timestamp([2]))
+    assert [[msg.timestamp.coordinates[0] for _, msg in batch]
+            for batch in batches] == [[1, 2]]
+    assert len(batcher) == 1
+    batches = batcher.flush()
+    assert [[msg.timestamp.coordinates[0] for _, msg in batch]
+            for batch in batches] == [[3]]
+    assert batcher.flush() == []
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        FrameBatcher(0, 8, 10)
+    with pytest.raises(ValueError):
+        FrameBatcher(2, 0, 10)
@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+
+erdos = pytest.importorskip('erdos')
+
+from pylot.perception.detection.utils import BoundingBox2D, \
+    DetectedObstacle, DetectedObstacleArray  # noqa: E402
+from pylot.perception.messages import ObstaclesMessage  # noqa: E402
+import pylot.utils  # noqa: E402
+
+
+def _obstacles():
+    return [
+        DetectedObstacle(BoundingBox2D(0, 10, 0, 20), 0.9, 'person', 3),
+        DetectedObstacle(BoundingBox2D(5, 15, 10, 30), 0.5, 'car', 4),
+    ]
+
+
+def _round_trip(msg):
+    return pickle.loads(pickle.dumps(msg))
+
+
+def test_obstacles_message_from_array():
+    array = DetectedObstacleArray.from_obstacles(_obstacles())
+    msg = ObstaclesMessage(erdos.Timestamp(coordinates=[1]), array, 10)
+    assert msg.obstacle_array is array
+    # Only the columnar payload is serialized.
+    assert _round_trip(msg).__dict__['_obstacles'] is None
+    received = _round_trip(msg)
+    assert received.obstacle_array.ids.tolist() == [3, 4]
+    assert [obstacle.label for obstacle in received.obstacles] == \
+        ['person', 'car']
+    assert received.runtime == 10
+
+
+def test_obstacles_message_from_list():
+    obstacles = _obstacles()
+    msg = ObstaclesMessage(erdos.Timestamp(coordinates=[1]), obstacles)
+    assert msg.obstacles is obstacles
+    assert msg.obstacle_array.bboxes.tolist() == [[0, 10, 0, 20],
+                                                  [5, 15, 10, 30]]
+    assert _round_trip(msg).obstacles[1].id == 4
+
+
+def test_obstacles_message_keeps_modified_obstacles():
+    msg = ObstaclesMessage(erdos.Timestamp(coordinates=[1]),
+                           DetectedObstacleArray.from_obstacles(_obstacles()))
+    # A consumer modifies the obstacles before it forwards the message.
+    msg.obstacles[0].transform = pylot.utils.Transform(
+        pylot.utils.Location(1, 2, 3), pylot.utils.Rotation())
+    msg.obstacles.pop()
+    received = _round_trip(msg)
+    assert len(received.obstacles) == 1
+    assert received.obstacles[0].transform.location.x == 1
+    assert received.obstacle_array.locations.tolist() == [[1, 2, 3]]
@@ -0,0 +1,193 @@
+import threading
+
+import pytest
+
+from pylot.perception.model_registry import ModelLoader, ModelRegistry
+
+
+class FakeModel(object):
+    def __init__(self):
+        self.closed = False
+        self.num_calls = 0
+
+    def __call__(self, value):
+        self.num_calls += 1
+        return value * 2
+
+    def close(self):
+        self.closed = True
+
+
+def test_model_loaded_once():
+    registry = ModelRegistry()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return FakeModel()
+
+    handle1 = registry.acquire('model.pb', loader)
+    handle2 = registry.acquire('./model.pb', loader)
+    assert len(loads) == 1
+    assert handle1.loaded and not handle2.loaded
+    assert handle1.model is handle2.model
+    assert handle1(3) == 6 and handle2(4) == 8
+    assert handle1.model.num_calls == 2
+    [(key, ref_count, load_time, memory)] = registry.get_stats()
+    assert key == handle1.key and ref_count == 2
+    assert load_time >= 0 and memory >= 0
+
+
+@pytest.mark.parametrize("device1, dtype1, device2, dtype2, num_models", [
+    ('cpu', 'float32', 'cpu', 'float32', 1),
+    ('cpu', 'float32', 'cuda', 'float32', 2),
+    ('cuda', 'float32', 'cuda', 'float16', 2),
+])
+def test_model_keys(device1, dtype1, device2, dtype2, num_models):
+    registry = ModelRegistry()
+    registry.acquire('model.pb', FakeModel, device1, dtype1)
+    registry.acquire('model.pb', FakeModel, device2, dtype2)
+    assert len(registry) == num_models
+
+
+def test_model_settings():
+    registry = ModelRegistry()
+    handle1 = registry.acquire('model.pb', FakeModel, settings=(0.3, 0))
+    handle2 = registry.acquire('model.pb', FakeModel, settings=(0.3, 4))
+    handle3 = registry.acquire('model.pb', FakeModel, settings=(0.3, 0))
+    assert handle1.model is not handle2.model
+    assert handle1.model is handle3.model
+    assert len(registry) == 2
+
+
+def test_load_locks_are_removed():
+    registry = ModelRegistry()
+    handle = registry.acquire('model.pb', FakeModel)
+    assert registry._load_locks == {}
+
+    def failing_loader():
+        raise ValueError('Bad model')
+
+    with pytest.raises(ValueError):
+        registry.acquire('other_model.pb', failing_loader)
+    assert registry._load_locks == {} and len(registry) == 1
+    handle.release()
+    assert registry._load_locks == {}
+
+
+def test_model_released():
+    registry = ModelRegistry()
+    handle1 = registry.acquire('model.pb', FakeModel)
+    handle2 = registry.acquire('model.pb', FakeModel)
+    model = handle1.model
+    handle1.release()
+    # Releasing a handle twice has no effect.
+    handle1.release()
+    assert not model.closed and len(registry) == 1
+    with pytest.raises(ValueError):
+        handle1(1)
+    handle2.release()
+    assert model.closed and len(registry) == 0
+    # The model is loaded again once all its handles were released.
+    handle3 = registry.acquire('model.pb', FakeModel)
+    assert handle3.loaded and handle3.model is not model
+
+
+@pytest.mark.parametrize("thread_safe", [False, True])
+def test_model_locked(thread_safe):
+    registry = ModelRegistry()
+    handle1 = registry.acquire('model.pb', FakeModel, thread_safe=thread_safe)
+    handle2 = registry.acquire('model.pb', FakeModel, thread_safe=thread_safe)
+    acquired = []
+    with handle1.locked() as model:
+        assert model is handle1.model
+        thread = threading.Thread(
+            target=lambda: acquired.append(handle2(1)))
+        thread.start()
+        thread.join(0.05)
+        # Models that are not thread-safe are used by one holder at a time.
+        assert len(acquired) == int(thread_safe)
+    thread.join()
+    assert acquired == [2]
+    handle1.release()
+    with pytest.raises(ValueError):
+        with handle1.locked():
+            pass
+
+
+def test_concurrent_acquisitions_load_once():
+    registry = ModelRegistry()
+    loads = []
+    start = threading.Event()
+
+    def loader():
+        loads.append(1)
+        start.wait(0.05)
+        return FakeModel()
+
+    handles = []
+    threads = [
+        threading.Thread(
+            target=lambda: handles.append(registry.acquire('m', loader)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len(set(id(handle.model) for handle in handles)) == 1
+    assert registry.get_stats()[0][1] == 4
+
+
+class ListLogger(object):
+    def __init__(self):
+        self.rows = []
+
+    def info(self, row):
+        self.rows.append(row.split(','))
+
+
+@pytest.mark.parametrize("background", [False, True])
+@pytest.mark.parametrize("num_warm_up_runs", [0, 3])
+def test_model_loader(background, num_warm_up_runs):
+    calls = []
+    csv_logger = ListLogger()
+    loader = ModelLoader(lambda: calls.append('load'),
+                         lambda: calls.append('warm_up'),
+                         num_warm_up_runs,
+                         background=background,
+                         name='detector',
+                         csv_logger=csv_logger)
+    loader.wait()
+    assert loader.ready
+    assert calls == ['load'] + ['warm_up'] * num_warm_up_runs
+    assert len(loader.warm_up_runtimes) == num_warm_up_runs
+    assert [row[1:3] for row in csv_logger.rows] == \
+        [['detector', 'model_load_time']] + \
+        [['detector', 'warm_up_runtime']] * num_warm_up_runs
+
+
+def test_model_loader_gates_until_loaded():
+    release = threading.Event()
+    loader = ModelLoader(release.wait, background=True)
+    assert not loader.ready
+    release.set()
+    loader.wait()
+    assert loader.ready and loader.load_time >= 0
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_model_loader_errors(background):
+    def load():
+        raise IOError('Missing model')
+
+    if background:
+        loader = ModelLoader(load, background=True)
+        with pytest.raises(IOError):
+            loader.wait()
+        assert not loader.ready
+    else:
+        with pytest.raises(IOError):
+            ModelLoader(load)
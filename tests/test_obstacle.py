@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+from pylot.drivers.sensor_setup import DepthCameraSetup
+from pylot.perception.depth_frame import DepthFrame
+from pylot.perception.detection.obstacle import Obstacle
+from pylot.perception.detection.utils import BoundingBox3D, \
+    SegmentedDepthIntegralImages
+from pylot.utils import Location, Rotation, Transform, Vector3D
+
+
+def test_integral_images_class_statistics():
+    rng = np.random.RandomState(0)
+    class_ids = rng.randint(0, 13, (60, 80))
+    depth = rng.rand(60, 80)
+    integral_images = SegmentedDepthIntegralImages(class_ids, depth, [4, 10],
+                                                   1000)
+    bboxes = np.array([[5, 40, 3, 30], [0, 80, 0, 60], [70, 100, 50, 70],
+                       [10, 10, 0, 5]])
+    classes = np.array([4, 10, 4, 10])
+    num_pixels, fractions, mean_depths = \
+        integral_images.get_class_statistics(bboxes, classes)
+    for (x_min, x_max, y_min, y_max), cls, size, fraction, mean_depth in zip(
+            bboxes, classes, num_pixels, fractions, mean_depths):
+        crop = class_ids[y_min:y_max, x_min:x_max]
+        assert size == crop.size
+        if crop.size == 0:
+            assert fraction == 0 and np.isnan(mean_depth)
+            continue
+        mask = crop == cls
+        assert fraction == pytest.approx(mask.mean())
+        assert mean_depth == pytest.approx(
+            depth[y_min:y_max, x_min:x_max][mask].mean() * 1000)
+
+
+@pytest.mark.parametrize("segmentation_class, depth, visible", [
+    (10, 20, True),
+    (4, 20, False),
+    (10, 40, False),
+])
+def test_obstacles_in_camera_view(segmentation_class, depth, visible):
+    camera_setup = DepthCameraSetup('depth', 200, 100,
+                                    Transform(Location(), Rotation()))
+    vehicle = Obstacle(
+        1, 'vehicle', Transform(Location(20, 0, 0), Rotation()),
+        BoundingBox3D(Transform(Location(), Rotation()), Vector3D(2, 1, 1)),
+        0)
+    # An obstacle that is behind the camera.
+    person = Obstacle(
+        2, 'person', Transform(Location(-20, 0, 0), Rotation()),
+        BoundingBox3D(Transform(Location(), Rotation()), Vector3D(1, 1, 1)),
+        0)
+    # Draw the obstacle in the frames.
+    class_ids = np.zeros((100, 200), dtype=np.uint8)
+    class_ids[45:56, 95:106] = segmentation_class
+    depth_frame = DepthFrame(np.full((100, 200), depth / 1000.0),
+                             camera_setup)
+    segmented_frame = SimpleNamespace(get_class_ids=lambda: class_ids)
+    bboxes = Obstacle.get_bounding_boxes_in_camera_view([vehicle, person],
+                                                        depth_frame,
+                                                        segmented_frame)
+    assert bboxes[1] is None
+    if visible:
+        assert (bboxes[0].x_min, bboxes[0].x_max, bboxes[0].y_min,
+                bboxes[0].y_max) == (93, 105, 43, 55)
+        bbox = vehicle.to_camera_view(depth_frame, segmented_frame)
+        assert bbox.as_width_height_bbox() == bboxes[0].as_width_height_bbox()
+    else:
+        assert bboxes[0] is None
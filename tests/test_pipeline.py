@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from pylot.perception.pipeline import Pipeline
+
+
+def _make_stages(output, delays=(0, 0, 0)):
+    def preprocess(item):
+        time.sleep(delays[0])
+        return ('pre', item)
+
+    def infer(item):
+        time.sleep(delays[1])
+        return item + ('infer', )
+
+    def postprocess(item):
+        time.sleep(delays[2])
+        output.append(item)
+
+    return [preprocess, infer, postprocess]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+@pytest.mark.parametrize("queue_size", [1, 3])
+def test_pipeline_preserves_order(threaded, queue_size):
+    output = []
+    pipeline = Pipeline(_make_stages(output, (0.001, 0.002, 0)),
+                        threaded=threaded,
+                        queue_size=queue_size)
+    for item in range(20):
+        pipeline.submit(item)
+    pipeline.drain()
+    assert output == [('pre', item, 'infer') for item in range(20)]
+    pipeline.close()
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_pipeline_run_after(threaded):
+    output = []
+    pipeline = Pipeline(_make_stages(output, (0, 0.001, 0)),
+                        threaded=threaded)
+    for item in range(5):
+        pipeline.submit(item)
+        pipeline.run_after(lambda item=item: output.append(
+            ('watermark', item)))
+    pipeline.close()
+    expected = []
+    for item in range(5):
+        expected += [('pre', item, 'infer'), ('watermark', item)]
+    assert output == expected
+
+
+def test_pipeline_overlaps_stages():
+    output = []
+    delay = 0.02
+    pipeline = Pipeline(_make_stages(output, (delay, delay, delay)))
+    start_time = time.time()
+    for item in range(10):
+        pipeline.submit(item)
+    pipeline.close()
+    # The serial cost is 30 stage invocations.
+    assert time.time() - start_time < 20 * delay
+    assert len(output) == 10
+
+
+def test_pipeline_stage_threads():
+    thread_names = []
+
+    def record(item):
+        thread_names.append(threading.current_thread().name)
+        return item
+
+    pipeline = Pipeline([record, record], name='detector')
+    pipeline.submit(0)
+    pipeline.close()
+    assert thread_names == ['detector-stage-0', 'detector-stage-1']
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_pipeline_errors(threaded):
+    output = []
+
+    def infer(item):
+        if item == 1:
+            raise ValueError('Bad item')
+        return item
+
+    pipeline = Pipeline([infer, output.append], threaded=threaded)
+    pipeline.submit(0)
+    with pytest.raises(ValueError):
+        pipeline.submit(1)
+        pipeline.drain()
+    pipeline.submit(2)
+    pipeline.close()
+    assert output == [0, 2]
+
+
+@pytest.mark.parametrize("failing_stage", [0, 1])
+def test_pipeline_skips_callbacks_after_errors(failing_stage):
+    output = []
+
+    def stage(item):
+        if item[1] == 1 and item[0] == failing_stage:
+            raise ValueError('Bad item')
+        return (item[0] + 1, item[1])
+
+    pipeline = Pipeline([stage, stage, lambda item: output.append(item[1])])
+    for item in range(3):
+        pipeline.submit((0, item))
+        pipeline.run_after(lambda item=item: output.append(
+            ('watermark', item)))
+        if item == 1:
+            with pytest.raises(ValueError):
+                pipeline.drain()
+        else:
+            pipeline.drain()
+    pipeline.close()
+    # The watermark of the dropped item is not forwarded.
+    assert output == [0, ('watermark', 0), 2, ('watermark', 2)]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_pipeline_errors_only_drop_their_items(threaded):
+    output = []
+
+    def infer(item):
+        if item == 1:
+            raise ValueError('Bad item')
+        return item
+
+    pipeline = Pipeline([infer, output.append], threaded=threaded)
+    for item in range(4):
+        # The items and their callbacks alternate, as in the operators.
+        try:
+            pipeline.submit(item)
+        except ValueError:
+            # Only the non-threaded pipeline raises, in the failing call.
+            assert not threaded and item == 1
+            continue
+        pipeline.run_after(lambda item=item: output.append(('wm', item)))
+    if threaded:
+        with pytest.raises(ValueError):
+            pipeline.close()
+    assert output == [0, ('wm', 0), 2, ('wm', 2), 3, ('wm', 3)]
+
+
+def test_pipeline_invalid_arguments():
+    with pytest.raises(ValueError):
+        Pipeline([])
+    with pytest.raises(ValueError):
+        Pipeline([lambda item: item], queue_size=0)
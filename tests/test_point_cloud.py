@@ -4,7 +4,8 @@ import numpy as np
 from pylot.drivers.sensor_setup import CameraSetup, LidarSetup
 from pylot.perception.depth_frame import DepthFrame
 from pylot.perception.point_cloud import PointCloud
-from pylot.utils import Location, Rotation, Transform, Vector2D
+from pylot.utils import Location, LocationArray, Rotation, Transform, \
+    Vector2D, Vector2DArray
 
 # Depth Frame Tests
 
@@ -103,6 +104,23 @@ def test_get_pixel_locations(depth_frame, pixels, expected):
         'value is not the same as expected'
 
 
+def test_get_pixel_locations_array():
+    depth_frame = np.array([[0.4, 0.3], [0.2, 0.1]])
+    height, width = depth_frame.shape
+    camera_setup = CameraSetup('test_setup',
+                               'sensor.camera.depth',
+                               width,
+                               height,
+                               Transform(location=Location(0, 0, 0),
+                                         rotation=Rotation(0, 0, 0)),
+                               fov=90)
+    depth_frame = DepthFrame(depth_frame, camera_setup)
+    locations = depth_frame.get_pixel_locations(
+        Vector2DArray(np.array([[0, 1], [1, 0]])))
+    assert isinstance(locations, LocationArray)
+    assert np.allclose(locations.points, [[200, -200, -200], [300, 300, 300]])
+
+
 ## Point Cloud Tests
 
 
@@ -167,3 +185,164 @@ def test_point_cloud_get_pixel_location(lidar_points, pixel, expected):
     assert np.isclose(location.z,
                       expected.z), 'Returned z value is not the same '
     'as expected'
+
+
+def test_unit_depth_rays_are_cached():
+    from pylot.perception.depth_frame import get_unit_depth_rays
+    camera_setup = CameraSetup('test_setup', 'sensor.camera.depth', 4, 3,
+                               Transform(Location(), Rotation()))
+    other_setup = CameraSetup('other_setup', 'sensor.camera.depth', 4, 3,
+                              Transform(Location(1, 2, 3), Rotation()))
+    rays = get_unit_depth_rays(camera_setup)
+    assert rays.shape == (12, 3)
+    assert rays.dtype == np.float32
+    assert get_unit_depth_rays(other_setup) is rays
+
+
+def test_get_pixel_locations_window_median():
+    depth_frame = np.array([[0.1, 0.1, 0.1], [0.1, 0.9, 0.1],
+                            [0.1, 0.1, 0.1]])
+    camera_setup = CameraSetup('test_setup', 'sensor.camera.depth', 3, 3,
+                               Transform(Location(), Rotation()), fov=90)
+    depth_frame = DepthFrame(depth_frame, camera_setup)
+    pixels = np.array([[1, 1]])
+    # The outlier at the center is rejected by the median over the window.
+    locations = depth_frame.get_pixel_locations(pixels, window_size=3)
+    assert np.allclose(locations.points, [[100, 0, 0]])
+    locations = depth_frame.get_pixel_locations(pixels)
+    assert np.allclose(locations.points, [[900, 0, 0]])
+    # Pixels sparsely unprojected match the full point cloud.
+    pixels = np.array([[0, 0], [2, 1], [1, 2]])
+    point_cloud = depth_frame.as_point_cloud()
+    assert np.allclose(
+        depth_frame.get_pixel_locations(pixels).points,
+        point_cloud[pixels[:, 1] * 3 + pixels[:, 0]])
+
+
+def test_get_bounding_box_depths():
+    from types import SimpleNamespace
+    depth_frame = DepthFrame(
+        np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]),
+        CameraSetup('test_setup', 'sensor.camera.depth', 3, 2,
+                    Transform(Location(), Rotation())))
+    depths = depth_frame.get_bounding_box_depths(
+        [SimpleNamespace(x_min=0, x_max=2, y_min=0, y_max=2),
+         SimpleNamespace(x_min=5, x_max=6, y_min=5, y_max=6)])
+    assert np.isclose(depths[0], 300)
+    assert np.isnan(depths[1])
+
+
+@pytest.mark.parametrize("dtype, in_meters", [(np.float32, False),
+                                              (np.float16, False),
+                                              (np.float32, True)])
+def test_depth_from_carla_frame(dtype, in_meters):
+    from types import SimpleNamespace
+    bgra = np.random.RandomState(0).randint(0, 256, (3, 4, 4),
+                                            dtype=np.uint8)
+    carla_frame = SimpleNamespace(raw_data=bgra.tobytes(), height=3, width=4)
+    depth_frame = DepthFrame.from_carla_frame(carla_frame, None, dtype,
+                                              in_meters)
+    expected = np.dot(bgra[:, :, :3].astype(np.float64),
+                      [65536.0, 256.0, 1.0]) / 16777215.0
+    assert depth_frame.frame.dtype == dtype
+    assert depth_frame.frame.shape == (3, 4)
+    assert np.allclose(depth_frame.frame * depth_frame.meters_per_unit,
+                       expected * 1000,
+                       rtol=1e-3 if dtype == np.float16 else 1e-6)
+
+
+@pytest.mark.parametrize("lidar_points, pixel, expected", [
+    (np.array([[-1, -1, 0], [1, -1, 0]]), Vector2D(
+        200, 300), Location(1, -0.5, 0)),
+    (np.array([[-2, -2, 0], [1, -1, 0]]), Vector2D(
+        200, 300), Location(2, -1, 0)),
+    (np.array([[-2, -2, 0], [1, -1, 0]]), Vector2D(
+        600, 300), Location(1, 0.5, 0)),
+    (np.array([[-2, -2, -1.5], [2, -2, 1.5]]), Vector2D(
+        200, 150), Location(2, -1, 0.75)),
+])
+def test_depth_buffer_get_pixel_location(lidar_points, pixel, expected):
+    camera_setup = CameraSetup(
+        'test_setup', 'sensor.camera.depth', 801, 601,
+        Transform(location=Location(0, 0, 0), rotation=Rotation(0, 0, 0)),
+        fov=90)
+    lidar_setup = LidarSetup('lidar', 'sensor.lidar.ray_cast',
+                             Transform(Location(), Rotation()))
+    point_cloud = PointCloud(lidar_points, lidar_setup)
+    depth_buffer = point_cloud.get_depth_buffer(camera_setup)
+    for search_radius in [None, 10, 1000]:
+        location = depth_buffer.get_pixel_location(pixel, search_radius)
+        assert np.allclose(location.as_numpy_array(),
+                           expected.as_numpy_array())
+    locations = depth_buffer.get_pixel_locations(
+        Vector2DArray.from_vectors([pixel]))
+    assert np.allclose(locations.points, [expected.as_numpy_array()])
+
+
+def test_depth_buffer_keeps_nearest_point():
+    from types import SimpleNamespace
+    camera_setup = CameraSetup('test_setup', 'sensor.camera.depth', 9, 9,
+                               Transform(Location(), Rotation()), fov=90)
+    lidar_setup = LidarSetup('lidar', 'sensor.lidar.ray_cast',
+                             Transform(Location(), Rotation()))
+    # The points project onto the center pixel at depths 4 and 2, and one
+    # point is behind the camera.
+    point_cloud = PointCloud(np.array([[0, -4, 0], [0, -2, 0], [0, 1, 0]]),
+                             lidar_setup)
+    depth_buffer = point_cloud.get_depth_buffer(camera_setup)
+    assert depth_buffer.depth[4, 4] == 2
+    assert depth_buffer.indices[4, 4] == 1
+    assert np.count_nonzero(depth_buffer.indices >= 0) == 1
+    depths = depth_buffer.get_bounding_box_depths(
+        [SimpleNamespace(x_min=3, x_max=6, y_min=3, y_max=6),
+         SimpleNamespace(x_min=0, x_max=2, y_min=0, y_max=2)])
+    assert depths[0] == 2
+    assert np.isnan(depths[1])
+
+
+@pytest.mark.parametrize("lidar_type, matrix", [
+    ('sensor.lidar.ray_cast', [[1, 0, 0], [0, 0, 1], [0, -1, 0]]),
+    ('velodyne', [[0, -1, 0], [0, 0, -1], [1, 0, 0]]),
+])
+def test_point_cloud_to_camera_coordinates(lidar_type, matrix):
+    points = np.random.RandomState(0).uniform(-10, 10, (20, 3))
+    lidar_setup = LidarSetup('lidar', lidar_type,
+                             Transform(Location(), Rotation()))
+    point_cloud = PointCloud(points, lidar_setup)
+    assert point_cloud.points.dtype == np.float32
+    assert np.allclose(point_cloud.points,
+                       np.dot(points, np.array(matrix).T),
+                       atol=1e-5)
+
+
+def test_point_cloud_crop():
+    lidar_setup = LidarSetup('lidar', 'sensor.lidar.ray_cast',
+                             Transform(Location(), Rotation()))
+    # Points in camera coordinates: in front, far away, to the left,
+    # behind, and above.
+    camera_points = np.array([[0, 0, 5], [0, 0, 50], [-10, 0, 1],
+                              [0, 0, -5], [0, -5, 5]])
+    point_cloud = PointCloud(camera_points, lidar_setup)
+    point_cloud.points = camera_points.astype(np.float32)
+    assert len(point_cloud.crop().points) == 5
+    assert len(point_cloud.crop(max_range=20).points) == 4
+    assert len(point_cloud.crop(fov=90).points) == 3
+    cropped = point_cloud.crop(max_range=20, fov=90, max_height=2)
+    assert np.allclose(cropped.points, [[0, 0, 5]])
+    assert cropped.transform is point_cloud.transform
+
+
+def test_point_cloud_voxel_downsample():
+    lidar_setup = LidarSetup('lidar', 'sensor.lidar.ray_cast',
+                             Transform(Location(), Rotation()))
+    point_cloud = PointCloud(np.zeros((0, 3)), lidar_setup)
+    point_cloud.points = np.array(
+        [[0.1, 0.1, 0.1], [0.3, 0.3, 0.3], [1.5, 0.2, 0.2], [-0.5, 0, 0]],
+        dtype=np.float32)
+    downsampled = point_cloud.voxel_downsample(1.0)
+    expected = [[-0.5, 0, 0], [0.2, 0.2, 0.2], [1.5, 0.2, 0.2]]
+    assert len(downsampled.points) == 3
+    assert np.allclose(sorted(downsampled.points.tolist()), expected)
+    assert len(point_cloud.points) == 4
+    with pytest.raises(ValueError):
+        point_cloud.voxel_downsample(0)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from pylot.perception.segmentation.utils import CITYSCAPES_CLASSES, \
+    ConfusionMatrix, cityscapes_palette_to_class_ids, \
+    compute_confusion_matrix, compute_semantic_iou, get_class_ids
+
+
+def test_cityscapes_palette_to_class_ids():
+    class_ids = np.array([[0, 1, 12], [10, 4, 7]], dtype=np.uint8)
+    palette = np.array([[CITYSCAPES_CLASSES[key] for key in row]
+                        for row in class_ids],
+                       dtype=np.uint8)
+    assert np.array_equal(cityscapes_palette_to_class_ids(palette), class_ids)
+    # Colors that are not in the palette are unlabeled.
+    palette[0, 1] = [1, 2, 3]
+    assert cityscapes_palette_to_class_ids(palette)[0, 1] == 0
+    assert np.array_equal(get_class_ids(class_ids, 'carla'), class_ids)
+    with pytest.raises(ValueError):
+        get_class_ids(class_ids, 'unknown')
+
+
+def test_confusion_matrix():
+    ground = np.array([[1, 1, 2], [2, 0, 3]])
+    prediction = np.array([[1, 2, 2], [2, 0, 1]])
+    matrix = compute_confusion_matrix(ground, prediction, 4)
+    assert matrix.shape == (4, 4)
+    assert matrix.sum() == 6
+    assert matrix[1, 1] == 1 and matrix[1, 2] == 1 and matrix[3, 1] == 1
+    mean_iou, iou = compute_semantic_iou(ground, prediction, 4)
+    # Class 0 is ignored.
+    assert iou == {1: 1 / 3, 2: 2 / 3, 3: 0.0}
+    assert np.isclose(mean_iou, 1 / 3)
+
+
+@pytest.mark.parametrize("ground, prediction", [([[13]], [[0]]),
+                                                ([[0]], [[13]]),
+                                                ([[15, 1]], [[1, 1]])])
+def test_confusion_matrix_ignores_unknown_classes(ground, prediction):
+    matrix = compute_confusion_matrix(np.array(ground), np.array(prediction))
+    assert matrix.shape == (13, 13)
+    assert matrix.sum() == int(ground[0][-1] == 1)
+    assert matrix.sum() == matrix[1, 1]
+
+
+def test_confusion_matrix_accumulates_frames():
+    confusion_matrix = ConfusionMatrix(3)
+    confusion_matrix.update(np.array([1, 1]), np.array([1, 1]))
+    confusion_matrix.update(np.array([2, 2]), np.array([1, 2]))
+    mean_iou, iou = confusion_matrix.get_iou()
+    assert iou == {1: 2 / 3, 2: 1 / 2}
+    assert np.isclose(mean_iou, 7 / 12)
+    confusion_matrix.reset()
+    assert confusion_matrix.matrix.sum() == 0
+
+
+def test_cityscapes_palette_lut_round_trip():
+    from pylot.perception.segmentation.utils import CITYSCAPES_PALETTE_LUT
+    class_ids = np.arange(len(CITYSCAPES_CLASSES), dtype=np.uint8).reshape(
+        1, -1)
+    palette = CITYSCAPES_PALETTE_LUT[class_ids]
+    assert palette.shape == (1, len(CITYSCAPES_CLASSES), 3)
+    assert palette.dtype == np.uint8
+    assert np.array_equal(cityscapes_palette_to_class_ids(palette), class_ids)
+    # Unknown class ids are drawn in black.
+    assert np.array_equal(CITYSCAPES_PALETTE_LUT[200], [0, 0, 0])
+
+
+def test_confusion_matrix_from_encoding():
+    from pylot.perception.segmentation.utils import \
+        compute_confusion_matrix_from_encoding, encode_ground_class_ids
+    rng = np.random.RandomState(0)
+    ground = rng.randint(0, 13, (4, 5)).astype(np.uint8)
+    encoded_ground = encode_ground_class_ids(ground)
+    assert encoded_ground.dtype == np.uint8
+    for _ in range(3):
+        prediction = rng.randint(0, 13, (4, 5)).astype(np.uint8)
+        expected = np.zeros((13, 13), dtype=np.int64)
+        np.add.at(expected, (ground.ravel(), prediction.ravel()), 1)
+        assert np.array_equal(
+            compute_confusion_matrix_from_encoding(encoded_ground,
+                                                   prediction), expected)
+    # Large number of classes do not fit in uint8 codes.
+    assert encode_ground_class_ids(ground, 20).dtype == np.int64
+    assert encode_ground_class_ids(ground, 16).dtype == np.int64
+
+
+@pytest.mark.parametrize("ground, prediction", [([20, 1, -1], [4, 1, 1]),
+                                                ([0, 1, 4], [256, 1, 270])])
+def test_confusion_matrix_from_encoding_ignores_wrapped_ids(
+        ground, prediction):
+    from pylot.perception.segmentation.utils import \
+        compute_confusion_matrix_from_encoding, encode_ground_class_ids
+    # 20 * 13 and 256 wrap around to valid codes in uint8.
+    encoded_ground = encode_ground_class_ids(np.array(ground))
+    assert encoded_ground.dtype == np.uint8
+    matrix = compute_confusion_matrix_from_encoding(encoded_ground,
+                                                    np.array(prediction))
+    assert matrix.sum() == 1 and matrix[1, 1] == 1
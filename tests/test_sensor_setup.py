@@ -286,3 +286,36 @@ def test_imu_setup_initialization():
     imu_setup = IMUSetup(name, transform)
     assert imu_setup.name == name, "The name in the setup is not the same."
     assert imu_setup.transform == transform, "The transform is not the same."
+
+
+@pytest.mark.parametrize("rotation", [Rotation(), Rotation(10, 20, 30)])
+def test_camera_project_points(rotation):
+    """ Ensure that project_points is consistent with Location.to_camera_view,
+    and that the validity mask flags the points that are in the image. """
+    camera_setup = CameraSetup('camera_setup',
+                               'sensor.camera.rgb',
+                               width=1920,
+                               height=1080,
+                               transform=Transform(Location(1, 2, 3),
+                                                   rotation))
+    locations = [
+        Location(50, 2, 3),
+        Location(50, 100, 3),
+        Location(-50, 2, 3),
+        Location(10000, 20, 30)
+    ]
+    points = np.array([loc.as_numpy_array() for loc in locations])
+    pixels, depth, valid = camera_setup.project_points(points)
+    for i, location in enumerate(locations):
+        expected = location.to_camera_view(
+            camera_setup.get_extrinsic_matrix(),
+            camera_setup.get_intrinsic_matrix())
+        assert np.allclose(pixels[i], [expected.x, expected.y])
+        assert np.isclose(depth[i], expected.z)
+        assert valid[i] == (expected.z > 0 and 0 <= expected.x < 1920
+                            and 0 <= expected.y < 1080)
+
+    # Ensure that the cached projection matrix is updated with the transform.
+    camera_setup.set_transform(Transform(Location(), Rotation()))
+    _, new_depth, _ = camera_setup.project_points(points)
+    assert not np.allclose(depth, new_depth)
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from pylot.drivers.sensor_setup import RGBCameraSetup
+from pylot.perception.detection.traffic_light import TrafficLight, \
+    TrafficLightColor, get_traffic_light_regions
+from pylot.perception.detection.utils import crop_regions
+from pylot.utils import Location, Rotation, Transform
+
+
+def _camera_setup():
+    return RGBCameraSetup('camera', 800, 600,
+                          Transform(Location(0, 0, 1.5), Rotation()))
+
+
+def _traffic_light(x, y, yaw=90):
+    # Lights with a yaw of 90 face a camera that looks along the x axis.
+    return TrafficLight(1.0,
+                        TrafficLightColor.GREEN,
+                        transform=Transform(Location(x, y, 0),
+                                            Rotation(yaw=yaw)))
+
+
+def test_region_of_visible_traffic_light():
+    regions = get_traffic_light_regions([_traffic_light(30, 3)],
+                                        _camera_setup())
+    assert regions.shape == (1, 4)
+    x_min, x_max, y_min, y_max = regions[0]
+    assert 0 <= x_min < x_max <= 800
+    assert 0 <= y_min < y_max <= 600
+    # The heads are above the horizon.
+    assert y_max < 300
+
+
+@pytest.mark.parametrize("traffic_light", [
+    _traffic_light(-30, 3),
+    _traffic_light(100, 3),
+    _traffic_light(30, 3, yaw=-90),
+])
+def test_no_regions_for_hidden_traffic_lights(traffic_light):
+    regions = get_traffic_light_regions([traffic_light], _camera_setup())
+    assert regions.shape == (0, 4)
+    assert get_traffic_light_regions([], _camera_setup()).shape == (0, 4)
+
+
+def test_town_boxes_are_inside_generic_box():
+    traffic_light = _traffic_light(30, 3)
+    [generic] = get_traffic_light_regions([traffic_light], _camera_setup())
+    [town] = get_traffic_light_regions([traffic_light], _camera_setup(),
+                                       'Town01')
+    assert generic[0] <= town[0] and town[1] <= generic[1]
+    assert generic[2] <= town[2] and town[3] <= generic[3]
+
+
+@pytest.mark.parametrize("padding", [0, 40, 400])
+def test_regions_are_padded_and_clipped(padding):
+    [region] = get_traffic_light_regions([_traffic_light(30, 3)],
+                                         _camera_setup())
+    [padded] = get_traffic_light_regions([_traffic_light(30, 3)],
+                                         _camera_setup(),
+                                         padding=padding)
+    expected = np.clip(region + [-padding, padding, -padding, padding], 0,
+                       [800, 800, 600, 600])
+    assert padded.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("padding, num_regions", [(0, 2), (200, 1)])
+def test_overlapping_regions_are_merged(padding, num_regions):
+    traffic_lights = [_traffic_light(30, 3), _traffic_light(30, -20)]
+    regions = get_traffic_light_regions(traffic_lights,
+                                        _camera_setup(),
+                                        padding=padding)
+    assert len(regions) == num_regions
+    [merged] = get_traffic_light_regions(traffic_lights[:1] * 2,
+                                         _camera_setup())
+    assert merged.tolist() == get_traffic_light_regions(
+        traffic_lights[:1], _camera_setup())[0].tolist()
+
+
+def test_crop_regions():
+    frame = np.arange(6 * 8 * 3, dtype=np.uint8).reshape(6, 8, 3)
+    crops = crop_regions(frame, np.array([[0, 8, 0, 6], [2, 5, 1, 3]]))
+    assert crops.shape == (2, 6, 8, 3)
+    assert crops.dtype == np.uint8
+    assert np.array_equal(crops[0], frame)
+    assert np.array_equal(crops[1, :2, :3], frame[1:3, 2:5])
+    # The smaller crops are padded with zeros.
+    assert not crops[1, 2:].any() and not crops[1, :, 3:].any()
+
+
+def test_crop_single_region_is_a_view():
+    frame = np.arange(6 * 8 * 3, dtype=np.uint8).reshape(6, 8, 3)
+    crops = crop_regions(frame, np.array([[0, 8, 0, 6]]))
+    assert crops.shape == (1, 6, 8, 3)
+    assert np.shares_memory(crops, frame)
+    assert np.array_equal(crops[0], frame)
+    crops = crop_regions(frame, np.array([[2, 5, 1, 3]]))
+    assert np.array_equal(crops[0], frame[1:3, 2:5])
@@ -302,3 +302,190 @@ def test_vector_to_camera_view(location, expected):
                 camera_setup.get_extrinsic_matrix(),
                 camera_setup.get_intrinsic_matrix()).as_numpy_array(),
             expected)), "The camera transformation was not as expected."
+
+
+## TransformArray Tests
+
+
+@pytest.mark.parametrize("rotations", [[(0, 0, 0), (90, 90, 90)],
+                                       [(10, 20, 30), (-45, 135, 60)]])
+def test_transform_array_compose_and_inverse(rotations):
+    """ Test that the batched operations of TransformArray match the ones of
+    Transform. """
+    from pylot.utils import TransformArray
+    transforms = [
+        Transform(Location(i, 2 * i, -i), Rotation(*rotation))
+        for i, rotation in enumerate(rotations)
+    ]
+    other = Transform(Location(1, 2, 3), Rotation(5, 10, 15))
+    transform_array = TransformArray.from_transforms(transforms)
+    assert len(transform_array) == len(transforms)
+
+    composed = transform_array * other
+    for i, transform in enumerate(transforms):
+        assert np.allclose(composed.matrices[i], (transform * other).matrix)
+    composed = other * transform_array
+    for i, transform in enumerate(transforms):
+        assert np.allclose(composed.matrices[i], (other * transform).matrix)
+
+    inverse = transform_array.inverse()
+    for i, transform in enumerate(transforms):
+        assert np.allclose(inverse.matrices[i],
+                           np.linalg.inv(transform.matrix))
+
+    points = np.array([[10, 0, 0], [1, 2, 3]])
+    transformed = transform_array.transform_points(points)
+    for i, transform in enumerate(transforms):
+        assert np.allclose(transformed[i],
+                           transform.transform_points(points[i:i + 1])[0])
+    assert np.allclose(transform_array.inverse_transform_points(transformed),
+                       points)
+    transformed = transform_array.transform_points(
+        np.stack([points, points]))
+    for i, transform in enumerate(transforms):
+        assert np.allclose(transformed[i], transform.transform_points(points))
+
+
+def test_transform_array_to_transforms():
+    """ Test the conversion between TransformArray and lists of Transform. """
+    from pylot.utils import TransformArray
+    transforms = [
+        Transform(Location(1, 2, 3), Rotation(0, 90, 0)),
+        Transform(Location(-1, -2, -3), Rotation(0, 45, 0))
+    ]
+    transform_array = TransformArray.from_transforms(transforms)
+    assert np.allclose(transform_array.locations, [[1, 2, 3], [-1, -2, -3]])
+    for transform, converted in zip(transforms,
+                                    transform_array.as_transforms()):
+        assert np.allclose(transform.matrix, converted.matrix)
+        assert np.isclose(transform.rotation.yaw, converted.rotation.yaw)
+    assert np.allclose(transform_array[1].matrix, transforms[1].matrix)
+    assert len(TransformArray.from_transforms([])) == 0
+
+
+## Transform Tests
+
+
+@pytest.mark.parametrize("location, rotation",
+                         [((0, 0, 0), (0, 0, 0)), ((1, 2, 3), (10, 20, 30)),
+                          ((-5, 10, 2), (-45, 135, 60))])
+def test_transform_inverse(location, rotation):
+    """ Test that the cached inverse matches the inverse of the matrix. """
+    transform = Transform(Location(*location), Rotation(*rotation))
+    points = np.array([[1, 2, 3], [100, -50, 20]])
+    expected = np.dot(np.linalg.inv(transform.matrix),
+                      np.append(points.T, np.ones((1, 2)), axis=0))[:3].T
+    assert np.allclose(transform.inverse_transform_points(points), expected)
+    assert np.allclose(
+        transform.inverse_transform_points(
+            transform.transform_points(points)), points)
+
+
+def test_transform_from_matrix_rotation():
+    """ Test that the rotation is correctly recovered from the matrix. """
+    transform = Transform(Location(1, 2, 3), Rotation(10, 20, 30))
+    from_matrix = Transform(matrix=transform.matrix)
+    assert np.isclose(from_matrix.location.x, 1)
+    assert np.isclose(from_matrix.rotation.pitch, 10)
+    assert np.isclose(from_matrix.rotation.yaw, 20)
+    assert np.isclose(from_matrix.rotation.roll, 30)
+    assert np.allclose(from_matrix.forward_vector.as_numpy_array(),
+                       transform.forward_vector.as_numpy_array())
+
+
+## LocationArray Tests
+
+
+def test_location_array_distances():
+    """ Test that the vectorized distances match the ones of Location. """
+    from pylot.utils import LocationArray
+    locations = [Location(1, 2, 3), Location(10, 20, 30), Location(-4, 0, 1)]
+    other = Location(40, 50, 60)
+    location_array = LocationArray.from_locations(locations)
+    assert len(location_array) == 3
+    assert np.allclose(location_array.distance(other),
+                       [loc.distance(other) for loc in locations])
+    assert np.allclose(location_array.l1_distance(other),
+                       [loc.l1_distance(other) for loc in locations])
+    vectors, magnitudes = location_array.get_vector_and_magnitude(other)
+    for i, loc in enumerate(locations):
+        vector, magnitude = loc.get_vector_and_magnitude(other)
+        assert np.isclose(magnitudes[i], magnitude)
+        assert np.isclose(vectors[i].x, vector.x)
+        assert np.isclose(vectors[i].y, vector.y)
+    assert isinstance(location_array[1], Location)
+    assert np.isclose(location_array[1].y, 20)
+    assert len(location_array[1:]) == 2
+
+
+def test_location_array_to_camera_view():
+    """ Test that the vectorized projection matches the one of Location. """
+    from pylot.drivers.sensor_setup import CameraSetup
+    from pylot.utils import LocationArray
+    camera_setup = CameraSetup('test_camera',
+                               'sensor.camera.rgb',
+                               width=1920,
+                               height=1080,
+                               transform=Transform(Location(), Rotation()))
+    locations = [Location(1, 2, 3), Location(10000, 20, 30)]
+    projected = LocationArray.from_locations(locations).to_camera_view(
+        camera_setup.get_extrinsic_matrix(),
+        camera_setup.get_intrinsic_matrix())
+    for i, location in enumerate(locations):
+        expected = location.to_camera_view(
+            camera_setup.get_extrinsic_matrix(),
+            camera_setup.get_intrinsic_matrix())
+        assert np.allclose(projected[i].as_numpy_array(),
+                           expected.as_numpy_array())
+
+
+def test_transform_location_array():
+    """ Test that Transform accepts and returns a LocationArray. """
+    from pylot.utils import LocationArray
+    transform = Transform(Location(3, 0, 0), Rotation(0, 90, 0))
+    locations = [Location(10, 0, 0), Location(1, 2, 3)]
+    transformed = transform.transform_locations(
+        LocationArray.from_locations(locations))
+    assert isinstance(transformed, LocationArray)
+    for i, location in enumerate(transform.transform_locations(locations)):
+        assert np.allclose(transformed[i].as_numpy_array(),
+                           location.as_numpy_array())
+    restored = transform.inverse_transform_locations(transformed)
+    assert np.allclose(restored.points, [[10, 0, 0], [1, 2, 3]])
+
+
+@pytest.mark.parametrize("shape, expected", [
+    ((4, 3), (4, 3)),
+    ((0, 3), (0, 3)),
+    ((6, ), (2, 3)),
+    ((0, ), (0, 3)),
+])
+def test_location_array_shapes(shape, expected):
+    """ Test that LocationArray accepts (N, 3) and flat arrays. """
+    from pylot.utils import LocationArray
+    assert LocationArray(np.zeros(shape)).points.shape == expected
+
+
+@pytest.mark.parametrize("shape", [(3, 2), (2, 6), (4, ), (2, 3, 1), ()])
+def test_location_array_rejects_misshaped_points(shape):
+    """ Test that LocationArray does not regroup mis-shaped points. """
+    from pylot.utils import LocationArray
+    with pytest.raises(ValueError):
+        LocationArray(np.zeros(shape))
+
+
+@pytest.mark.parametrize("shape, valid", [
+    ((4, 2), True),
+    ((6, ), True),
+    ((2, 3), False),
+    ((3, ), False),
+    ((2, 2, 1), False),
+])
+def test_vector_2d_array_shapes(shape, valid):
+    """ Test that Vector2DArray only accepts (N, 2) and flat arrays. """
+    from pylot.utils import Vector2DArray
+    if valid:
+        assert Vector2DArray(np.zeros(shape)).points.shape[1] == 2
+    else:
+        with pytest.raises(ValueError):
+            Vector2DArray(np.zeros(shape))